@@ -0,0 +1,196 @@
+import os
+import random
+import statistics
+import subprocess
+import time
+from datetime import datetime, timedelta, timezone
+
+# Benchmarks never talk to Telegram or S3, but importing the bot modules
+# requires the settings to be present
+os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+os.environ.setdefault("ACCESS_ID", "benchmark")
+os.environ.setdefault("ACCESS_KEY", "benchmark")
+
+from tortoise import Tortoise
+
+from tgbot.misc.query_guard import QueryCounter
+from tgbot.models.models import close_db, init
+
+
+class Scale:
+    def __init__(
+        self,
+        teachers: int,
+        subjects: int,
+        students: int,
+        tasks_per_subject: int,
+        subjects_per_student: int,
+        solutions: int,
+    ) -> None:
+        self.teachers = teachers
+        self.subjects = subjects
+        self.students = students
+        self.tasks_per_subject = tasks_per_subject
+        self.subjects_per_student = subjects_per_student
+        self.solutions = solutions
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+
+STUDENT_ID_OFFSET = 1_000_000
+TEACHER_ID_OFFSET = 1
+
+
+async def seed(scale: Scale, rng: random.Random) -> None:
+    connection = Tortoise.get_connection("default")
+    now = datetime.now(timezone.utc).isoformat(" ")
+    await connection.execute_many(
+        'INSERT INTO "teacher" (id, user_id, username, name, created_at, '
+        "updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            [i, TEACHER_ID_OFFSET + i, f"teacher{i}", f"Teacher {i}", now, now]
+            for i in range(1, scale.teachers + 1)
+        ],
+    )
+    await connection.execute_many(
+        'INSERT INTO "student" (id, user_id, username, name, created_at, '
+        "updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            [i, STUDENT_ID_OFFSET + i, f"student{i}", f"Student {i}", now, now]
+            for i in range(1, scale.students + 1)
+        ],
+    )
+    await connection.execute_many(
+        'INSERT INTO "subject" (id, name, description, teacher_id, '
+        "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            [
+                i,
+                f"Subject {i}",
+                "Synthetic subject",
+                rng.randint(1, scale.teachers),
+                now,
+                now,
+            ]
+            for i in range(1, scale.subjects + 1)
+        ],
+    )
+    today = datetime.now(timezone.utc)
+    tasks: dict[int, list[int]] = {}
+    rows = []
+    for subject_id in range(1, scale.subjects + 1):
+        for _ in range(scale.tasks_per_subject):
+            task_id = len(rows) + 1
+            due_date = today + timedelta(days=rng.randint(-180, 60))
+            rows.append(
+                [
+                    task_id,
+                    f"Task {task_id}",
+                    "Synthetic task",
+                    due_date.isoformat(" "),
+                    subject_id,
+                    now,
+                    now,
+                ]
+            )
+            tasks.setdefault(subject_id, []).append(task_id)
+    await connection.execute_many(
+        'INSERT INTO "subjecttask" (id, name, description, due_date, '
+        "subject_id, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    enrollments = [
+        (subject_id, student_id)
+        for student_id in range(1, scale.students + 1)
+        for subject_id in rng.sample(
+            range(1, scale.subjects + 1),
+            min(scale.subjects_per_student, scale.subjects),
+        )
+    ]
+    await connection.execute_many(
+        'INSERT INTO "subject_student" (subject_id, student_id) '
+        "VALUES (?, ?)",
+        [list(row) for row in enrollments],
+    )
+    pairs = set()
+    limit = min(scale.solutions, len(enrollments) * scale.tasks_per_subject)
+    while len(pairs) < limit:
+        subject_id, student_id = rng.choice(enrollments)
+        pairs.add((student_id, rng.choice(tasks[subject_id])))
+    await connection.execute_many(
+        'INSERT INTO "solution" (student_id, subject_task_id, grade, '
+        "file_link, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+        [
+            [
+                student_id,
+                task_id,
+                rng.randint(1, 5),
+                f"Subject/student{student_id}/task{task_id}.pdf",
+                now,
+                now,
+            ]
+            for student_id, task_id in sorted(pairs)
+        ],
+    )
+
+
+async def load_tasks() -> dict[int, list[int]]:
+    tasks: dict[int, list[int]] = {}
+    rows = await Tortoise.get_connection("default").execute_query_dict(
+        'SELECT id, subject_id FROM "subjecttask" ORDER BY id'
+    )
+    for row in rows:
+        tasks.setdefault(row["subject_id"], []).append(row["id"])
+    return tasks
+
+
+async def open_database(path: str, fresh: bool = True) -> None:
+    if fresh:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    await init(path)
+
+
+async def close_database() -> None:
+    await close_db()
+
+
+def summarize(
+    latencies: list[float], queries: list[int], repeats: list[int]
+) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "runs": len(latencies),
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000,
+        "max_ms": latencies[-1] * 1000,
+        "queries": max(queries),
+        "max_same_query": max(repeats),
+    }
+
+
+async def measure(call, repeat: int) -> dict:
+    latencies, queries, repeats = [], [], []
+    for _ in range(repeat):
+        with QueryCounter() as counter:
+            started = time.perf_counter()
+            await call()
+            latencies.append(time.perf_counter() - started)
+        queries.append(counter.total)
+        repeats.append(max(counter.shapes.values(), default=0))
+    return summarize(latencies, queries, repeats)
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,203 @@
+"""Benchmark every Database method against a seeded synthetic dataset.
+
+    python -m benchmarks.database --students 10000 --solutions 500000 \
+        --output bench_database.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+from datetime import date, datetime
+
+from benchmarks.common import (
+    STUDENT_ID_OFFSET,
+    TEACHER_ID_OFFSET,
+    Scale,
+    close_database,
+    git_revision,
+    load_tasks,
+    measure,
+    open_database,
+    seed,
+)
+from tgbot.handlers.scheduled_messages import scheduled_notification
+from tgbot.misc.database import Database
+from tgbot.misc.utils import gather_upcoming_tasks
+
+
+class RecordingBot:
+    def __init__(self) -> None:
+        self.sent = 0
+
+    async def send_message(self, *args, **kwargs) -> None:
+        self.sent += 1
+
+
+def build_cases(
+    db: Database,
+    scale: Scale,
+    tasks: dict[int, list[int]],
+    solutions: int,
+    rng: random.Random,
+) -> dict:
+    new_ids = iter(range(10 * STUDENT_ID_OFFSET, 20 * STUDENT_ID_OFFSET))
+
+    def student_id() -> int:
+        return STUDENT_ID_OFFSET + rng.randint(1, scale.students)
+
+    def teacher_id() -> int:
+        return TEACHER_ID_OFFSET + rng.randint(1, scale.teachers)
+
+    def subject_id() -> int:
+        return rng.randint(1, scale.subjects)
+
+    def task_id() -> int:
+        return rng.choice(tasks[subject_id()])
+
+    def solution_id() -> int:
+        return rng.randint(1, solutions)
+
+    async def subject():
+        return await db.get_subject(subject_id())
+
+    async def student():
+        return await db.get_student(student_id())
+
+    async def upcoming_tasks():
+        current_student = await student()
+        subjects = await db.get_student_subjects(current_student)
+        for current_subject in subjects:
+            subject_tasks = await current_subject.tasks.all().filter(
+                due_date__gte=datetime.now()
+            )
+            await gather_upcoming_tasks(
+                db, current_subject, subject_tasks, current_student
+            )
+
+    async def create_solution():
+        await db.create_solution(task_id(), student_id(), "bench/file.pdf")
+
+    async def update_solution_grade():
+        await db.update_solution_grade(solution_id(), rng.randint(1, 5))
+
+    async def update_solution_file_link():
+        solution = await db.solution.get(id=solution_id())
+        await db.update_solution_file_link(solution, "bench/updated.pdf")
+
+    return {
+        "create_teacher": lambda: db.create_teacher(next(new_ids)),
+        "create_student": lambda: db.create_student(next(new_ids)),
+        "create_subject": lambda: db.create_subject(
+            "Bench", "Benchmark subject", rng.randint(1, scale.teachers)
+        ),
+        "create_solution": create_solution,
+        "create_subject_task": lambda: db.create_subject_task(
+            "Bench", "Benchmark task", date.today().isoformat(), subject_id()
+        ),
+        "get_solutions_for_task": lambda: db.get_solutions_for_task(task_id()),
+        "get_percentage_solutions_by_subject": (
+            lambda: _with(subject, db.get_percentage_solutions_by_subject)
+        ),
+        "get_grades_by_subject": (
+            lambda: _with(subject, db.get_grades_by_subject)
+        ),
+        "get_student_solution": lambda: db.get_student_solution(
+            student_id(), task_id()
+        ),
+        "update_solution_grade": update_solution_grade,
+        "update_solution_file_link": update_solution_file_link,
+        "is_student": lambda: db.is_student(student_id()),
+        "is_teacher": lambda: db.is_teacher(teacher_id()),
+        "get_teachers": db.get_teachers,
+        "get_students": db.get_students,
+        "get_teacher": lambda: db.get_teacher(teacher_id()),
+        "get_subject": lambda: db.get_subject(subject_id()),
+        "get_subject_task": lambda: db.get_subject_task(task_id()),
+        "get_student": lambda: db.get_student(student_id()),
+        "get_subjects_by_teacher_id": lambda: db.get_subjects_by_teacher_id(
+            rng.randint(1, scale.teachers)
+        ),
+        "get_student_subjects": lambda: _with(
+            student, db.get_student_subjects
+        ),
+        "gather_upcoming_tasks": upcoming_tasks,
+    }
+
+
+async def _with(load, method):
+    return await method(await load())
+
+
+async def run(args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed)
+    scale = Scale(
+        teachers=args.teachers,
+        subjects=args.subjects,
+        students=args.students,
+        tasks_per_subject=args.tasks,
+        subjects_per_student=args.subjects_per_student,
+        solutions=args.solutions,
+    )
+    await open_database(args.database, fresh=not args.reuse)
+    if not args.reuse:
+        await seed(scale, rng)
+    tasks = await load_tasks()
+    db = Database()
+    solutions = await db.solution.all().count()
+    results = {}
+    try:
+        cases = build_cases(db, scale, tasks, solutions, rng)
+        for name, call in cases.items():
+            if args.only and name not in args.only:
+                continue
+            results[name] = await measure(call, args.repeat)
+            print(f"{name}: {results[name]['p50_ms']:.2f} ms")
+        if not args.only or "scheduled_notification" in args.only:
+            bot = RecordingBot()
+            results["scheduled_notification"] = await measure(
+                lambda: scheduled_notification(bot, db), 1
+            )
+            results["scheduled_notification"]["messages"] = bot.sent
+    finally:
+        await close_database()
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "seed": args.seed,
+        "scale": scale.as_dict(),
+        "results": results,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--teachers", type=int, default=100)
+    parser.add_argument("--subjects", type=int, default=300)
+    parser.add_argument("--students", type=int, default=10_000)
+    parser.add_argument("--tasks", type=int, default=20)
+    parser.add_argument("--subjects-per-student", type=int, default=5)
+    parser.add_argument("--solutions", type=int, default=500_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--database", default="bench.sqlite3")
+    parser.add_argument(
+        "--reuse",
+        action="store_true",
+        help="Reuse a database seeded by a previous run with the same scale",
+    )
+    parser.add_argument("--only", nargs="*", help="Methods to benchmark")
+    parser.add_argument("--output", default="bench_database.json")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    report = asyncio.run(run(args))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
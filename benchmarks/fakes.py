@@ -0,0 +1,176 @@
+import asyncio
+import json
+import random
+import shutil
+from collections import Counter
+from http import HTTPStatus
+from pathlib import Path
+from typing import AsyncGenerator
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.methods import TelegramMethod
+from aiogram.types import File, Message, User
+
+from tgbot.misc.metrics import metrics
+from tgbot.misc.storage import Storage
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Bot", "username": "bot"}
+
+
+class FakeSession(BaseSession):
+    def __init__(
+        self,
+        latency: float = 0.0,
+        retry_after_rate: float = 0.0,
+        file_size: int = 64 * 1024,
+        seed: int = 42,
+        local_dir: str | None = None,
+    ) -> None:
+        super().__init__()
+        # Stands in for a local Bot API server, which answers getFile with
+        # the path of a file it has already saved to its working directory
+        self.local_dir = Path(local_dir) if local_dir else None
+        if self.local_dir:
+            self.api = TelegramAPIServer.from_base(
+                "http://localhost:8081", is_local=True
+            )
+        self.latency = latency
+        self.retry_after_rate = retry_after_rate
+        self.file_size = file_size
+        self.calls = Counter()
+        self.retry_afters = 0
+        self._rng = random.Random(seed)
+        self._message_ids = iter(range(1, 1 << 62))
+
+    async def close(self) -> None:
+        pass
+
+    async def make_request(
+        self, bot: Bot, method: TelegramMethod, timeout: int | None = None
+    ):
+        self.calls[type(method).__name__] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self._rng.random() < self.retry_after_rate:
+            self.retry_afters += 1
+            content = {
+                "ok": False,
+                "error_code": 429,
+                "description": "Too Many Requests: retry after 1",
+                "parameters": {"retry_after": 1},
+            }
+            status = HTTPStatus.TOO_MANY_REQUESTS
+        else:
+            content = {"ok": True, "result": self.fake_result(method)}
+            status = HTTPStatus.OK
+        response = self.check_response(
+            bot, method, status, json.dumps(content)
+        )
+        return response.result
+
+    def fake_result(self, method: TelegramMethod):
+        returning = str(method.__returning__)
+        chat_id = getattr(method, "chat_id", None) or 1
+        if Message.__name__ in returning:
+            message = {
+                "message_id": next(self._message_ids),
+                "date": 0,
+                "chat": {"id": chat_id, "type": "private"},
+                "from": BOT_USER,
+            }
+            if document := getattr(method, "document", None):
+                file_id = (
+                    document
+                    if isinstance(document, str)
+                    else f"uploaded{message['message_id']}"
+                )
+                message["document"] = {
+                    "file_id": file_id,
+                    "file_unique_id": file_id,
+                }
+            return message
+        if "MessageId" in returning:
+            return {"message_id": next(self._message_ids)}
+        if File.__name__ in returning:
+            return {
+                "file_id": method.file_id,
+                "file_unique_id": method.file_id,
+                "file_size": self.file_size,
+                "file_path": self.file_path(method.file_id),
+            }
+        if User.__name__ in returning:
+            return BOT_USER
+        return True
+
+    def file_path(self, file_id: str) -> str:
+        if not self.local_dir:
+            return f"documents/{file_id}"
+        path = self.local_dir / "documents" / file_id
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(path, "wb") as f:
+                f.truncate(self.file_size)
+        return str(path.absolute())
+
+    async def stream_content(
+        self,
+        url: str,
+        headers: dict | None = None,
+        timeout: int = 30,
+        chunk_size: int = 65536,
+        raise_for_status: bool = True,
+    ) -> AsyncGenerator[bytes, None]:
+        self.calls["DownloadFile"] += 1
+        remaining = self.file_size
+        while remaining > 0:
+            chunk = min(chunk_size, remaining)
+            remaining -= chunk
+            yield b"\0" * chunk
+
+
+class LocalStorage(Storage):
+    # Keeps the bucket in a local directory instead of S3
+    def __init__(self, directory: str, bucket_name: str = "studyhelper"):
+        self.bucket_name = bucket_name
+        self.root = Path(directory) / bucket_name
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def get_objects(self) -> list:
+        metrics.count_call("s3", "ListObjectsV2")
+        return [
+            {
+                "Key": str(path.relative_to(self.root)),
+                "Size": path.stat().st_size,
+            }
+            for path in self.root.rglob("*")
+            if path.is_file()
+        ]
+
+    def add_file(self, file_name: str, name: str) -> bool:
+        metrics.count_call("s3", "PutObject")
+        target = self.root / name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(file_name, target)
+        return True
+
+    def download_file(self, file_name, destination: str | None = None) -> bool:
+        metrics.count_call("s3", "GetObject")
+        if not (self.root / file_name).is_file():
+            return False
+        shutil.copyfile(self.root / file_name, destination or file_name)
+        return True
+
+    def delete_file(self, file_name) -> bool:
+        metrics.count_call("s3", "DeleteObject")
+        (self.root / file_name).unlink(missing_ok=True)
+        return True
+
+    def create_presigned_url(
+        self,
+        file_name,
+        download_name: str | None = None,
+        expires_in: int = 60,
+    ) -> str:
+        return f"http://localhost/{self.bucket_name}/{file_name}"
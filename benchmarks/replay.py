@@ -0,0 +1,319 @@
+"""Replay update streams through the whole bot against a fake Telegram API.
+
+    python -m benchmarks.replay deadline_rush --students 500
+    python -m benchmarks.replay deadline_rush --dump rush.jsonl
+    python -m benchmarks.replay deadline_rush --replay rush.jsonl
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import mimetypes
+import os
+import platform
+import statistics
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+from aiogram.utils.deep_linking import encode_payload
+
+from benchmarks.common import close_database, git_revision, open_database
+from benchmarks.fakes import FakeSession, LocalStorage
+from bot import (
+    register_all_handlers,
+    register_global_middlewares,
+    register_request_middlewares,
+)
+from loader import bot, dp, notifications, upload_queue
+from tgbot.config import config
+from tgbot.keyboards.inline.callbacks import TaskCallbackFactory
+from tgbot.misc.database import Database
+from tgbot.misc.metrics import current_update, metrics
+from tgbot.models.backend import query_observers
+
+TEACHER_ID = 1
+STUDENT_ID_OFFSET = 1_000_000
+
+
+class ReplayRecorder(BaseMiddleware):
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.telegram_calls: dict[str, list[int]] = defaultdict(list)
+        self.errors = Counter()
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        stats = current_update.get()
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.errors[stats.handler] += 1
+            raise
+        finally:
+            self.latencies[stats.handler].append(time.perf_counter() - started)
+            self.telegram_calls[stats.handler].append(stats.calls["telegram"])
+
+
+class UpdateFactory:
+    def __init__(self) -> None:
+        self.ids = itertools.count(1)
+
+    def user(self, user_id: int) -> dict:
+        return {
+            "id": user_id,
+            "is_bot": False,
+            "first_name": f"User {user_id}",
+            "username": f"user{user_id}",
+        }
+
+    def message(self, user_id: int, **fields) -> dict:
+        message = {
+            "message_id": next(self.ids),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": self.user(user_id),
+            **fields,
+        }
+        return {"update_id": next(self.ids), "message": message}
+
+    def command(self, user_id: int, text: str) -> dict:
+        entity = {
+            "type": "bot_command",
+            "offset": 0,
+            "length": len(text.split()[0]),
+        }
+        return self.message(user_id, text=text, entities=[entity])
+
+    def document(
+        self, user_id: int, file_name: str, file_size: int = 256 * 1024
+    ) -> dict:
+        file_id = f"file{next(self.ids)}"
+        document = {
+            "file_id": file_id,
+            "file_unique_id": file_id,
+            "file_name": file_name,
+            "file_size": file_size,
+            "mime_type": mimetypes.guess_type(file_name)[0],
+        }
+        return self.message(user_id, document=document)
+
+    def callback(self, user_id: int, data: str) -> dict:
+        message = {
+            "message_id": next(self.ids),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "text": "Task",
+        }
+        callback_query = {
+            "id": str(next(self.ids)),
+            "chat_instance": str(user_id),
+            "from": self.user(user_id),
+            "message": message,
+            "data": data,
+        }
+        return {"update_id": next(self.ids), "callback_query": callback_query}
+
+
+async def create_class(db: Database, students: int, enroll: bool) -> tuple:
+    teacher = await db.create_teacher(TEACHER_ID, "teacher", "Teacher")
+    subject = await db.create_subject("Math", "Load test", teacher.id)
+    due_date = (date.today() + timedelta(days=7)).isoformat()
+    task = await db.create_subject_task(
+        "Homework", "Load test", due_date, subject.id
+    )
+    if enroll:
+        created = [
+            await db.create_student(STUDENT_ID_OFFSET + i, f"user{i}")
+            for i in range(students)
+        ]
+        await subject.students.add(*created)
+    return subject.id, task.id
+
+
+async def deadline_rush(
+    db: Database, factory: UpdateFactory, students: int
+) -> list[dict]:
+    subject_id, task_id = await create_class(db, students, enroll=True)
+    data = TaskCallbackFactory(
+        subject_id=subject_id, task_id=task_id, action="create"
+    ).pack()
+    updates = []
+    for i in range(students):
+        user_id = STUDENT_ID_OFFSET + i
+        updates.append(factory.callback(user_id, data))
+        updates.append(factory.document(user_id, f"solution{i}.pdf"))
+    return updates
+
+
+async def class_enrolling(
+    db: Database, factory: UpdateFactory, students: int
+) -> list[dict]:
+    subject_id, _ = await create_class(db, students, enroll=False)
+    payload = encode_payload(
+        json.dumps({"key": "add_subject", "id": subject_id})
+    )
+    updates = []
+    for i in range(students):
+        user_id = STUDENT_ID_OFFSET + i
+        updates.append(factory.command(user_id, "/register_student"))
+        updates.append(factory.command(user_id, f"/start {payload}"))
+    return updates
+
+
+SCENARIOS = {
+    "deadline_rush": deadline_rush,
+    "class_enrolling": class_enrolling,
+}
+
+
+async def feed(updates: list[dict], rate: float) -> float:
+    started = time.perf_counter()
+    tasks = []
+    for update in updates:
+        # Polling handles every update as its own task, so do the same
+        tasks.append(asyncio.create_task(dp.feed_raw_update(bot, update)))
+        if rate:
+            await asyncio.sleep(1 / rate)
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return time.perf_counter() - started
+
+
+def percentile(values: list[float], percent: int) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, len(values) * percent // 100)]
+
+
+def build_report(
+    recorder: ReplayRecorder, session: FakeSession, updates: int, wall: float
+) -> dict:
+    handlers = {
+        name: {
+            "updates": len(latencies),
+            "errors": recorder.errors[name],
+            "p50_ms": percentile(latencies, 50) * 1000,
+            "p95_ms": percentile(latencies, 95) * 1000,
+            "p99_ms": percentile(latencies, 99) * 1000,
+            "telegram_calls_per_update": statistics.fmean(
+                recorder.telegram_calls[name]
+            ),
+        }
+        for name, latencies in recorder.latencies.items()
+    }
+    api_calls = sum(session.calls.values())
+    return {
+        "updates": updates,
+        "wall_s": wall,
+        "updates_per_s": updates / wall if wall else 0,
+        "telegram_calls_per_update": api_calls / updates if updates else 0,
+        "telegram_calls": dict(session.calls),
+        "retry_afters": session.retry_afters,
+        "handlers": handlers,
+    }
+
+
+async def run(args: argparse.Namespace, workdir: str) -> dict:
+    session = FakeSession(
+        latency=args.latency / 1000,
+        retry_after_rate=args.retry_after_rate,
+        file_size=args.file_size,
+        seed=args.seed,
+        local_dir=os.path.join(workdir, "bot-api") if args.local_api else None,
+    )
+    bot.session = session
+    recorder = ReplayRecorder()
+    register_all_handlers()
+    register_global_middlewares(dp, config, LocalStorage(workdir))
+    register_request_middlewares(bot)
+    dp.message.outer_middleware(recorder)
+    dp.callback_query.outer_middleware(recorder)
+    query_observers.append(metrics.observe_query)
+    await open_database(os.path.join(workdir, "replay.sqlite3"))
+    try:
+        updates = await SCENARIOS[args.scenario](
+            Database(), UpdateFactory(), args.students
+        )
+        if args.replay:
+            with open(args.replay) as f:
+                updates = [json.loads(line) for line in f if line.strip()]
+        if args.dump:
+            with open(args.dump, "w") as f:
+                f.writelines(json.dumps(update) + "\n" for update in updates)
+        session.calls.clear()
+        upload_queue.start()
+        started = time.perf_counter()
+        await feed(updates, args.rate)
+        # Uploads are finished by the queue after their handlers return
+        await upload_queue.stop()
+        await notifications.flush_all()
+        wall = time.perf_counter() - started
+    finally:
+        await close_database()
+    return {
+        "python": platform.python_version(),
+        "scenario": args.scenario,
+        "students": args.students,
+        "latency_ms": args.latency,
+        "retry_after_rate": args.retry_after_rate,
+        "local_api": args.local_api,
+        **build_report(recorder, session, len(updates), wall),
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("scenario", choices=SCENARIOS)
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument(
+        "--rate", type=float, default=0, help="Updates per second, 0 = all"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=50, help="Fake API latency, ms"
+    )
+    parser.add_argument("--retry-after-rate", type=float, default=0.0)
+    parser.add_argument("--file-size", type=int, default=256 * 1024)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--local-api",
+        action="store_true",
+        help="Serve files like a local Bot API server",
+    )
+    parser.add_argument("--replay", help="JSONL file with updates to feed")
+    parser.add_argument("--dump", help="Save the generated updates as JSONL")
+    parser.add_argument("--output", default="bench_replay.json")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    for name in ("replay", "dump", "output"):
+        if path := getattr(args, name):
+            setattr(args, name, os.path.abspath(path))
+    revision = git_revision()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="replay-") as workdir:
+        # Handlers download documents into the working directory
+        os.chdir(workdir)
+        try:
+            report = asyncio.run(run(args, workdir))
+        finally:
+            os.chdir(cwd)
+    report["revision"] = revision
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["handlers"], indent=2))
+    print(f"{report['updates_per_s']:.1f} updates/s")
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,386 @@
+"""A small S3-compatible server that keeps buckets in a local directory.
+
+It implements the subset of the API used by Storage: buckets, paginated
+listing, single and multipart uploads (with listing of unfinished uploads
+and their parts), ranged downloads, batched deletes and SHA256 checksums.
+"""
+import base64
+import hashlib
+import shutil
+import threading
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlparse
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
+
+NAMESPACE = "http://s3.amazonaws.com/doc/2006-03-01/"
+CHUNK_SIZE = 1024 * 1024
+
+
+def b64_sha256(digest: bytes) -> str:
+    return base64.b64encode(digest).decode()
+
+
+def xml(root: str, body: str) -> bytes:
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>'
+        f'<{root} xmlns="{NAMESPACE}">{body}</{root}>'
+    ).encode()
+
+
+class S3State:
+    def __init__(self, directory: str) -> None:
+        self.root = Path(directory)
+        self.lock = threading.Lock()
+        # key -> {"etag", "checksum", "modified"}
+        self.objects: dict[tuple[str, str], dict] = {}
+        # upload id -> {"bucket", "key", "initiated", "parts"}
+        self.uploads: dict[str, dict] = {}
+        self.requests = 0
+
+    def object_path(self, bucket: str, key: str) -> Path:
+        return self.root / bucket / key
+
+    def part_path(self, upload_id: str, number: int) -> Path:
+        return self.root / ".uploads" / upload_id / str(number)
+
+
+class S3Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state: S3State
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def _parse(self) -> tuple[str, str, dict]:
+        url = urlparse(self.path)
+        bucket, _, key = unquote(url.path).lstrip("/").partition("/")
+        query = parse_qs(url.query, keep_blank_values=True)
+        with self.state.lock:
+            self.state.requests += 1
+        return bucket, key, {name: value[0] for name, value in query.items()}
+
+    def _send(
+        self, status: int, body: bytes = b"", headers: dict | None = None
+    ) -> None:
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _error(self, status: int, code: str) -> None:
+        self._send(
+            status,
+            xml("Error", f"<Code>{code}</Code><Message>{code}</Message>"),
+        )
+
+    def _receive(self, path: Path) -> tuple[str, bytes]:
+        # Streams the body to disk, returns its MD5 ETag and SHA256 digest
+        path.parent.mkdir(parents=True, exist_ok=True)
+        md5, sha256 = hashlib.md5(), hashlib.sha256()
+        remaining = int(self.headers.get("Content-Length", 0))
+        with open(path, "wb") as f:
+            while remaining > 0:
+                chunk = self.rfile.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                md5.update(chunk)
+                sha256.update(chunk)
+                f.write(chunk)
+        return f'"{md5.hexdigest()}"', sha256.digest()
+
+    def _checksum_ok(self, digest: bytes) -> bool:
+        expected = self.headers.get("x-amz-checksum-sha256")
+        return not expected or expected == b64_sha256(digest)
+
+    def do_HEAD(self) -> None:
+        bucket, key, _ = self._parse()
+        if not key:
+            if (self.state.root / bucket).is_dir():
+                return self._send(200)
+            return self._send(404)
+        self._get_object(bucket, key)
+
+    def do_PUT(self) -> None:
+        bucket, key, query = self._parse()
+        if not key:
+            (self.state.root / bucket).mkdir(parents=True, exist_ok=True)
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            return self._send(200)
+        if "uploadId" in query:
+            return self._upload_part(query)
+        etag, digest = self._receive(self.state.object_path(bucket, key))
+        if not self._checksum_ok(digest):
+            return self._error(400, "BadDigest")
+        checksum = b64_sha256(digest)
+        with self.state.lock:
+            self.state.objects[bucket, key] = {
+                "etag": etag,
+                "checksum": checksum,
+                "modified": datetime.now(timezone.utc),
+            }
+        self._send(
+            200, headers={"ETag": etag, "x-amz-checksum-sha256": checksum}
+        )
+
+    def _upload_part(self, query: dict) -> None:
+        upload_id, number = query["uploadId"], int(query["partNumber"])
+        if not (upload := self.state.uploads.get(upload_id)):
+            return self._error(404, "NoSuchUpload")
+        etag, digest = self._receive(self.state.part_path(upload_id, number))
+        if not self._checksum_ok(digest):
+            return self._error(400, "BadDigest")
+        checksum = b64_sha256(digest)
+        size = self.state.part_path(upload_id, number).stat().st_size
+        with self.state.lock:
+            upload["parts"][number] = {
+                "etag": etag,
+                "checksum": checksum,
+                "digest": digest,
+                "size": size,
+                "modified": datetime.now(timezone.utc),
+            }
+        self._send(
+            200, headers={"ETag": etag, "x-amz-checksum-sha256": checksum}
+        )
+
+    def do_POST(self) -> None:
+        bucket, key, query = self._parse()
+        if not key and "delete" in query:
+            return self._delete_objects(bucket)
+        if "uploads" in query:
+            upload_id = uuid.uuid4().hex
+            with self.state.lock:
+                self.state.uploads[upload_id] = {
+                    "bucket": bucket,
+                    "key": key,
+                    "initiated": datetime.now(timezone.utc),
+                    "parts": {},
+                }
+            return self._send(
+                200,
+                xml(
+                    "InitiateMultipartUploadResult",
+                    f"<Bucket>{bucket}</Bucket><Key>{escape(key)}</Key>"
+                    f"<UploadId>{upload_id}</UploadId>",
+                ),
+            )
+        if "uploadId" in query:
+            return self._complete(bucket, key, query["uploadId"])
+        self._error(400, "NotImplemented")
+
+    def _complete(self, bucket: str, key: str, upload_id: str) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        document = ElementTree.fromstring(self.rfile.read(length))
+        if not (upload := self.state.uploads.get(upload_id)):
+            return self._error(404, "NoSuchUpload")
+        numbers = [
+            int(element.text)
+            for element in document.iter()
+            if element.tag.endswith("PartNumber")
+        ]
+        if any(number not in upload["parts"] for number in numbers):
+            return self._error(400, "InvalidPart")
+        path = self.state.object_path(bucket, key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as target:
+            for number in numbers:
+                with open(self.state.part_path(upload_id, number), "rb") as f:
+                    shutil.copyfileobj(f, target, CHUNK_SIZE)
+        digests = b"".join(upload["parts"][n]["digest"] for n in numbers)
+        composite = b64_sha256(hashlib.sha256(digests).digest())
+        checksum = f"{composite}-{len(numbers)}"
+        etag = f'"{hashlib.md5(digests).hexdigest()}-{len(numbers)}"'
+        with self.state.lock:
+            self.state.objects[bucket, key] = {
+                "etag": etag,
+                "checksum": checksum,
+                "modified": datetime.now(timezone.utc),
+            }
+            del self.state.uploads[upload_id]
+        shutil.rmtree(self.state.root / ".uploads" / upload_id, True)
+        self._send(
+            200,
+            xml(
+                "CompleteMultipartUploadResult",
+                f"<Bucket>{bucket}</Bucket><Key>{escape(key)}</Key>"
+                f"<ETag>{escape(etag)}</ETag>"
+                f"<ChecksumSHA256>{checksum}</ChecksumSHA256>",
+            ),
+        )
+
+    def do_GET(self) -> None:
+        bucket, key, query = self._parse()
+        if not key and "uploads" in query:
+            return self._list_uploads(bucket, query.get("prefix", ""))
+        if not key:
+            return self._list_objects(bucket, query)
+        if "uploadId" in query:
+            return self._list_parts(bucket, key, query["uploadId"])
+        self._get_object(bucket, key)
+
+    def _get_object(self, bucket: str, key: str) -> None:
+        path = self.state.object_path(bucket, key)
+        if not (meta := self.state.objects.get((bucket, key))):
+            return self._error(404, "NoSuchKey")
+        size = path.stat().st_size
+        start, end = 0, size - 1
+        headers = {
+            "ETag": meta["etag"],
+            "Last-Modified": meta["modified"].strftime(
+                "%a, %d %b %Y %H:%M:%S GMT"
+            ),
+            "Accept-Ranges": "bytes",
+        }
+        status = 200
+        if byte_range := self.headers.get("Range"):
+            first, _, last = byte_range.removeprefix("bytes=").partition("-")
+            start, end = int(first), min(int(last or size - 1), size - 1)
+            headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+            status = 206
+        elif self.headers.get("x-amz-checksum-mode") == "ENABLED":
+            headers["x-amz-checksum-sha256"] = meta["checksum"]
+        length = end - start + 1
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(length))
+        self.end_headers()
+        if self.command == "HEAD":
+            return
+        with open(path, "rb") as f:
+            f.seek(start)
+            while length > 0:
+                chunk = f.read(min(CHUNK_SIZE, length))
+                length -= len(chunk)
+                self.wfile.write(chunk)
+
+    def _list_objects(self, bucket: str, query: dict) -> None:
+        prefix = query.get("prefix", "")
+        after = query.get("continuation-token") or query.get("start-after", "")
+        limit = int(query.get("max-keys", 1000))
+        keys = sorted(
+            key
+            for name, key in list(self.state.objects)
+            if name == bucket and key.startswith(prefix) and key > after
+        )
+        page, truncated = keys[:limit], len(keys) > limit
+        contents = "".join(
+            f"<Contents><Key>{escape(key)}</Key>"
+            f"<Size>{self.state.object_path(bucket, key).stat().st_size}"
+            f"</Size><ETag>{escape(self.state.objects[bucket, key]['etag'])}"
+            f"</ETag><LastModified>"
+            f"{self.state.objects[bucket, key]['modified'].isoformat()}"
+            f"</LastModified></Contents>"
+            for key in page
+        )
+        if truncated:
+            contents += (
+                f"<NextContinuationToken>{escape(page[-1])}"
+                f"</NextContinuationToken>"
+            )
+        self._send(
+            200,
+            xml(
+                "ListBucketResult",
+                f"<Name>{bucket}</Name><Prefix>{escape(prefix)}</Prefix>"
+                f"<KeyCount>{len(page)}</KeyCount>"
+                f"<IsTruncated>{str(truncated).lower()}</IsTruncated>"
+                f"{contents}",
+            ),
+        )
+
+    def _delete_objects(self, bucket: str) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        document = ElementTree.fromstring(self.rfile.read(length))
+        keys = [
+            element.text
+            for element in document.iter()
+            if element.tag.endswith("Key")
+        ]
+        for key in keys:
+            with self.state.lock:
+                self.state.objects.pop((bucket, key), None)
+            self.state.object_path(bucket, key).unlink(missing_ok=True)
+        self._send(200, xml("DeleteResult", ""))
+
+    def _list_uploads(self, bucket: str, prefix: str) -> None:
+        uploads = "".join(
+            f"<Upload><Key>{escape(upload['key'])}</Key>"
+            f"<UploadId>{upload_id}</UploadId>"
+            f"<Initiated>{upload['initiated'].isoformat()}</Initiated>"
+            f"</Upload>"
+            for upload_id, upload in list(self.state.uploads.items())
+            if upload["bucket"] == bucket and upload["key"].startswith(prefix)
+        )
+        self._send(
+            200,
+            xml(
+                "ListMultipartUploadsResult",
+                f"<Bucket>{bucket}</Bucket>"
+                f"<IsTruncated>false</IsTruncated>{uploads}",
+            ),
+        )
+
+    def _list_parts(self, bucket: str, key: str, upload_id: str) -> None:
+        if not (upload := self.state.uploads.get(upload_id)):
+            return self._error(404, "NoSuchUpload")
+        parts = "".join(
+            f"<Part><PartNumber>{number}</PartNumber>"
+            f"<ETag>{escape(part['etag'])}</ETag><Size>{part['size']}</Size>"
+            f"<ChecksumSHA256>{part['checksum']}</ChecksumSHA256>"
+            f"<LastModified>{part['modified'].isoformat()}</LastModified>"
+            f"</Part>"
+            for number, part in sorted(upload["parts"].items())
+        )
+        self._send(
+            200,
+            xml(
+                "ListPartsResult",
+                f"<Bucket>{bucket}</Bucket><Key>{escape(key)}</Key>"
+                f"<UploadId>{upload_id}</UploadId>"
+                f"<IsTruncated>false</IsTruncated>{parts}",
+            ),
+        )
+
+    def do_DELETE(self) -> None:
+        bucket, key, query = self._parse()
+        if upload_id := query.get("uploadId"):
+            with self.state.lock:
+                self.state.uploads.pop(upload_id, None)
+            shutil.rmtree(self.state.root / ".uploads" / upload_id, True)
+        else:
+            with self.state.lock:
+                self.state.objects.pop((bucket, key), None)
+            self.state.object_path(bucket, key).unlink(missing_ok=True)
+        self._send(204)
+
+
+class S3Server:
+    def __init__(self, directory: str, host: str = "127.0.0.1") -> None:
+        self.state = S3State(directory)
+        handler = type("Handler", (S3Handler,), {"state": self.state})
+        self.server = ThreadingHTTPServer((host, 0), handler)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True
+        )
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self) -> "S3Server":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.server.shutdown()
+        self.server.server_close()
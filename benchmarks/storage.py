@@ -0,0 +1,152 @@
+"""Measure Storage upload and download throughput against a local S3.
+
+    python -m benchmarks.storage --sizes 1 20 200 --repeat 3
+    python -m benchmarks.storage --chunk-size 16 --concurrency 4
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import tempfile
+import time
+
+from benchmarks.common import git_revision
+from benchmarks.s3_server import S3Server
+from tgbot.misc.storage import MB, Storage
+
+
+def create_file(path: str, size: int) -> None:
+    # Random data, so nothing along the way can compress it
+    block = os.urandom(MB)
+    with open(path, "wb") as f:
+        for offset in range(0, size, MB):
+            f.write(block[: min(MB, size - offset)])
+
+
+def throughput(size: int, timings: list[float]) -> dict:
+    return {
+        "runs": len(timings),
+        "mean_s": statistics.fmean(timings),
+        "best_s": min(timings),
+        "mb_per_s": size / MB / statistics.median(timings),
+    }
+
+
+def measure_size(
+    storage: Storage, workdir: str, size_mb: int, repeat: int
+) -> dict:
+    size = size_mb * MB
+    path = os.path.join(workdir, f"{size_mb}mb.bin")
+    create_file(path, size)
+    uploads, downloads = [], []
+    for run in range(repeat):
+        key = f"bench/{size_mb}mb-{run}"
+        started = time.perf_counter()
+        if not storage.add_file(path, key):
+            raise RuntimeError(f"Upload of {key} failed")
+        uploads.append(time.perf_counter() - started)
+        destination = os.path.join(workdir, "download.bin")
+        started = time.perf_counter()
+        if not storage.download_file(key, destination):
+            raise RuntimeError(f"Download of {key} failed")
+        downloads.append(time.perf_counter() - started)
+        os.remove(destination)
+    os.remove(path)
+    return {
+        "upload": throughput(size, uploads),
+        "download": throughput(size, downloads),
+    }
+
+
+def measure_resume(storage: Storage, workdir: str, size_mb: int) -> dict:
+    # Upload half of the parts and stop, as if the worker had crashed
+    size = size_mb * MB
+    path = os.path.join(workdir, "resume.bin")
+    create_file(path, size)
+    key = f"bench/resume-{size_mb}mb"
+    upload_id = storage.client.create_multipart_upload(
+        Bucket=storage.bucket_name, Key=key, ChecksumAlgorithm="SHA256"
+    )["UploadId"]
+    parts = -(-size // storage.transfer_config.multipart_chunksize)
+    for number in range(1, parts // 2 + 1):
+        storage.upload_part(path, key, upload_id, number, None)
+    started = time.perf_counter()
+    if not storage.add_file(path, key):
+        raise RuntimeError(f"Resumed upload of {key} failed")
+    elapsed = time.perf_counter() - started
+    os.remove(path)
+    return {
+        "size_mb": size_mb,
+        "parts": parts,
+        "parts_reused": parts // 2,
+        "resume_s": elapsed,
+    }
+
+
+def run(args: argparse.Namespace, workdir: str) -> dict:
+    with S3Server(os.path.join(workdir, "s3")) as server:
+        storage = Storage(
+            "bench",
+            "bench",
+            "studyhelper",
+            "eu-central-1",
+            endpoint_url=server.url,
+            multipart_threshold=args.threshold * MB,
+            multipart_chunksize=args.chunk_size * MB,
+            max_concurrency=args.concurrency,
+        )
+        results = {}
+        for size_mb in args.sizes:
+            results[f"{size_mb}mb"] = measure_size(
+                storage, workdir, size_mb, args.repeat
+            )
+            upload = results[f"{size_mb}mb"]["upload"]["mb_per_s"]
+            download = results[f"{size_mb}mb"]["download"]["mb_per_s"]
+            print(
+                f"{size_mb} MB: upload {upload:.1f} MB/s, "
+                f"download {download:.1f} MB/s"
+            )
+        if args.resume:
+            results["resume"] = measure_resume(storage, workdir, args.resume)
+            print(f"Resumed upload: {results['resume']['resume_s']:.2f} s")
+        requests = server.state.requests
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "threshold_mb": args.threshold,
+        "chunk_size_mb": args.chunk_size,
+        "concurrency": args.concurrency,
+        "requests": requests,
+        "results": results,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="*", default=[1, 20, 200])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--threshold", type=int, default=8, help="MB")
+    parser.add_argument("--chunk-size", type=int, default=8, help="MB")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument(
+        "--resume",
+        type=int,
+        default=64,
+        help="Size of the interrupted upload in MB, 0 to skip",
+    )
+    parser.add_argument("--output", default="bench_storage.json")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    with tempfile.TemporaryDirectory(prefix="storage-") as workdir:
+        report = run(args, workdir)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
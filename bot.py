@@ -6,18 +6,44 @@ from aiogram import Bot, Dispatcher
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 # from aiogram.utils.callback_answer import CallbackAnswerMiddleware
-from loader import bot, dp
+from loader import (
+    bot,
+    dp,
+    execution_policy,
+    notifications,
+    profiler,
+    query_log,
+    upload_queue,
+)
 from tgbot.config import Settings, config
 from tgbot.handlers.scheduled_messages import scheduled_notification
+from tgbot.middlewares.concurrency import (
+    AdmissionMiddleware,
+    ChatOrderingMiddleware,
+    ExecutionPoolMiddleware,
+)
 from tgbot.middlewares.database import DatabaseMiddleware
+from tgbot.middlewares.metrics import (
+    HandlerNameMiddleware,
+    MetricsMiddleware,
+    RequestMetricsMiddleware,
+)
+from tgbot.middlewares.profiling import ProfilingMiddleware
 from tgbot.middlewares.settings import ConfigMiddleware
 from tgbot.middlewares.storage import StorageMiddleware
 from tgbot.middlewares.throttling import ThrottlingMiddleware
 from tgbot.misc.database import Database
+from tgbot.misc.metrics import metrics
+from tgbot.misc.query_guard import QueryGuard
 from tgbot.misc.storage import Storage
+from tgbot.models.backend import query_observers
 from tgbot.models.models import close_db, init
 from tgbot.services.admins_notify import on_startup_notify
+from tgbot.services.backup import DatabaseBackup
 from tgbot.services.setting_commands import set_default_commands
+from tgbot.services.storage_gc import StorageGC
+from tgbot.services.watchdog import LoopWatchdog
+from tgbot.services.web_server import start_web_server
 
 
 def register_all_handlers() -> None:
@@ -31,59 +57,161 @@ async def register_all_commands(bot: Bot) -> None:
     logging.info("Commands registered.")
 
 
-def register_global_middlewares(dp: Dispatcher, config: Settings):
+def create_storage(config: Settings) -> Storage:
+    storage = Storage(
+        config.access_id.get_secret_value(),
+        config.access_key.get_secret_value(),
+        config.bucket_name,
+        config.region_name,
+        config.s3_endpoint_url,
+        config.s3_multipart_threshold,
+        config.s3_multipart_chunksize,
+        config.s3_max_concurrency,
+        config.s3_max_attempts,
+    )
+    metrics.track_boto_client(storage.client)
+    return storage
+
+
+def register_global_middlewares(
+    dp: Dispatcher, config: Settings, storage: Storage
+):
+    metrics.gauges["execution_pool"] = execution_policy.gauges
+    metrics.gauges["notifications"] = notifications.gauges
+    metrics.gauges["upload_queue"] = upload_queue.gauges
     middlewares = [
+        MetricsMiddleware(metrics),
         ConfigMiddleware(config),
-        ThrottlingMiddleware(),
         DatabaseMiddleware(Database()),
-        StorageMiddleware(
-            Storage(
-                config.access_id.get_secret_value(),
-                config.access_key.get_secret_value(),
-                config.bucket_name,
-                config.region_name,
-            )
-        ),
+        StorageMiddleware(storage),
     ]
 
     for middleware in middlewares:
         dp.message.outer_middleware(middleware)
         dp.callback_query.outer_middleware(middleware)
 
+    # Chat ordering must wrap the FSM middleware, which reads the current
+    # state before the handler runs. The global slot is taken once the
+    # update is next in its chat, before any filter queries the database
+    dp.update.outer_middleware.unregister(dp.fsm)
+    dp.update.outer_middleware(ChatOrderingMiddleware(execution_policy))
+    dp.update.outer_middleware(AdmissionMiddleware(execution_policy))
+    dp.update.outer_middleware(dp.fsm)
+    # Inner middlewares see the resolved handler and its flags
+    for middleware in (
+        HandlerNameMiddleware(),
+        ThrottlingMiddleware(),
+        ExecutionPoolMiddleware(execution_policy),
+        ProfilingMiddleware(profiler),
+    ):
+        dp.message.middleware(middleware)
+        dp.callback_query.middleware(middleware)
+
     # dp.callback_query.middleware(
     #     CallbackAnswerMiddleware(pre=True, text="Ready!", show_alert=True)
     # )
     logging.info("Middlewares registered.")
 
 
+def register_request_middlewares(bot: Bot) -> None:
+    bot.session.middleware(RequestMetricsMiddleware(metrics))
+    logging.info("Request middlewares registered.")
+
+
 async def init_database():
-    await init()
+    query_observers.append(metrics.observe_query)
+    query_observers.append(query_log.observe)
+    if config.query_guard:
+        query_guard = QueryGuard(
+            config.query_repeat_limit, config.query_guard_strict
+        )
+        query_observers.append(query_guard.observe)
+    await init(config.database_path, config.archive_path)
     logging.info("Database was inited")
 
 
-async def start_scheduler(bot: Bot):
+async def start_scheduler(
+    bot: Bot, storage_gc: StorageGC, backups: list[DatabaseBackup]
+):
     scheduler = AsyncIOScheduler()
     scheduler.start()
+    if config.backup_interval_hours:
+        for backup in backups:
+            scheduler.add_job(
+                backup.run,
+                trigger="interval",
+                hours=config.backup_interval_hours,
+            )
+    if config.gc_interval_hours:
+        scheduler.add_job(
+            storage_gc.collect,
+            trigger="interval",
+            hours=config.gc_interval_hours,
+            kwargs={"dry_run": config.gc_dry_run},
+        )
     scheduler.add_job(
         scheduled_notification,
         trigger="date",
         run_date=datetime.now() + timedelta(seconds=10),
         kwargs={"bot": bot, "db": Database()},
     )
+    if config.metrics_dump_path:
+        scheduler.add_job(
+            metrics.dump,
+            trigger="interval",
+            minutes=1,
+            args=(config.metrics_dump_path,),
+        )
     logging.info("Scheduler was inited")
 
 
+def start_watchdog(config: Settings) -> LoopWatchdog:
+    watchdog = LoopWatchdog(config.loop_lag_threshold)
+    watchdog.start()
+    metrics.gauges["event_loop_lag_seconds"] = watchdog.percentiles
+    return watchdog
+
+
 async def on_startup(bot: Bot, dispatcher: Dispatcher) -> None:
     register_all_handlers()
-    register_global_middlewares(dispatcher, config)
+    storage = create_storage(config)
+    register_global_middlewares(dispatcher, config, storage)
+    register_request_middlewares(bot)
     await init_database()
     await register_all_commands(bot)
     await on_startup_notify(bot)
-    await start_scheduler(bot)
+    dispatcher["storage_gc"] = StorageGC(
+        storage, Database(), timedelta(hours=config.gc_min_age_hours)
+    )
+    dispatcher["database_backup"] = DatabaseBackup(
+        storage, config.database_path, config.backup_keep
+    )
+    archive_backup = DatabaseBackup(
+        storage, config.archive_path, config.backup_keep
+    )
+    await start_scheduler(
+        bot,
+        dispatcher["storage_gc"],
+        [dispatcher["database_backup"], archive_backup],
+    )
+    upload_queue.start()
+    dispatcher["watchdog"] = start_watchdog(config)
+    dispatcher["web_runner"] = await start_web_server(
+        config.web_host, config.web_port, storage, config.presigned_url_ttl
+    )
     logging.info("Bot started.")
 
 
 async def on_shutdown(dispatcher: Dispatcher) -> None:
+    await dispatcher["web_runner"].cleanup()
+    logging.info("Web server stopped.")
+    await upload_queue.stop()
+    logging.info("Upload queue drained.")
+    await dispatcher["watchdog"].stop()
+    await notifications.flush_all()
+    logging.info("Pending notifications sent.")
+    if config.metrics_dump_path:
+        metrics.dump(config.metrics_dump_path)
     await dispatcher.storage.close()
     logging.info("Storage closed.")
     await close_db()
@@ -105,7 +233,7 @@ if __name__ == "__main__":
         level=logging.INFO,
         filename="bot.log",
         format="%(asctime)s :: %(levelname)s :: %(module)s.%(funcName)s :: %(lineno)d :: %(message)s",  # noqa: E501
-        filemode="w",
+        filemode="a",
     )
     try:
         asyncio.run(main())
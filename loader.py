@@ -1,8 +1,81 @@
 from aiogram import Bot, Dispatcher
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import (
+    PRODUCTION,
+    BareFilesPathWrapper,
+    SimpleFilesPathWrapper,
+    TelegramAPIServer,
+)
 from aiogram.fsm.storage.memory import MemoryStorage
 
-from tgbot.config import config
+from tgbot.config import Settings, config
+from tgbot.misc.broadcast import Broadcaster
+from tgbot.misc.concurrency import ExecutionPolicy
+from tgbot.misc.links import SignedLinks
+from tgbot.misc.notifications import NotificationBuffer
+from tgbot.misc.profiling import Profiler
+from tgbot.misc.query_log import QueryLog
+from tgbot.misc.throttling import Rate
+from tgbot.misc.upload_queue import (
+    LOCAL_MAX_UPLOAD_SIZE,
+    MAX_UPLOAD_SIZE,
+    UploadQueue,
+)
+
+
+def create_api_server(config: Settings) -> TelegramAPIServer:
+    if not config.bot_api_url:
+        return PRODUCTION
+    if config.bot_api_server_dir and config.bot_api_local_dir:
+        # The server runs in a container and its working directory is
+        # mounted into the bot at another path
+        wrap_local_file = SimpleFilesPathWrapper(
+            config.bot_api_server_dir, config.bot_api_local_dir
+        )
+    else:
+        wrap_local_file = BareFilesPathWrapper()
+    return TelegramAPIServer.from_base(
+        config.bot_api_url,
+        is_local=config.bot_api_local,
+        wrap_local_file=wrap_local_file,
+    )
+
 
 storage = MemoryStorage()
-bot = Bot(token=config.bot_token.get_secret_value(), parse_mode="HTML")
+api_server = create_api_server(config)
+bot = Bot(
+    token=config.bot_token.get_secret_value(),
+    parse_mode="HTML",
+    session=AiohttpSession(api=api_server),
+)
 dp = Dispatcher(storage=storage)
+execution_policy = ExecutionPolicy(
+    config.max_concurrent_updates,
+    {"fast": config.fast_pool_size, "slow": config.slow_pool_size},
+)
+profiler = Profiler(
+    config.profile_threshold,
+    config.profile_dir,
+    config.profile_keep,
+    config.profile_interval,
+)
+query_log = QueryLog(config.slow_query_threshold)
+links = SignedLinks(
+    (config.link_secret or config.bot_token).get_secret_value().encode(),
+    config.public_url,
+)
+broadcaster = Broadcaster(
+    bot,
+    # Rates below one message a second still need a burst of one
+    Rate(config.broadcast_rate, max(1, int(config.broadcast_rate))),
+    config.broadcast_concurrency,
+)
+notifications = NotificationBuffer(
+    config.notification_window, config.notification_max_delay
+)
+upload_queue = UploadQueue(
+    config.upload_workers,
+    config.upload_queue_size,
+    config.upload_user_limit,
+    LOCAL_MAX_UPLOAD_SIZE if api_server.is_local else MAX_UPLOAD_SIZE,
+)
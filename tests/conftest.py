@@ -0,0 +1,31 @@
+import asyncio
+import os
+
+import pytest
+
+# Settings are read when the bot modules are imported
+os.environ.setdefault("BOT_TOKEN", "42:TEST")
+os.environ.setdefault("ACCESS_ID", "test")
+os.environ.setdefault("ACCESS_KEY", "test")
+
+from tgbot.misc.database import Database
+from tgbot.models.models import close_db, init
+
+
+@pytest.fixture
+def run_with_db(tmp_path):
+    # Every test gets its own database files and event loop
+    def run(scenario):
+        async def main():
+            await init(
+                str(tmp_path / "db.sqlite3"),
+                str(tmp_path / "archive.sqlite3"),
+            )
+            try:
+                return await scenario(Database())
+            finally:
+                await close_db()
+
+        return asyncio.run(main())
+
+    return run
@@ -0,0 +1,48 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from tgbot.misc.database import Database
+from tgbot.misc.query_guard import QueryCounter
+
+
+class FakeMessage:
+    def __init__(self, user_id: int) -> None:
+        self.from_user = SimpleNamespace(id=user_id)
+        self.answers = []
+        self.edits = []
+
+    async def answer(self, text: str, **kwargs):
+        self.answers.append((text, kwargs))
+        return text
+
+    async def edit_text(self, text: str, **kwargs):
+        self.edits.append(text)
+        return text
+
+
+async def seed_subject(db: Database, tasks: int = 5):
+    teacher = await db.create_teacher(1, "teacher", "Teacher")
+    student = await db.create_student(2, "student", "Student")
+    subject = await db.create_subject("Algebra", "Matrices", teacher.id)
+    await subject.students.add(student)
+    due_date = datetime.now() + timedelta(days=7)
+    for index in range(tasks):
+        await db.create_subject_task(
+            f"Task {index}", "Description", due_date, subject.id
+        )
+    return teacher, student, subject
+
+
+@contextmanager
+def assert_max_queries(limit: int, repeat_limit: int | None = None):
+    with QueryCounter() as counter:
+        yield counter
+    assert counter.total <= limit, (
+        f"Expected at most {limit} queries, got {counter.total}:\n"
+        + "\n".join(f"{n} x {q}" for q, n in counter.shapes.items())
+    )
+    if repeat_limit is not None:
+        assert not (repeated := counter.repeated(repeat_limit)), (
+            f"Queries repeated more than {repeat_limit} times: {repeated}"
+        )
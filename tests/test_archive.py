@@ -0,0 +1,52 @@
+from tests.helpers import seed_subject
+from tgbot.models.archive import archive
+from tgbot.models.models import close_db, init
+
+
+def test_archived_subject_round_trip(run_with_db, tmp_path):
+    async def scenario(db):
+        teacher, student, subject = await seed_subject(db, tasks=2)
+        other = await db.create_subject("Geometry", "", teacher.id)
+        task = (await subject.tasks)[0]
+        solution = await db.create_solution(
+            task.id, student.user_id, "solutions/a.pdf"
+        )
+        solution.grade = 90
+        await solution.save()
+        gradebook = await db.get_gradebook_rows(subject.id)
+
+        moved = await db.archive_subject(subject.id)
+        assert moved == {
+            "subject": 1,
+            "subject_student": 1,
+            "subjecttask": 2,
+            "solution": 1,
+        }
+        assert await db.subject.filter(id=subject.id).count() == 0
+        assert await db.subjecttask.filter(subject_id=subject.id).count() == 0
+        assert await db.solution.all().count() == 0
+        assert await db.subject.filter(id=other.id).count() == 1
+        assert await db.student.all().count() == 1
+
+        # The archive is attached again after a restart
+        await close_db()
+        await init(
+            str(tmp_path / "db.sqlite3"), str(tmp_path / "archive.sqlite3")
+        )
+        assert not archive.attached
+        return (
+            gradebook,
+            await db.get_archived_gradebook_rows(subject.id),
+            await db.get_archived_subjects(teacher.id),
+            await db.get_archived_subject(subject.id),
+            await db.get_referenced_file_links("solutions/", "solutions/~"),
+        )
+
+    gradebook, archived, subjects, subject, links = run_with_db(scenario)
+    assert archived == gradebook
+    assert [row[5] for row in archived] == [90, None]
+    assert subjects == [
+        {"id": subject["id"], "name": "Algebra", "description": "Matrices"}
+    ]
+    assert subject["name"] == "Algebra"
+    assert links == {"solutions/a.pdf"}
@@ -0,0 +1,36 @@
+import sqlite3
+import threading
+
+from tgbot.services.backup import copy_database
+
+
+def test_copy_finishes_while_the_database_is_written(tmp_path):
+    source = str(tmp_path / "db.sqlite3")
+    connection = sqlite3.connect(source)
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("CREATE TABLE item (id INTEGER PRIMARY KEY, data)")
+    connection.executemany(
+        "INSERT INTO item (data) VALUES (?)", [(b"x" * 1000,)] * 5000
+    )
+    connection.commit()
+    stopped = threading.Event()
+
+    def write():
+        writer = sqlite3.connect(source, isolation_level=None)
+        while not stopped.is_set():
+            writer.execute("INSERT INTO item (data) VALUES ('y')")
+        writer.close()
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    try:
+        copy_database(source, str(tmp_path / "copy.sqlite3"))
+    finally:
+        stopped.set()
+        thread.join()
+    copy = sqlite3.connect(str(tmp_path / "copy.sqlite3"))
+    assert copy.execute("PRAGMA integrity_check").fetchone() == ("ok",)
+    (count,) = copy.execute("SELECT count(*) FROM item").fetchone()
+    assert count >= 5000
+    copy.close()
+    connection.close()
@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+from tgbot.misc.concurrency import ExecutionPolicy
+
+
+async def handle(policy: ExecutionPolicy, pool: str, duration: float):
+    async with policy.admit():
+        async with policy.slot(pool):
+            assert policy.total.active <= policy.total.size
+            await asyncio.sleep(duration)
+
+
+def test_fast_handlers_pass_a_saturated_slow_pool():
+    async def scenario():
+        policy = ExecutionPolicy(8, {"fast": 6, "slow": 2})
+        slow = [
+            asyncio.create_task(handle(policy, "slow", 0.2))
+            for _ in range(20)
+        ]
+        await asyncio.sleep(0.01)
+        started = time.perf_counter()
+        await handle(policy, "fast", 0)
+        waited = time.perf_counter() - started
+        await asyncio.gather(*slow)
+        return waited, policy.stats()
+
+    waited, stats = asyncio.run(scenario())
+    assert waited < 0.1
+    assert stats["total"]["active"] == 0
+    assert stats["pools"]["slow"]["active"] == 0
+
+
+def test_global_limit_bounds_all_pools():
+    async def scenario():
+        policy = ExecutionPolicy(3, {"fast": 3, "slow": 3})
+        peak = 0
+
+        async def tracked(pool: str):
+            nonlocal peak
+            async with policy.admit(), policy.slot(pool):
+                peak = max(peak, policy.total.active)
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(
+            *(tracked("slow" if i % 2 else "fast") for i in range(12))
+        )
+        return peak
+
+    assert asyncio.run(scenario()) == 3
+
+
+def test_cancelled_update_gives_its_slots_back():
+    async def scenario():
+        policy = ExecutionPolicy(1, {"fast": 1, "slow": 1})
+        blocker = asyncio.create_task(handle(policy, "slow", 0.1))
+        await asyncio.sleep(0.01)
+        waiting = asyncio.create_task(handle(policy, "slow", 0))
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        await asyncio.gather(blocker, waiting, return_exceptions=True)
+        await handle(policy, "fast", 0)
+        return policy.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["total"] == {"size": 1, "active": 0, "waiting": 0}
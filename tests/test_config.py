@@ -0,0 +1,14 @@
+import pytest
+from pydantic import ValidationError
+
+from tgbot.config import Settings
+
+
+@pytest.mark.parametrize("rate", [0, -1])
+def test_broadcast_rate_must_be_positive(rate):
+    with pytest.raises(ValidationError):
+        Settings(broadcast_rate=rate)
+
+
+def test_slow_broadcast_rate_is_allowed():
+    assert Settings(broadcast_rate=0.5).broadcast_rate == 0.5
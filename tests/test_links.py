@@ -0,0 +1,13 @@
+from json import dumps
+
+from aiogram.utils.deep_linking import create_deep_link
+
+from tgbot.misc.utils import utils
+
+
+def test_every_action_fits_in_a_start_link():
+    # Raises when the payload is longer than Telegram allows
+    for key in utils:
+        create_deep_link(
+            "bot", "start", dumps({"key": key, "id": 10**9}), encode=True
+        )
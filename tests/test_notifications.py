@@ -0,0 +1,30 @@
+import asyncio
+
+from tgbot.misc.notifications import SolutionNotice, deliver_solutions
+
+
+class FakeBot:
+    def __init__(self) -> None:
+        self.messages = []
+
+    async def send_message(self, chat_id: int, text: str, **kwargs):
+        self.messages.append(text)
+
+
+def notice(username: str, updated: bool = False) -> SolutionNotice:
+    return SolutionNotice("Matrices", "file", "caption", username, updated)
+
+
+def test_digest_counts_students_not_uploads():
+    bot = FakeBot()
+    notices = [
+        notice("anna"),
+        notice("anna", updated=True),
+        notice("anna", updated=True),
+        notice("bohdan", updated=True),
+    ]
+    asyncio.run(deliver_solutions(bot, 1, notices))
+    (text,) = bot.messages
+    assert text.startswith("2 solutions (1 updated) for <b>Matrices</b>")
+    assert "* @anna\n" in text
+    assert "* @bohdan (updated)" in text
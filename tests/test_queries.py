@@ -0,0 +1,38 @@
+from tests.helpers import FakeMessage, assert_max_queries, seed_subject
+from tgbot.misc.utils import see_tasks
+
+
+def test_see_tasks_queries_do_not_grow_with_tasks(run_with_db):
+    async def scenario(db):
+        _, student, subject = await seed_subject(db, tasks=10)
+        task = (await subject.tasks)[0]
+        await db.create_solution(task.id, student.user_id, "key")
+        message = FakeMessage(student.user_id)
+        with assert_max_queries(4, repeat_limit=1):
+            await see_tasks(message, {"id": subject.id}, db)
+        return message.answers
+
+    answers = run_with_db(scenario)
+    # Header, ten tasks and the closing hint
+    assert len(answers) == 12
+    graded = [
+        answer
+        for answer in answers[1:-1]
+        if "Your grade" in str(answer[1]["reply_markup"])
+    ]
+    assert len(graded) == 1
+
+
+def test_see_tasks_shows_teacher_buttons(run_with_db):
+    async def scenario(db):
+        teacher, _, subject = await seed_subject(db, tasks=3)
+        message = FakeMessage(teacher.user_id)
+        with assert_max_queries(4, repeat_limit=1):
+            await see_tasks(message, {"id": subject.id}, db)
+        return message.answers
+
+    answers = run_with_db(scenario)
+    assert all(
+        "show_solutions" in str(answer[1]["reply_markup"])
+        for answer in answers[1:-1]
+    )
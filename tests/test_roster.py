@@ -0,0 +1,21 @@
+from tests.helpers import seed_subject
+from tgbot.misc.roster import parse_roster, unresolved_entries
+
+
+def test_roster_matches_usernames_in_any_case(run_with_db):
+    user_ids, usernames, invalid = parse_roster(
+        "@Student, TEACHER\n@missing_user 999"
+    )
+    assert invalid == []
+
+    async def scenario(db):
+        await seed_subject(db, tasks=0)
+        return await db.get_students_by_roster(user_ids, usernames)
+
+    students = run_with_db(scenario)
+    assert [student.username for student in students] == ["student"]
+    assert unresolved_entries(user_ids, usernames, students) == [
+        "999",
+        "@TEACHER",
+        "@missing_user",
+    ]
@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from tests.helpers import seed_subject
+from tgbot.handlers import teacher as handlers
+from tgbot.misc.search import (
+    MAX_TERMS,
+    SearchResult,
+    format_result,
+    match_query,
+)
+
+DUE_DATE = datetime.now() + timedelta(days=7)
+
+
+def results(rows) -> list[tuple[str, str]]:
+    return [(row[0], row[4]) for row in rows]
+
+
+def test_match_query_quotes_every_term():
+    assert match_query('alg" OR title:x* -(') == '"alg"* "OR"* "title"* "x"*'
+    assert match_query("  ?! ") is None
+    assert match_query(" ".join("w" * 20)).count("*") == MAX_TERMS
+
+
+def test_search_ranks_names_and_highlights_matches(run_with_db):
+    async def scenario(db):
+        teacher, _, subject = await seed_subject(db, tasks=0)
+        await db.create_subject("Geometry", "Uses algebra", teacher.id)
+        await db.create_subject_task(
+            "Linear algebra", "Vectors", DUE_DATE, subject.id
+        )
+        return await db.search(teacher.id, match_query("alge"), 10)
+
+    rows = run_with_db(scenario)
+    assert results(rows) == [
+        ("subject", "\x02Algebra\x03"),
+        ("task", "Linear \x02algebra\x03"),
+        ("subject", "Geometry"),
+    ]
+    assert rows[2][5] == "Uses \x02algebra\x03"
+    text = format_result(SearchResult(*rows[1]), "https://t.me/bot")
+    assert text == (
+        "Task Linear <b>algebra</b> in Algebra: Vectors "
+        '<a href="https://t.me/bot">Open</a>'
+    )
+
+
+def test_search_finds_students_and_their_solutions(run_with_db):
+    async def scenario(db):
+        teacher, student, subject = await seed_subject(db, tasks=1)
+        task = (await subject.tasks)[0]
+        await db.create_solution(task.id, student.user_id, "key")
+        return await db.search(teacher.id, match_query("stud"), 10)
+
+    rows = run_with_db(scenario)
+    assert sorted(row[0] for row in rows) == ["solution", "student"]
+    solution = SearchResult(*next(row for row in rows if row[0] == "solution"))
+    assert format_result(solution, "link").startswith(
+        "Solution of <b>Student</b> for Task 0 in Algebra"
+    )
+
+
+def test_search_is_limited_to_the_teacher(run_with_db):
+    async def scenario(db):
+        teacher, _, _ = await seed_subject(db, tasks=0)
+        other = await db.create_teacher(3, "other", "Other")
+        await db.create_subject("Algebra II", "", other.id)
+        return (
+            await db.search(teacher.id, match_query("algebra"), 10),
+            await db.search(other.id, match_query("matrices"), 10),
+        )
+
+    own, foreign = run_with_db(scenario)
+    assert results(own) == [("subject", "\x02Algebra\x03")]
+    assert foreign == []
+
+
+def test_index_follows_updates_imports_and_archiving(run_with_db):
+    async def scenario(db):
+        teacher, _, subject = await seed_subject(db, tasks=0)
+        subject.name = "Calculus"
+        await subject.save()
+        renamed = await db.search(teacher.id, match_query("algebra"), 10)
+        await db.create_subject_tasks(
+            subject.id,
+            [{"name": "Limits", "description": "", "due_date": DUE_DATE}],
+        )
+        imported = await db.search(teacher.id, match_query("limits"), 10)
+        await db.archive_subject(subject.id)
+        archived = await db.search(teacher.id, match_query("calculus"), 10)
+        return renamed, imported, archived
+
+    renamed, imported, archived = run_with_db(scenario)
+    assert renamed == []
+    assert results(imported) == [("task", "\x02Limits\x03")]
+    assert archived == []
+
+
+@pytest.fixture
+def links(monkeypatch):
+    async def create_link(subject_id: int, key: str) -> str:
+        return f"https://t.me/bot?start={key}{subject_id}"
+
+    monkeypatch.setattr(handlers, "create_link", create_link)
+
+
+def test_search_pages(run_with_db, links):
+    async def scenario(db):
+        teacher, _, _ = await seed_subject(db, tasks=12)
+        return [
+            await handlers.render_search_page(db, teacher, "task", page)
+            for page in range(3)
+        ]
+
+    (first, first_keyboard), (second, second_keyboard), (last, _) = (
+        run_with_db(scenario)
+    )
+    assert first.count("\n") == handlers.PAGE_SIZE
+    assert first.splitlines()[-1].startswith("10. Task <b>Task</b>")
+    assert [button.text for button in first_keyboard.inline_keyboard[0]] == [
+        "Next ➡️"
+    ]
+    assert [line.split(".")[0] for line in second.splitlines()[1:]] == [
+        "11",
+        "12",
+    ]
+    assert [button.text for button in second_keyboard.inline_keyboard[0]] == [
+        "⬅️ Previous"
+    ]
+    assert last == "No more results"
@@ -0,0 +1,76 @@
+import asyncio
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+
+from tgbot.misc.solution_archive import export_solutions
+
+
+class FakeBot:
+    def __init__(self) -> None:
+        self.documents = {}
+
+    async def send_document(self, chat_id: int, document, **kwargs):
+        with zipfile.ZipFile(document.path) as archive:
+            self.documents[document.filename] = archive.namelist()
+
+
+class FakeStorage:
+    def __init__(self, sizes: dict[str, int], broken=()) -> None:
+        self.sizes = sizes
+        self.broken = broken
+        self.downloads = []
+
+    def download_file(self, file_name: str, destination: str) -> bool:
+        self.downloads.append(file_name)
+        if file_name in self.broken:
+            raise OSError("Connection reset")
+        with open(destination, "wb") as file:
+            file.write(b"x" * self.sizes[file_name])
+        return True
+
+
+def solution(id: int, size_key: str, name=None, username=None):
+    student = SimpleNamespace(name=name, username=username, user_id=id)
+    return SimpleNamespace(
+        id=id, file_link=size_key, file_name=f"{id}.pdf", student=student
+    )
+
+
+def test_oversized_solutions_are_left_out_of_the_archive():
+    bot = FakeBot()
+    storage = FakeStorage({"small": 10, "large": 2000})
+    solutions = [
+        solution(1, "small", name="Anna"),
+        solution(2, "large", name="Bohdan"),
+        solution(3, "small", username="student"),
+        solution(4, "small"),
+    ]
+    exported, oversized = asyncio.run(
+        export_solutions(bot, storage, 1, "Task", solutions, part_size=1000)
+    )
+    assert exported == 3
+    assert oversized == [solutions[1]]
+    assert sorted(bot.documents["Task.zip"]) == [
+        "4/4.pdf",
+        "Anna/1.pdf",
+        "student/3.pdf",
+    ]
+
+
+def test_failed_download_cancels_the_others():
+    bot = FakeBot()
+    storage = FakeStorage({"small": 10}, broken={"broken"})
+    solutions = [solution(1, "broken")] + [
+        solution(index, "small") for index in range(2, 6)
+    ]
+
+    async def scenario():
+        with pytest.raises(OSError):
+            await export_solutions(bot, storage, 1, "Task", solutions, 1)
+        return asyncio.all_tasks() - {asyncio.current_task()}
+
+    assert asyncio.run(scenario()) == set()
+    assert len(storage.downloads) < len(solutions)
+    assert bot.documents == {}
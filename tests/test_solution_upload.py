@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+
+import pytest
+
+from tests.helpers import FakeMessage, seed_subject
+from tgbot.handlers import tasks
+
+
+class FakeStorage:
+    def __init__(self) -> None:
+        self.deleted = []
+
+    def delete_file(self, key: str) -> None:
+        self.deleted.append(key)
+
+
+@pytest.fixture
+def notices(monkeypatch):
+    sent = []
+    monkeypatch.setattr(
+        tasks, "notify_teacher", lambda *args: sent.append(args[-1])
+    )
+    return sent
+
+
+def upload(user_id: int) -> FakeMessage:
+    message = FakeMessage(user_id)
+    message.from_user.username = "student"
+    message.document = SimpleNamespace(file_name="a.pdf", file_id="file")
+    return message
+
+
+def test_reupload_of_the_same_file_keeps_one_reference(
+    run_with_db, monkeypatch, notices
+):
+    storage = FakeStorage()
+
+    async def store(bot, storage, db, document, on_downloaded):
+        await db.acquire_solution_file("solutions/a.pdf", 10)
+        return "solutions/a.pdf"
+
+    monkeypatch.setattr(tasks, "store_solution_file", store)
+
+    async def scenario(db):
+        _, student, subject = await seed_subject(db, tasks=1)
+        task = (await subject.tasks)[0]
+        data = {"student_id": student.user_id, "subject_task_id": task.id}
+        status = FakeMessage(student.user_id)
+        for _ in range(3):
+            await tasks.process_solution(
+                upload(student.user_id), status, data, db, None, storage
+            )
+        solution_file = await db.solutionfile.get(key="solutions/a.pdf")
+        return solution_file.ref_count, status.edits
+
+    ref_count, edits = run_with_db(scenario)
+    assert ref_count == 1
+    assert storage.deleted == []
+    assert edits[-1] == "Your solution was updated!"
+    assert [notice.updated for notice in notices] == [False, True, True]
+
+
+def test_failed_upload_updates_the_status(run_with_db, monkeypatch, caplog):
+    async def store(bot, storage, db, document, on_downloaded):
+        raise ConnectionError("S3 is unreachable")
+
+    monkeypatch.setattr(tasks, "store_solution_file", store)
+
+    async def scenario(db):
+        _, student, subject = await seed_subject(db, tasks=1)
+        task = (await subject.tasks)[0]
+        data = {"student_id": student.user_id, "subject_task_id": task.id}
+        status = FakeMessage(student.user_id)
+        await tasks.process_solution(
+            upload(student.user_id), status, data, db, None, FakeStorage()
+        )
+        return status.edits, await db.solution.all().count()
+
+    edits, solutions = run_with_db(scenario)
+    assert edits == [
+        "Downloading your solution...",
+        "Error while saving your solution. Try again later.",
+    ]
+    assert solutions == 0
+    assert "S3 is unreachable" in caplog.text
@@ -0,0 +1,9 @@
+from tgbot.misc.storage import content_disposition
+
+
+def test_content_disposition_escapes_download_name():
+    header = content_disposition('Звіт "1"\\.pdf')
+    assert header == (
+        'attachment; filename="____ _1__.pdf"; '
+        "filename*=UTF-8''%D0%97%D0%B2%D1%96%D1%82%20%221%22%5C.pdf"
+    )
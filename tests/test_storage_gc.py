@@ -0,0 +1,43 @@
+from datetime import datetime, timedelta, timezone
+
+from tgbot.services.storage_gc import StorageGC
+
+OLD = datetime.now(timezone.utc) - timedelta(days=30)
+
+
+class FakeStorage:
+    def __init__(self, keys: list[str]) -> None:
+        self.keys = sorted(keys)
+        self.deleted = []
+
+    def iter_object_pages(self, prefix: str = "", page_size: int = 1000):
+        yield [
+            {"Key": key, "Size": 10, "LastModified": OLD} for key in self.keys
+        ]
+
+    def delete_files(self, keys: list[str]) -> list[str]:
+        self.deleted.extend(keys)
+        return keys
+
+    def list_stale_uploads(self, cutoff: datetime) -> list[dict]:
+        return []
+
+
+def test_gc_keeps_objects_acquired_by_a_pending_upload(run_with_db):
+    storage = FakeStorage(["solutions/orphan", "solutions/reused"])
+
+    async def scenario(db):
+        for key in storage.keys:
+            await db.acquire_solution_file(key, 10)
+            await db.release_solution_file(key)
+        # A dedup hit whose Solution row is not written yet
+        await db.acquire_solution_file("solutions/reused", 10)
+        await db.solutionfile.filter(key="solutions/orphan").update(
+            updated_at=OLD
+        )
+        return await StorageGC(storage, db).collect()
+
+    report = run_with_db(scenario)
+    assert storage.deleted == ["solutions/orphan"]
+    assert report.orphans == 2
+    assert report.deleted == 1
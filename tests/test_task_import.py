@@ -0,0 +1,37 @@
+import json
+from datetime import date, timedelta
+
+from tests.helpers import seed_subject
+from tgbot.filters.date_validation import DATE_FORMAT
+from tgbot.misc.task_import import parse_tasks
+
+
+def test_imported_tasks_are_created(run_with_db):
+    due_date = date.today() + timedelta(days=3)
+    content = (
+        "name,description,due_date\n"
+        f"Matrices,Multiply two matrices,{due_date.strftime(DATE_FORMAT)}\n"
+        "Vectors,,01/01/2100\n"
+        "Limits,Compute limits,01/01/2000\n"
+    ).encode()
+    tasks, rejected = parse_tasks(content, "tasks.csv")
+    assert [number for number, _ in rejected] == [3, 4]
+
+    async def scenario(db):
+        _, _, subject = await seed_subject(db, tasks=0)
+        created = await db.create_subject_tasks(subject.id, tasks)
+        return created, await subject.tasks
+
+    created, stored = run_with_db(scenario)
+    assert created == 1
+    assert [task.name for task in stored] == ["Matrices"]
+    assert stored[0].due_date.date() == due_date
+
+
+def test_json_import_numbers_rows_from_one():
+    content = json.dumps(
+        [{"name": "Matrices", "description": "", "due_date": "01/01/2100"}]
+    ).encode()
+    tasks, rejected = parse_tasks(content, "tasks.json")
+    assert tasks == []
+    assert rejected == [(1, "description is empty")]
@@ -0,0 +1,68 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from tests.helpers import FakeMessage
+from tgbot.middlewares.throttling import ThrottlingMiddleware
+from tgbot.misc import throttling
+from tgbot.misc.throttling import Rate, TokenBucket
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(throttling.time, "monotonic", lambda: now.value)
+    return now
+
+
+def test_bucket_admits_burst_then_recovers(clock):
+    bucket = TokenBucket(Rate(per_second=0.5, burst=3))
+    assert [bucket.consume(1) for _ in range(3)] == [0, 0, 0]
+    assert bucket.consume(1) == pytest.approx(2)
+    # Other users have their own bucket
+    assert bucket.consume(2) == 0
+
+    clock.value += 1
+    assert bucket.consume(1) == pytest.approx(1)
+    clock.value += 1
+    assert bucket.consume(1) == 0
+    assert bucket.consume(1) == pytest.approx(2)
+
+    # An idle user gets the whole burst back, not more
+    clock.value += 60
+    assert [bucket.consume(1) for _ in range(4)][-1] == pytest.approx(2)
+
+
+def test_bucket_prunes_idle_users(clock):
+    bucket = TokenBucket(Rate(per_second=1, burst=2), prune_interval=10)
+    for user_id in range(5):
+        bucket.consume(user_id)
+    assert len(bucket) == 5
+    clock.value += 11
+    bucket.consume(42)
+    assert len(bucket) == 1
+
+
+def test_middleware_warns_once_per_cooldown(clock):
+    middleware = ThrottlingMiddleware({"upload": Rate(0.1, burst=2)})
+    data = {"handler": SimpleNamespace(flags={"throttling_key": "upload"})}
+    message = FakeMessage(1)
+    handled = []
+
+    async def handler(event, data):
+        handled.append(event)
+
+    async def send(times: int):
+        for _ in range(times):
+            await middleware(handler, message, data)
+
+    asyncio.run(send(4))
+    assert len(handled) == 2
+    assert [text for text, _ in message.answers] == [
+        "Too many requests. Try again in 10 s."
+    ]
+
+    clock.value += 10
+    asyncio.run(send(1))
+    assert len(handled) == 3
@@ -1,6 +1,6 @@
 from typing import List
 
-from pydantic import SecretStr
+from pydantic import PositiveFloat, SecretStr
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -10,7 +10,48 @@ class Settings(BaseSettings):
     access_key: SecretStr
     bucket_name: str = "studyhelper"
     region_name: str = "eu-central-1"
+    s3_endpoint_url: str | None = None
+    s3_multipart_threshold: int = 8 * 1024 * 1024
+    s3_multipart_chunksize: int = 8 * 1024 * 1024
+    s3_max_concurrency: int = 10
+    s3_max_attempts: int = 5
+    gc_interval_hours: float = 24
+    gc_min_age_hours: float = 24
+    gc_dry_run: bool = False
+    database_path: str = "db.sqlite3"
+    archive_path: str = "archive.sqlite3"
+    backup_interval_hours: float = 24
+    backup_keep: int = 7
     admins: List[int] = [353057906]
+    max_concurrent_updates: int = 32
+    fast_pool_size: int = 24
+    slow_pool_size: int = 4
+    web_host: str = "127.0.0.1"
+    web_port: int = 8080
+    public_url: str | None = None
+    link_secret: SecretStr | None = None
+    presigned_url_ttl: int = 300
+    metrics_dump_path: str | None = None
+    loop_lag_threshold: float = 0.5
+    profile_threshold: float = 1.0
+    profile_dir: str = "profiles"
+    profile_keep: int = 50
+    profile_interval: float = 0.005
+    slow_query_threshold: float = 0.1
+    query_guard: bool = False
+    query_guard_strict: bool = False
+    query_repeat_limit: int = 10
+    broadcast_rate: PositiveFloat = 25
+    broadcast_concurrency: int = 8
+    notification_window: float = 60
+    notification_max_delay: float = 600
+    upload_workers: int = 4
+    upload_queue_size: int = 50
+    upload_user_limit: int = 2
+    bot_api_url: str | None = None
+    bot_api_local: bool = False
+    bot_api_server_dir: str | None = None
+    bot_api_local_dir: str | None = None
 
     model_config = SettingsConfigDict(
         env_file=".env",
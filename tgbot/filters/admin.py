@@ -0,0 +1,14 @@
+from aiogram.filters import BaseFilter
+from aiogram.types import CallbackQuery, Message
+
+from tgbot.config import Settings
+
+
+class IsAdminFilter(BaseFilter):
+    def __init__(self):
+        super().__init__()
+
+    async def __call__(
+        self, event: Message | CallbackQuery, config: Settings
+    ) -> bool:
+        return event.from_user.id in config.admins
@@ -3,6 +3,18 @@ from datetime import date, datetime
 from aiogram.filters import BaseFilter
 from aiogram.types import CallbackQuery, Message
 
+DATE_FORMAT = "%d/%m/%Y"
+
+
+def parse_due_date(text: str | None) -> date | None:
+    try:
+        validated_date = datetime.strptime(text or "", DATE_FORMAT).date()
+    except ValueError:
+        return None
+    if validated_date >= date.today():
+        return validated_date
+    return None
+
 
 class IsValidDateFilter(BaseFilter):
     def __init__(self):
@@ -11,13 +23,6 @@ class IsValidDateFilter(BaseFilter):
     async def __call__(
         self, event: Message | CallbackQuery
     ) -> bool | dict[str, str]:
-        try:
-            if (
-                validated_date := datetime.strptime(
-                    event.text, "%d/%m/%Y"
-                ).date()
-            ) and validated_date >= date.today():
-                return {"validated_date": validated_date.isoformat()}
-            return False
-        except ValueError:
-            return False
+        if validated_date := parse_due_date(event.text):
+            return {"validated_date": validated_date.isoformat()}
+        return False
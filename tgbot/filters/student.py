@@ -12,5 +12,8 @@ class IsStudentFilter(BaseFilter):
         self, event: Message | CallbackQuery, db: Database
     ) -> bool | dict[str, Student]:
         if student := await db.get_student(event.from_user.id):
+            if student.is_blocked:
+                # Writing to the bot means the student has unblocked it
+                await db.set_students_blocked([student.user_id], False)
             return {"student": student}
         return False
@@ -1,4 +1,5 @@
 from . import (
+    admin,
     commands,
     communication,
     student,
@@ -0,0 +1,147 @@
+import asyncio
+
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+from aiogram.utils.markdown import hbold, hcode
+
+from loader import dp, profiler, query_log
+from tgbot.filters.admin import IsAdminFilter
+from tgbot.services.backup import DatabaseBackup
+from tgbot.services.storage_gc import StorageGC
+
+router = Router()
+router.message.filter(IsAdminFilter())
+dp.include_router(router)
+
+
+def get_profiling_targets(target: str) -> set:
+    return profiler.users if target.isdigit() else profiler.handlers
+
+
+@router.message(Command("profile_on"))
+async def enable_profiling(
+    message: Message, command: CommandObject
+) -> Message:
+    if not (target := command.args):
+        return await message.answer(
+            "Usage: /profile_on <handler name or user id>"
+        )
+    targets = get_profiling_targets(target)
+    targets.add(int(target) if target.isdigit() else target)
+    return await message.answer(
+        f"Profiling enabled for {hbold(target)}. Updates slower than "
+        f"{profiler.threshold}s will be saved to {profiler.directory}"
+    )
+
+
+@router.message(Command("profile_off"))
+async def disable_profiling(
+    message: Message, command: CommandObject
+) -> Message:
+    if not (target := command.args):
+        profiler.handlers.clear()
+        profiler.users.clear()
+        return await message.answer("Profiling disabled for everything")
+    targets = get_profiling_targets(target)
+    targets.discard(int(target) if target.isdigit() else target)
+    return await message.answer(f"Profiling disabled for {hbold(target)}")
+
+
+@router.message(Command("profiling"))
+async def show_profiling(message: Message) -> Message:
+    handlers = ", ".join(sorted(profiler.handlers)) or "none"
+    users = ", ".join(map(str, sorted(profiler.users))) or "none"
+    return await message.answer(
+        f"{hbold('Handlers')}: {handlers}\n"
+        f"{hbold('Users')}: {users}\n"
+        f"{hbold('Threshold')}: {profiler.threshold}s"
+    )
+
+
+@router.message(Command("slow_queries"))
+async def show_slow_queries(
+    message: Message, command: CommandObject
+) -> Message:
+    if command.args == "reset":
+        query_log.reset()
+        return await message.answer("Query statistics were reset")
+    if not (shapes := query_log.top()):
+        return await message.answer("No queries were recorded yet")
+    rows = [
+        f"{index}. {hbold(shape.caller)}: {shape.count} calls, "
+        f"total {shape.total * 1000:.1f} ms, max {shape.max * 1000:.1f} ms\n"
+        f"{hcode(query[:300])}"
+        for index, (query, shape) in enumerate(shapes, 1)
+    ]
+    return await message.answer("\n\n".join(rows))
+
+
+def format_size(size: int) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
+@router.message(Command("storage_gc"), flags={"pool": "slow"})
+async def collect_storage_garbage(
+    message: Message, command: CommandObject, storage_gc: StorageGC
+) -> Message:
+    if storage_gc.running:
+        return await message.answer("Storage GC is already running")
+    dry_run = command.args != "run"
+    await message.answer(
+        "Looking for orphaned files..."
+        if dry_run
+        else "Deleting orphaned files..."
+    )
+    report = await storage_gc.collect(dry_run=dry_run)
+    lines = [
+        (
+            f"{hbold('Scanned')}: {report.scanned} files, "
+            f"{format_size(report.scanned_bytes)}"
+        ),
+        f"{hbold('Orphaned')}: {report.orphans} files",
+        f"{hbold('Abandoned uploads')}: {report.stale_uploads}",
+    ]
+    if dry_run:
+        lines.append(
+            f"{hbold('Can be reclaimed')}: "
+            f"{format_size(report.reclaimed_bytes)}\n"
+            "Use /storage_gc run to delete them"
+        )
+    else:
+        lines.append(
+            f"{hbold('Deleted')}: {report.deleted} files, "
+            f"{format_size(report.reclaimed_bytes)} reclaimed\n"
+            f"{hbold('Aborted uploads')}: {report.aborted_uploads}"
+        )
+    return await message.answer("\n".join(lines))
+
+
+@router.message(Command("backup"), flags={"pool": "slow"})
+async def create_backup(
+    message: Message, database_backup: DatabaseBackup
+) -> Message:
+    await message.answer("Backing up the database...")
+    if key := await database_backup.run():
+        return await message.answer(f"Database backup saved as {hcode(key)}")
+    return await message.answer("Database backup failed, check the logs")
+
+
+@router.message(Command("backups"), flags={"pool": "slow"})
+async def list_backups(
+    message: Message, database_backup: DatabaseBackup
+) -> Message:
+    if not (backups := await asyncio.to_thread(database_backup.list_backups)):
+        return await message.answer("There are no database backups")
+    rows = [
+        f"{hcode(item['Key'])}: {format_size(item['Size'])}"
+        for item in backups
+    ]
+    return await message.answer(
+        "\n".join(rows) + "\n\nRestore with: "
+        + hcode("python -m tgbot.services.backup restore <key>")
+    )
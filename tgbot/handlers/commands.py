@@ -51,7 +51,7 @@ async def cancel_handler(message: Message, state: FSMContext) -> Message:
     )
 
 
-@router.message(CommandStart(deep_link=True))
+@router.message(CommandStart(deep_link=True), flags={"pool": "slow"})
 async def deep_link_handler(
     message: Message, command: CommandObject, db: Database, state: FSMContext
 ) -> Message:
@@ -73,5 +73,6 @@ async def start_handler(message: Message) -> Message:
 @router.message(Command("help"))
 async def help_handler(message: Message) -> Message:
     return await message.answer(
-        "Available commands: /register_student, /register_teacher\nAdministator: @sylvenis"
+        "Available commands: /register_student, /register_teacher\n"
+        "Administator: @sylvenis"
     )
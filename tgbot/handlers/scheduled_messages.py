@@ -22,7 +22,8 @@ async def scheduled_notification(bot: Bot, db: Database) -> None:
             )
             task_text = (
                 "\n".join(
-                    f"{task.name}. Due date: {task.due_date.strftime('%d/%m/%Y')}"
+                    f"{task.name}. "
+                    f"Due date: {task.due_date.strftime('%d/%m/%Y')}"
                     for task in tasks
                 )
                 or "No upcoming tasks"
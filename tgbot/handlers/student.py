@@ -1,15 +1,16 @@
 from datetime import datetime, timezone
 
-from aiogram import F, Router
+from aiogram import Bot, F, Router
 from aiogram.filters import Command
 from aiogram.types import CallbackQuery, Message
-from aiogram.utils.markdown import hbold, hlink
+from aiogram.utils.markdown import hbold
 
 from loader import dp
 from tgbot.filters.student import IsStudentFilter
 from tgbot.keyboards.inline.callbacks import TaskCallbackFactory
 from tgbot.keyboards.inline.solution_keyboard import solution_keyboard
 from tgbot.misc.database import Database
+from tgbot.misc.solution_files import send_solution
 from tgbot.misc.storage import Storage
 from tgbot.misc.texts import STUDENT_HELP_TEXT
 from tgbot.misc.utils import create_subject_message, gather_upcoming_tasks
@@ -74,6 +75,7 @@ async def see_my_solution(
     callback: CallbackQuery,
     callback_data: TaskCallbackFactory,
     db: Database,
+    bot: Bot,
     storage: Storage,
 ) -> Message:
     if solution := await db.get_student_solution(
@@ -83,10 +85,14 @@ async def see_my_solution(
             [
                 f"{hbold('Student')}: {solution.student.name}",
                 f"{hbold('Grade')}: {solution.grade}",
-                f"{hbold('File link')}: {hlink('Click here', storage.create_presigned_url(solution.file_link))}",
             ]
         )
-        await callback.message.answer(
+        await send_solution(
+            bot,
+            storage,
+            db,
+            callback.message.chat.id,
+            solution,
             text,
             reply_markup=solution_keyboard(solution.id, solution.grade),
         )
@@ -1,16 +1,25 @@
+import logging
 from datetime import date
+from functools import partial
 
 from aiogram import Bot, F, Router
+from aiogram.exceptions import TelegramBadRequest
 from aiogram.fsm.context import FSMContext
 from aiogram.types import CallbackQuery, Message
-from aiogram.utils.markdown import hbold, hlink
+from aiogram.utils.markdown import hbold
 
-from loader import dp
+from loader import dp, notifications, upload_queue
 from tgbot.filters.student import IsStudentFilter
 from tgbot.keyboards.inline.callbacks import TaskCallbackFactory
 from tgbot.misc.database import Database
+from tgbot.misc.notifications import SolutionNotice, deliver_solutions
+from tgbot.misc.solution_files import (
+    release_solution_file,
+    store_solution_file,
+)
 from tgbot.misc.storage import Storage
-from tgbot.misc.utils import delete_file
+from tgbot.misc.upload_queue import Admission
+from tgbot.models.models import SubjectTask
 from tgbot.states.states import Solution
 
 router = Router()
@@ -19,6 +28,21 @@ router.callback_query.filter(IsStudentFilter())
 dp.include_router(router)
 
 
+def notify_teacher(
+    bot: Bot,
+    teacher_id: int,
+    subject_task: SubjectTask,
+    notice: SolutionNotice,
+) -> None:
+    # Submissions for one task are sent to the teacher as a single digest
+    notifications.push(
+        teacher_id,
+        ("solutions", subject_task.id),
+        notice,
+        partial(deliver_solutions, bot),
+    )
+
+
 @router.callback_query(TaskCallbackFactory.filter(F.action == "create"))
 async def create_solution(
     callback: CallbackQuery,
@@ -44,10 +68,27 @@ async def create_solution(
     return await callback.answer()
 
 
+ADMISSION_ERRORS = {
+    Admission.TOO_LARGE: "File is too large. Maximum size is {max_size} MB.",
+    Admission.BAD_TYPE: "Only pdf or docx files are accepted.",
+    Admission.USER_BUSY: "Your previous upload is still processing. "
+    "Retry when it is done.",
+    Admission.QUEUE_FULL: "The bot is busy right now. Retry in a minute.",
+}
+
+
+async def report_progress(status: Message, text: str) -> None:
+    try:
+        await status.edit_text(text)
+    except TelegramBadRequest as e:
+        logging.warning(f"Can't update upload status: {e}")
+
+
 @router.message(
     Solution.file_link,
     F.document & F.document.file_name.endswith(".pdf")
     | F.document.file_name.endswith(".docx"),
+    flags={"throttling_key": "upload"},
 )
 async def set_solution_file_link(
     message: Message,
@@ -56,42 +97,114 @@ async def set_solution_file_link(
     bot: Bot,
     storage: Storage,
 ) -> Message:
-    file = await bot.get_file(message.document.file_id)
-    file_path = file.file_path
-    file_name = message.document.file_name
-    file_link = f"{message.from_user.username}/{file_name}"
-    await state.update_data(file_link=file_link)
+    user_id = message.from_user.id
+    # Reject early, before anything is downloaded
+    if (
+        admission := upload_queue.admit(user_id, message.document)
+    ) is not Admission.ACCEPTED:
+        return await message.answer(
+            ADMISSION_ERRORS[admission].format(
+                max_size=upload_queue.max_file_size // (1024 * 1024)
+            )
+        )
     data = await state.get_data()
-    task = await db.get_subject_task(data.get("subject_task_id"))
-    file_link = f"{task.subject.name}/{file_link}"
-    await bot.download_file(file_path, file_name)
-    if not storage.add_file(file_name, file_link):
-        await message.answer("Error while uploading file")
-        return
-
+    status = await message.answer("Processing your solution...")
+    job = partial(process_solution, message, status, data, db, bot, storage)
+    if (
+        admission := upload_queue.submit(user_id, message.document, job)
+    ) is not Admission.ACCEPTED:
+        return await report_progress(status, ADMISSION_ERRORS[admission])
     await state.clear()
-    delete_file(file_name)
+    return status
+
+
+async def process_solution(
+    message: Message,
+    status: Message,
+    data: dict,
+    db: Database,
+    bot: Bot,
+    storage: Storage,
+) -> None:
+    # Runs in an upload worker, the student only sees the status message
+    try:
+        await save_solution(message, status, data, db, bot, storage)
+    except Exception:
+        logging.exception(
+            f"Upload of a solution by user {message.from_user.id} failed"
+        )
+        await report_progress(
+            status, "Error while saving your solution. Try again later."
+        )
+
+
+async def save_solution(
+    message: Message,
+    status: Message,
+    data: dict,
+    db: Database,
+    bot: Bot,
+    storage: Storage,
+) -> None:
+    file_name = message.document.file_name
+    file_id = message.document.file_id
+    await report_progress(status, "Downloading your solution...")
+    file_link = await store_solution_file(
+        bot,
+        storage,
+        db,
+        message.document,
+        on_downloaded=partial(
+            report_progress, status, "Uploading your solution..."
+        ),
+    )
+    if not file_link:
+        return await report_progress(
+            status, "Error while uploading file. Try again."
+        )
+
+    await report_progress(status, "Saving your solution...")
     if previous_solution := await db.get_student_solution(
         data.get("student_id"), data.get("subject_task_id")
     ):
         teacher_id = previous_solution.subject_task.subject.teacher.user_id
-        objects = storage.get_objects()
         previous_file_link = previous_solution.file_link
-        if file_link != previous_file_link and previous_file_link in [
-            obj["Key"] for obj in objects
-        ]:
-            storage.delete_file(previous_file_link)
-        if await db.update_solution_file_link(previous_solution, file_link):
-            await message.answer("Your solution was updated!")
-            return await bot.send_message(
+        if await db.update_solution_file_link(
+            previous_solution, file_link, file_name, file_id
+        ):
+            # A re-upload of the same file has acquired its own reference
+            await release_solution_file(storage, db, previous_file_link)
+            notify_teacher(
+                bot,
                 teacher_id,
-                f"Updated solution from @{message.from_user.username} for subject task {hbold(previous_solution.subject_task.name)}. Link {hlink('here', storage.create_presigned_url(file_link))}",
+                previous_solution.subject_task,
+                SolutionNotice(
+                    previous_solution.subject_task.name,
+                    file_id,
+                    f"Updated solution from @{message.from_user.username} "
+                    "for subject task "
+                    f"{hbold(previous_solution.subject_task.name)}",
+                    message.from_user.username,
+                    updated=True,
+                ),
             )
-        return await message.answer("Error while updating solution")
-    solution = await db.create_solution(**data)
+            return await report_progress(status, "Your solution was updated!")
+        await release_solution_file(storage, db, file_link)
+        return await report_progress(status, "Error while updating solution")
+    solution = await db.create_solution(
+        **data, file_link=file_link, file_name=file_name, file_id=file_id
+    )
     teacher_id = solution.subject_task.subject.teacher.user_id
-    await bot.send_message(
+    notify_teacher(
+        bot,
         teacher_id,
-        f"New solution from @{message.from_user.username} for subject task {hbold(solution.subject_task.name)}. Link {hlink('here', storage.create_presigned_url(solution.file_link))}",
+        solution.subject_task,
+        SolutionNotice(
+            solution.subject_task.name,
+            file_id,
+            f"New solution from @{message.from_user.username} "
+            f"for subject task {hbold(solution.subject_task.name)}",
+            message.from_user.username,
+        ),
     )
-    return await message.answer("Your solution was submitted!")
+    return await report_progress(status, "Your solution was submitted!")
@@ -1,24 +1,62 @@
+import asyncio
+import io
+import logging
+from functools import partial
+
 from aiogram import Bot, F, Router
-from aiogram.filters import Command, or_f
+from aiogram.filters import Command, CommandObject, or_f
 from aiogram.fsm.context import FSMContext
-from aiogram.types import CallbackQuery, Message
+from aiogram.types import CallbackQuery, InlineKeyboardMarkup, Message
 from aiogram.utils.markdown import hbold, hlink
 
-from loader import dp
+from loader import broadcaster, dp, notifications
 from tgbot.filters.date_validation import IsValidDateFilter
 from tgbot.filters.teacher import IsTeacherFilter
 from tgbot.keyboards.inline.callbacks import (
+    SearchCallbackFactory,
     SolutionCallbackFactory,
     TaskCallbackFactory,
 )
+from tgbot.keyboards.inline.search_keyboard import search_keyboard
 from tgbot.keyboards.inline.solution_keyboard import solution_keyboard
 from tgbot.keyboards.reply.options_keyboard import options_keyboard
+from tgbot.misc.broadcast import BroadcastReport, Delivery
 from tgbot.misc.database import Database
+from tgbot.misc.notifications import GradeNotice, deliver_grade
+from tgbot.misc.roster import (
+    MAX_ROSTER_ENTRIES,
+    MAX_ROSTER_SIZE,
+    ROSTER_EXTENSIONS,
+    parse_roster,
+    unresolved_entries,
+)
+from tgbot.misc.search import (
+    PAGE_SIZE,
+    SearchResult,
+    format_result,
+    match_query,
+)
+from tgbot.misc.solution_archive import archive_name, export_solutions
+from tgbot.misc.solution_files import send_solution, solution_link
 from tgbot.misc.storage import Storage
+from tgbot.misc.task_import import (
+    IMPORT_EXTENSIONS,
+    MAX_IMPORT_SIZE,
+    TaskImportError,
+    parse_tasks,
+)
 from tgbot.misc.texts import TEACHER_HELP_TEXT
-from tgbot.misc.utils import create_subject_message
+from tgbot.misc.utils import create_link, create_subject_message
 from tgbot.models.models import Solution, Teacher
-from tgbot.states.states import Options, Subject, Task
+from tgbot.states.states import (
+    Announcement,
+    Options,
+    Roster,
+    Search,
+    Subject,
+    Task,
+    TaskImport,
+)
 
 router = Router()
 router.message.filter(IsTeacherFilter())
@@ -71,16 +109,21 @@ async def set_subject_description(
 async def accept_create(message: Message, state: FSMContext) -> None:
     data = await state.get_data()
     db_method = data.pop("method")
+    success = data.pop("success", "Object was created!")
+    failure = data.pop("failure", "Object was not created. Try again.")
     await state.clear()
     if await db_method(**data):
-        return await message.answer("Object was created!")
-    return await message.answer("Object was not created. Try again.")
+        return await message.answer(success)
+    return await message.answer(failure)
 
 
 @router.message(Options.option, F.text.casefold() == "no")
 async def decline_create(message: Message, state: FSMContext) -> None:
+    data = await state.get_data()
     await state.clear()
-    return await message.answer("Object was not created. Try again.")
+    return await message.answer(
+        data.get("failure", "Object was not created. Try again.")
+    )
 
 
 @router.message(Task.name)
@@ -133,10 +176,111 @@ async def set_task_due_date(
 @router.message(Task.due_date, ~IsValidDateFilter())
 async def set_task_due_date_fail(message: Message) -> Message:
     return await message.answer(
-        "Your date is invalid. Look at the format, and it cannot be in the past. Try again."
+        "Your date is invalid. Look at the format, "
+        "and it cannot be in the past. Try again."
     )
 
 
+@router.message(
+    TaskImport.file,
+    F.document.file_name.lower().endswith(IMPORT_EXTENSIONS),
+    flags={"pool": "slow", "throttling_key": "upload"},
+)
+async def import_tasks_file(
+    message: Message, state: FSMContext, db: Database, bot: Bot
+) -> Message:
+    if message.document.file_size > MAX_IMPORT_SIZE:
+        return await message.answer(
+            f"File is too large, at most {MAX_IMPORT_SIZE // 1024} KB"
+        )
+    data = await state.get_data()
+    await state.clear()
+    buffer = io.BytesIO()
+    await bot.download(message.document, buffer)
+    try:
+        tasks, rejected = await asyncio.to_thread(
+            parse_tasks, buffer.getvalue(), message.document.file_name
+        )
+    except TaskImportError as e:
+        return await message.answer(f"Tasks were not imported: {e}")
+    created = 0
+    if tasks:
+        try:
+            created = await db.create_subject_tasks(
+                data.get("subject_id"), tasks
+            )
+        except Exception as e:
+            logging.error(f"Error importing tasks: {e}")
+            return await message.answer("Tasks were not imported. Try again.")
+    lines = [f"Imported tasks: {hbold(created)}"]
+    if rejected:
+        lines.append(f"Rejected rows: {hbold(len(rejected))}")
+        lines.extend(
+            f"{hbold(number)}: {reason}" for number, reason in rejected[:20]
+        )
+        if len(rejected) > 20:
+            lines.append(f"...and {len(rejected) - 20} more")
+    return await message.answer("\n".join(lines))
+
+
+@router.message(TaskImport.file)
+async def import_tasks_file_fail(message: Message) -> Message:
+    return await message.answer("Send a .csv or .json file with tasks")
+
+
+@router.message(
+    Roster.entries,
+    F.text | F.document.file_name.lower().endswith(ROSTER_EXTENSIONS),
+    flags={"throttling_key": "upload"},
+)
+async def enroll_roster(
+    message: Message, state: FSMContext, db: Database, bot: Bot
+) -> Message:
+    if message.document:
+        if message.document.file_size > MAX_ROSTER_SIZE:
+            return await message.answer(
+                f"File is too large, at most {MAX_ROSTER_SIZE // 1024} KB"
+            )
+        buffer = io.BytesIO()
+        await bot.download(message.document, buffer)
+        text = buffer.getvalue().decode("utf-8-sig", errors="replace")
+    else:
+        text = message.text
+    data = await state.get_data()
+    await state.clear()
+    user_ids, usernames, invalid = parse_roster(text)
+    if len(user_ids) + len(usernames) > MAX_ROSTER_ENTRIES:
+        return await message.answer(
+            f"Too many students, at most {MAX_ROSTER_ENTRIES} per roster"
+        )
+    if not (subject := await db.get_subject(data.get("subject_id"))):
+        return await message.answer("Subject not found")
+    students = await db.get_students_by_roster(user_ids, usernames)
+    await db.enroll_students(subject, students)
+    lines = [f"Enrolled students: {hbold(len(students))}"]
+    if unresolved := unresolved_entries(user_ids, usernames, students):
+        lines.append(
+            f"Not registered in the bot: {hbold(len(unresolved))}\n"
+            + ", ".join(unresolved[:50])
+        )
+    if invalid:
+        lines.append(
+            f"Invalid entries: {hbold(len(invalid))}\n"
+            + ", ".join(invalid[:20])
+        )
+    if unresolved:
+        lines.append(
+            f"Send them this invite link: "
+            f"{await create_link(subject.id, 'add_subject')}"
+        )
+    return await message.answer("\n\n".join(lines))
+
+
+@router.message(Roster.entries)
+async def enroll_roster_fail(message: Message) -> Message:
+    return await message.answer("Send a list of students or a .csv/.txt file")
+
+
 @router.message(Command("my_subjects"))
 async def get_subjects(
     message: Message, db: Database, teacher: Teacher
@@ -146,9 +290,14 @@ async def get_subjects(
             subjects,
             [
                 {"text": "Invite students", "name": "add_subject"},
+                {"text": "Upload roster", "name": "upload_roster"},
                 {"text": "Add task", "name": "add_task"},
+                {"text": "Import tasks", "name": "import_tasks"},
                 {"text": "See tasks", "name": "see_tasks"},
                 {"text": "Show stats", "name": "subject_stats"},
+                {"text": "Grades CSV", "name": "export_grades"},
+                {"text": "Grades XLSX", "name": "export_grades_xlsx"},
+                {"text": "Close subject", "name": "close_subject"},
             ],
         )
         await message.answer("Here are your subjects:")
@@ -157,6 +306,160 @@ async def get_subjects(
     return await message.answer("You don't have any subjects!")
 
 
+@router.message(Command("archived"))
+async def get_archived_subjects(
+    message: Message, db: Database, teacher: Teacher
+) -> Message:
+    if subjects := await db.get_archived_subjects(teacher.id):
+        rows = []
+        for index, subject in enumerate(subjects, 1):
+            links = [
+                hlink(text, await create_link(subject["id"], name))
+                for text, name in (
+                    ("Grades CSV", "arch_csv"),
+                    ("Grades XLSX", "arch_xlsx"),
+                )
+            ]
+            rows.append(f"{index}. {subject['name']}. {', '.join(links)}")
+        await message.answer("Here are your closed subjects:")
+        return await message.answer("\n".join(rows))
+    return await message.answer("You don't have any closed subjects!")
+
+
+async def render_search_page(
+    db: Database, teacher: Teacher, query: str, page: int
+) -> tuple[str, InlineKeyboardMarkup | None]:
+    if not (match := match_query(query)):
+        return "Write at least one word to search for", None
+    # One extra row tells if there is a next page without counting
+    rows = await db.search(teacher.id, match, PAGE_SIZE + 1, page * PAGE_SIZE)
+    if not rows:
+        text = "Nothing was found" if page == 0 else "No more results"
+        return text, search_keyboard(page, False)
+    lines = [f"Results for {hbold(query)}, page {page + 1}:"]
+    for index, row in enumerate(rows[:PAGE_SIZE], page * PAGE_SIZE + 1):
+        result = SearchResult(*row)
+        link = await create_link(result.subject_id, "see_tasks")
+        lines.append(f"{index}. {format_result(result, link)}")
+    return "\n".join(lines), search_keyboard(page, len(rows) > PAGE_SIZE)
+
+
+async def send_search_results(
+    message: Message,
+    query: str,
+    state: FSMContext,
+    db: Database,
+    teacher: Teacher,
+) -> Message:
+    # Pages are turned by buttons, so the query is kept for them
+    await state.update_data(search_query=query)
+    text, keyboard = await render_search_page(db, teacher, query, 0)
+    return await message.answer(
+        text, reply_markup=keyboard, disable_web_page_preview=True
+    )
+
+
+@router.message(Command("search"))
+async def search(
+    message: Message,
+    command: CommandObject,
+    state: FSMContext,
+    db: Database,
+    teacher: Teacher,
+) -> Message:
+    if not command.args:
+        await state.set_state(Search.query)
+        return await message.answer(
+            "Write a subject, task or student name to search for"
+        )
+    return await send_search_results(
+        message, command.args, state, db, teacher
+    )
+
+
+@router.message(Search.query, F.text)
+async def search_query(
+    message: Message, state: FSMContext, db: Database, teacher: Teacher
+) -> Message:
+    await state.set_state(None)
+    return await send_search_results(
+        message, message.text, state, db, teacher
+    )
+
+
+@router.callback_query(SearchCallbackFactory.filter())
+async def turn_search_page(
+    callback: CallbackQuery,
+    callback_data: SearchCallbackFactory,
+    state: FSMContext,
+    db: Database,
+    teacher: Teacher,
+) -> None:
+    if not (query := (await state.get_data()).get("search_query")):
+        return await callback.answer(
+            "The search has expired, use /search again", show_alert=True
+        )
+    text, keyboard = await render_search_page(
+        db, teacher, query, callback_data.page
+    )
+    await callback.message.edit_text(
+        text, reply_markup=keyboard, disable_web_page_preview=True
+    )
+    return await callback.answer()
+
+
+@router.message(Command("announce"))
+async def choose_announcement_subject(
+    message: Message, db: Database, teacher: Teacher
+) -> Message:
+    if subjects := await db.get_subjects_by_teacher_id(teacher.id):
+        text = await create_subject_message(
+            subjects, [{"text": "Announce", "name": "announce"}]
+        )
+        await message.answer("Choose a subject for the announcement:")
+        return await message.answer(text)
+    return await message.answer("You don't have any subjects!")
+
+
+@router.message(Announcement.message, ~F.media_group_id)
+async def send_announcement(
+    message: Message, state: FSMContext, db: Database
+) -> Message:
+    data = await state.get_data()
+    await state.clear()
+    if not (subject := await db.get_subject(data.get("subject_id"))):
+        return await message.answer("Subject not found")
+    if not (recipients := await db.get_subject_recipients(subject.id)):
+        return await message.answer(
+            f"There are no students in {hbold(subject.name)}"
+        )
+
+    async def report_delivery(report: BroadcastReport) -> None:
+        blocked = report.chats(Delivery.BLOCKED)
+        await db.set_students_blocked(blocked)
+        await message.answer(
+            f"Announcement for {hbold(subject.name)} was delivered\n"
+            f"{hbold('Sent')}: {report.count(Delivery.SENT)} "
+            f"of {report.total}\n"
+            f"{hbold('Blocked the bot')}: {len(blocked)}\n"
+            f"{hbold('Failed')}: {report.count(Delivery.FAILED)}"
+        )
+
+    broadcaster.start(
+        recipients, message.chat.id, message.message_id, report_delivery
+    )
+    return await message.answer(
+        f"Sending the announcement to {len(recipients)} students..."
+    )
+
+
+@router.message(Announcement.message)
+async def send_announcement_fail(message: Message) -> Message:
+    return await message.answer(
+        "Albums can't be announced. Send a single message or file."
+    )
+
+
 @router.callback_query(
     TaskCallbackFactory.filter(F.action == "show_solutions")
 )
@@ -164,6 +467,7 @@ async def show_solutions_for_task(
     callback: CallbackQuery,
     callback_data: TaskCallbackFactory,
     db: Database,
+    bot: Bot,
     storage: Storage,
 ) -> Message:
     solutions: list[Solution] = await db.get_solutions_for_task(
@@ -177,16 +481,58 @@ async def show_solutions_for_task(
                 [
                     f"{hbold('Student')}: {solution.student.name}",
                     f"{hbold('Grade')}: {solution.grade}",
-                    f"{hbold('File link')}: {hlink('Click here', storage.create_presigned_url(solution.file_link))}",
                 ]
             )
-            await callback.message.answer(
+            await send_solution(
+                bot,
+                storage,
+                db,
+                callback.message.chat.id,
+                solution,
                 text,
                 reply_markup=solution_keyboard(solution.id, solution.grade),
             )
     return await callback.answer()
 
 
+@router.callback_query(
+    TaskCallbackFactory.filter(F.action == "download_all"),
+    flags={"pool": "slow", "throttling_key": "export"},
+)
+async def download_solutions(
+    callback: CallbackQuery,
+    callback_data: TaskCallbackFactory,
+    db: Database,
+    bot: Bot,
+    storage: Storage,
+) -> Message:
+    solutions: list[Solution] = await db.get_solutions_for_task(
+        callback_data.task_id
+    )
+    if not solutions:
+        await callback.message.answer("There are no solutions.")
+        return await callback.answer()
+    await callback.answer("Preparing the archive...")
+    task = await db.get_subject_task(callback_data.task_id)
+    exported, oversized = await export_solutions(
+        bot, storage, callback.message.chat.id, task.name, solutions
+    )
+    if oversized:
+        # Sent as links, a part with one of them would be over the limit
+        links = [
+            hlink(archive_name(solution), solution_link(storage, solution))
+            for solution in oversized
+        ]
+        await callback.message.answer(
+            "These solutions are too large for the archive:\n"
+            + "\n".join(f"* {link}" for link in links)
+        )
+    if failed := len(solutions) - exported - len(oversized):
+        return await callback.message.answer(
+            f"{failed} solutions couldn't be downloaded"
+        )
+
+
 @router.callback_query(TaskCallbackFactory.filter(F.action == "edit"))
 async def edit_task(
     callback: CallbackQuery,
@@ -200,7 +546,9 @@ async def edit_task(
     return await callback.answer()
 
 
-@router.callback_query(SolutionCallbackFactory.filter())
+@router.callback_query(
+    SolutionCallbackFactory.filter(), flags={"throttling_key": "grade"}
+)
 async def review_solution(
     callback: CallbackQuery,
     callback_data: SolutionCallbackFactory,
@@ -212,22 +560,27 @@ async def review_solution(
         callback_data.solution_id,
         callback_data.grade,
     ):
-        text = "\n".join(
-            [
-                f"{hbold('Student')}: {new_solution.student.name}",
-                f"{hbold('Grade')}: {new_solution.grade}",
-                f"{hbold('File link')}: {hlink('Click here', storage.create_presigned_url(new_solution.file_link))}",
-            ]
-        )
-        await callback.message.edit_text(
-            text,
-            reply_markup=solution_keyboard(
-                new_solution.id, new_solution.grade
-            ),
-        )
-        await bot.send_message(
+        lines = [
+            f"{hbold('Student')}: {new_solution.student.name}",
+            f"{hbold('Grade')}: {new_solution.grade}",
+        ]
+        reply_markup = solution_keyboard(new_solution.id, new_solution.grade)
+        if callback.message.document:
+            await callback.message.edit_caption(
+                caption="\n".join(lines), reply_markup=reply_markup
+            )
+        else:
+            link = solution_link(storage, new_solution)
+            lines.append(f"{hbold('File link')}: {hlink('Click here', link)}")
+            await callback.message.edit_text(
+                "\n".join(lines), reply_markup=reply_markup
+            )
+        # Only the grade the teacher settles on reaches the student
+        notifications.push(
             new_solution.student.user_id,
-            f'Your solution for task "{hbold(new_solution.subject_task.name)}" was reviewed. New grade: {hbold(new_solution.grade)}',
+            ("grade", new_solution.id),
+            GradeNotice(new_solution.subject_task.name, new_solution.grade),
+            partial(deliver_grade, bot),
         )
         return await callback.answer("Solution was reviewed")
     return await callback.answer("Error was occurred")
@@ -14,3 +14,7 @@ class SolutionCallbackFactory(CallbackData, prefix="solution"):
 
 class SupportCallbackFactory(CallbackData, prefix="support"):
     user_id: int
+
+
+class SearchCallbackFactory(CallbackData, prefix="search"):
+    page: int
@@ -0,0 +1,27 @@
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+from tgbot.keyboards.inline.callbacks import SearchCallbackFactory
+
+
+def search_keyboard(page: int, has_next: bool) -> InlineKeyboardMarkup | None:
+    buttons_list = []
+    if page > 0:
+        buttons_list.append(
+            InlineKeyboardButton(
+                text="⬅️ Previous",
+                callback_data=SearchCallbackFactory(page=page - 1).pack(),
+            )
+        )
+    if has_next:
+        buttons_list.append(
+            InlineKeyboardButton(
+                text="Next ➡️",
+                callback_data=SearchCallbackFactory(page=page + 1).pack(),
+            )
+        )
+    if not buttons_list:
+        return None
+    keyboard = InlineKeyboardBuilder()
+    keyboard.row(*buttons_list)
+    return keyboard.as_markup()
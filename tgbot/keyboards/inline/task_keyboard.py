@@ -2,28 +2,32 @@ from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from tgbot.keyboards.inline.callbacks import TaskCallbackFactory
-from tgbot.misc.database import Database
+from tgbot.models.models import Solution
 
 TASK_BUTTONS = [
     {"text": "Create a solution", "action_text": "create"},
     {"text": "See my solution", "action_text": "see"},
     {"text": "Not graded"},
 ]
+TEACHER_TASK_BUTTONS = [
+    {"text": "See solutions", "action_text": "show_solutions"},
+    {"text": "Download all", "action_text": "download_all"},
+    {"text": "Edit the task", "action_text": "edit"},
+]
 
 
-async def task_keyboard(
-    subject_id: int, task_id: int, user_id: int, db: Database
+def task_keyboard(
+    subject_id: int,
+    task_id: int,
+    is_teacher: bool,
+    solution: Solution | None = None,
 ) -> InlineKeyboardMarkup:
-    buttons_list = TASK_BUTTONS
-    if await db.is_student(user_id) and (
-        solution := await db.get_student_solution(user_id, task_id)
-    ):
+    # Roles and solutions are loaded once for all tasks of the subject
+    buttons_list = [dict(item) for item in TASK_BUTTONS]
+    if solution:
         buttons_list[2]["text"] = f"Your grade: {solution.grade}"
-    if await db.is_teacher(user_id):
-        buttons_list = [
-            {"text": "See solutions", "action_text": "show_solutions"},
-            {"text": "Edit the task", "action_text": "edit"},
-        ]
+    if is_teacher:
+        buttons_list = TEACHER_TASK_BUTTONS
     keyboard = InlineKeyboardBuilder()
     keyboard.row(
         *[
@@ -0,0 +1,55 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
+from aiogram.types import TelegramObject, Update
+
+from tgbot.misc.concurrency import ExecutionPolicy
+
+
+class ChatOrderingMiddleware(BaseMiddleware):
+    def __init__(self, policy: ExecutionPolicy) -> None:
+        self.policy = policy
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        chat = data.get("event_chat")
+        user = data.get("event_from_user")
+        key = chat.id if chat else user.id if user else None
+        if key is None:
+            return await handler(event, data)
+        async with self.policy.chat(key):
+            return await handler(event, data)
+
+
+class AdmissionMiddleware(BaseMiddleware):
+    def __init__(self, policy: ExecutionPolicy) -> None:
+        self.policy = policy
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any],
+    ) -> Any:
+        async with self.policy.admit():
+            return await handler(event, data)
+
+
+class ExecutionPoolMiddleware(BaseMiddleware):
+    def __init__(self, policy: ExecutionPolicy) -> None:
+        self.policy = policy
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        pool = get_flag(handler=data, name="pool")
+        async with self.policy.slot(pool):
+            return await handler(event, data)
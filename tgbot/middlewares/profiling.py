@@ -0,0 +1,28 @@
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from tgbot.misc.profiling import Profiler
+
+
+class ProfilingMiddleware(BaseMiddleware):
+    def __init__(self, profiler: Profiler) -> None:
+        self.profiler = profiler
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        name = data["handler"].callback.__name__
+        user = data.get("event_from_user")
+        if not self.profiler.should_profile(name, user and user.id):
+            return await handler(event, data)
+        update = data.get("event_update")
+        return await self.profiler.run(
+            name,
+            update and update.update_id,
+            lambda: handler(event, data),
+        )
@@ -1,17 +1,25 @@
+import math
 from typing import Any, Awaitable, Callable, Dict
 
 from aiogram import BaseMiddleware
 from aiogram.dispatcher.flags import get_flag
 from aiogram.types import CallbackQuery, Message
-from cachetools import TTLCache
 
-THROTTLE_TIME_OTHER = 1
+from tgbot.misc.throttling import Rate, TokenBucket
+
+THROTTLING_RATES = {
+    "default": Rate(per_second=1, burst=3),
+    "grade": Rate(per_second=0.5, burst=5),
+    "upload": Rate(per_second=0.1, burst=2),
+    "export": Rate(per_second=1 / 60, burst=2),
+}
+COOLDOWN_TEXT = "Too many requests. Try again in {} s."
 
 
 class ThrottlingMiddleware(BaseMiddleware):
-    caches = {
-        "default": TTLCache(maxsize=10_000, ttl=THROTTLE_TIME_OTHER),
-    }
+    def __init__(self, rates: dict[str, Rate] = THROTTLING_RATES) -> None:
+        self.buckets = {key: TokenBucket(rate) for key, rate in rates.items()}
+        self.warned = {key: TokenBucket(Rate(1, 1)) for key in rates}
 
     async def __call__(
         self,
@@ -23,12 +31,16 @@ class ThrottlingMiddleware(BaseMiddleware):
             handler=data, name="throttling_key", default="default"
         )
         if (
-            throttling_key is not None
-            and throttling_key in self.caches
-            and isinstance(event, Message)
+            throttling_key is None
+            or throttling_key not in self.buckets
+            or event.from_user is None
         ):
-            if event.chat.id in self.caches[throttling_key]:
-                return
-            else:
-                self.caches[throttling_key][event.chat.id] = None
-        return await handler(event, data)
+            return await handler(event, data)
+        user_id = event.from_user.id
+        if not (wait := self.buckets[throttling_key].consume(user_id)):
+            return await handler(event, data)
+        text = COOLDOWN_TEXT.format(math.ceil(wait))
+        if isinstance(event, CallbackQuery):
+            return await event.answer(text)
+        if not self.warned[throttling_key].consume(user_id):
+            return await event.answer(text)
@@ -0,0 +1,130 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Awaitable, Callable
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+from tgbot.misc.throttling import Rate, TokenBucket
+
+# Telegram allows about 30 messages per second to different chats
+BROADCAST_RATE = Rate(per_second=25, burst=25)
+BROADCAST_CONCURRENCY = 8
+BROADCAST_RETRIES = 3
+
+
+class Delivery(Enum):
+    SENT = "sent"
+    BLOCKED = "blocked"
+    FAILED = "failed"
+
+
+@dataclass
+class BroadcastReport:
+    total: int = 0
+    deliveries: dict[int, Delivery] = field(default_factory=dict)
+    retries: int = 0
+
+    def count(self, delivery: Delivery) -> int:
+        return sum(status == delivery for status in self.deliveries.values())
+
+    def chats(self, delivery: Delivery) -> list[int]:
+        return [
+            chat_id
+            for chat_id, status in self.deliveries.items()
+            if status == delivery
+        ]
+
+
+class Broadcaster:
+    def __init__(
+        self,
+        bot: Bot,
+        rate: Rate = BROADCAST_RATE,
+        concurrency: int = BROADCAST_CONCURRENCY,
+        retries: int = BROADCAST_RETRIES,
+    ) -> None:
+        self.bot = bot
+        self.retries = retries
+        self.concurrency = concurrency
+        # One bucket for the whole bot, Telegram limits are global
+        self._bucket = TokenBucket(rate)
+        self._tasks: set[asyncio.Task] = set()
+
+    async def _wait_turn(self) -> None:
+        while delay := self._bucket.consume(0):
+            await asyncio.sleep(delay)
+
+    async def _deliver(
+        self,
+        chat_id: int,
+        from_chat_id: int,
+        message_id: int,
+        report: BroadcastReport,
+    ) -> Delivery:
+        for attempt in range(self.retries + 1):
+            await self._wait_turn()
+            try:
+                await self.bot.copy_message(chat_id, from_chat_id, message_id)
+                return Delivery.SENT
+            except TelegramForbiddenError:
+                return Delivery.BLOCKED
+            except TelegramRetryAfter as e:
+                delay = e.retry_after
+            except (TelegramNetworkError, TelegramServerError):
+                delay = 2**attempt
+            except TelegramBadRequest as e:
+                logging.warning(f"Announcement to {chat_id} failed: {e}")
+                return Delivery.FAILED
+            if attempt < self.retries:
+                report.retries += 1
+                await asyncio.sleep(delay)
+        logging.warning(f"Announcement to {chat_id} failed after retries")
+        return Delivery.FAILED
+
+    async def send(
+        self, chat_ids: list[int], from_chat_id: int, message_id: int
+    ) -> BroadcastReport:
+        report = BroadcastReport(total=len(chat_ids))
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def deliver(chat_id: int) -> None:
+            async with semaphore:
+                report.deliveries[chat_id] = await self._deliver(
+                    chat_id, from_chat_id, message_id, report
+                )
+
+        await asyncio.gather(*(deliver(chat_id) for chat_id in chat_ids))
+        return report
+
+    def start(
+        self,
+        chat_ids: list[int],
+        from_chat_id: int,
+        message_id: int,
+        on_done: Callable[[BroadcastReport], Awaitable[None]],
+    ) -> asyncio.Task:
+        # The handler returns right away, so a long fan-out does not hold
+        # the teacher's chat and an execution pool slot
+        async def run() -> None:
+            try:
+                report = await self.send(chat_ids, from_chat_id, message_id)
+                await on_done(report)
+            except Exception as e:
+                logging.error(f"Announcement failed: {e}")
+
+        task = asyncio.create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def __len__(self) -> int:
+        return len(self._tasks)
@@ -0,0 +1,152 @@
+import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Hashable
+
+DEFAULT_POOL = "fast"
+
+
+class Pool:
+    def __init__(self, size: int) -> None:
+        self.size = size
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(size)
+
+    @property
+    def full(self) -> bool:
+        return self._semaphore.locked()
+
+    async def enter(self) -> None:
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+
+    def exit(self) -> None:
+        self.active -= 1
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[None]:
+        await self.enter()
+        try:
+            yield
+        finally:
+            self.exit()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": self.size,
+            "active": self.active,
+            "waiting": self.waiting,
+        }
+
+
+class Admission:
+    # A global slot that can be given back while the update waits for its
+    # pool, and taken again once the pool lets it in
+    def __init__(self, pool: Pool) -> None:
+        self.pool = pool
+        self.held = False
+
+    async def take(self) -> None:
+        await self.pool.enter()
+        self.held = True
+
+    def give_back(self) -> None:
+        if self.held:
+            self.held = False
+            self.pool.exit()
+
+
+admission: ContextVar[Admission | None] = ContextVar(
+    "admission", default=None
+)
+
+
+class KeyedLock:
+    def __init__(self) -> None:
+        self._locks: dict[Hashable, list] = {}
+
+    @asynccontextmanager
+    async def __call__(self, key: Hashable) -> AsyncIterator[None]:
+        # asyncio.Lock wakes waiters in FIFO order, so holders of one key
+        # run in the order they asked for it
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    def waiting(self) -> int:
+        return sum(count - 1 for _, count in self._locks.values())
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+
+class ExecutionPolicy:
+    def __init__(self, max_concurrent: int, pools: dict[str, int]) -> None:
+        self.total = Pool(max_concurrent)
+        self.pools = {name: Pool(size) for name, size in pools.items()}
+        # Updates from one chat are handled in the order they were received
+        self.chat = KeyedLock()
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        # Taken before routing, so filters and their queries are bounded
+        # by the global limit as well
+        current = Admission(self.total)
+        await current.take()
+        token = admission.set(current)
+        try:
+            yield
+        finally:
+            admission.reset(token)
+            current.give_back()
+
+    @asynccontextmanager
+    async def slot(self, pool_name: str | None) -> AsyncIterator[None]:
+        pool = self.pools.get(pool_name or DEFAULT_POOL) or self.pools.get(
+            DEFAULT_POOL
+        )
+        if pool is None:
+            yield
+            return
+        current = admission.get()
+        if current is None or not pool.full:
+            async with pool.acquire():
+                yield
+            return
+        # Updates queued for a full pool don't hold global slots, so a
+        # backlog of slow handlers can't starve the fast ones
+        current.give_back()
+        async with pool.acquire():
+            await current.take()
+            yield
+
+    def stats(self) -> dict:
+        return {
+            "total": self.total.stats(),
+            "pools": {name: pool.stats() for name, pool in self.pools.items()},
+            "chats_pending": self.chat.waiting(),
+            "chats_active": len(self.chat),
+        }
+
+    def gauges(self) -> dict[str, int]:
+        stats = self.stats()
+        gauges = {
+            "chats_pending": stats["chats_pending"],
+            "chats_active": stats["chats_active"],
+        }
+        for name, pool in {"total": stats["total"], **stats["pools"]}.items():
+            for field, value in pool.items():
+                gauges[f"{name}_{field}"] = value
+        return gauges
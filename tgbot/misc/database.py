@@ -1,14 +1,79 @@
-from datetime import date
+from datetime import date, datetime
 
+from tortoise import timezone
+from tortoise.expressions import F, Q
+from tortoise.functions import Lower
+from tortoise.transactions import in_transaction
+
+from tgbot.misc.query_log import trace_methods
+from tgbot.models.archive import SCHEMA, archive
 from tgbot.models.models import (
     Solution,
+    SolutionFile,
     Student,
     Subject,
     SubjectTask,
     Teacher,
 )
 
+# Students stay in the main database when their subjects are archived
+GRADEBOOK_QUERY = """
+SELECT st.id, st.name, t.id, t.name, t.due_date, so.grade
+FROM {schema}.subject_student AS ss
+JOIN main.student AS st ON st.id = ss.student_id
+JOIN {schema}.subjecttask AS t ON t.subject_id = ss.subject_id
+LEFT JOIN {schema}.solution AS so
+    ON so.subject_task_id = t.id AND so.student_id = st.id
+WHERE ss.subject_id = ?
+"""
+
+# Ranked matches in the subjects of a teacher, students are also found
+# through their solutions
+SEARCH_QUERY = """
+SELECT 'subject', s.id, s.id, s.name,
+    highlight(subject_fts, 0, char(2), char(3)),
+    snippet(subject_fts, 1, char(2), char(3), '…', 12),
+    bm25(subject_fts, 10.0, 1.0) AS score
+FROM subject_fts
+JOIN subject AS s ON s.id = subject_fts.rowid
+WHERE subject_fts MATCH ? AND s.teacher_id = ?
+UNION ALL
+SELECT 'task', t.id, s.id, s.name,
+    highlight(subjecttask_fts, 0, char(2), char(3)),
+    snippet(subjecttask_fts, 1, char(2), char(3), '…', 12),
+    bm25(subjecttask_fts, 10.0, 1.0)
+FROM subjecttask_fts
+JOIN subjecttask AS t ON t.id = subjecttask_fts.rowid
+JOIN subject AS s ON s.id = t.subject_id
+WHERE subjecttask_fts MATCH ? AND s.teacher_id = ?
+UNION ALL
+SELECT 'student', st.id, s.id, s.name,
+    highlight(student_fts, 0, char(2), char(3)),
+    highlight(student_fts, 1, char(2), char(3)),
+    bm25(student_fts)
+FROM student_fts
+JOIN student AS st ON st.id = student_fts.rowid
+JOIN subject_student AS ss ON ss.student_id = st.id
+JOIN subject AS s ON s.id = ss.subject_id
+WHERE student_fts MATCH ? AND s.teacher_id = ?
+UNION ALL
+SELECT 'solution', so.id, s.id, s.name, t.name,
+    coalesce(
+        highlight(student_fts, 0, char(2), char(3)),
+        highlight(student_fts, 1, char(2), char(3))
+    ),
+    bm25(student_fts)
+FROM student_fts
+JOIN solution AS so ON so.student_id = student_fts.rowid
+JOIN subjecttask AS t ON t.id = so.subject_task_id
+JOIN subject AS s ON s.id = t.subject_id
+WHERE student_fts MATCH ? AND s.teacher_id = ?
+ORDER BY score, 1, 2
+LIMIT ? OFFSET ?
+"""
 
+
+@trace_methods
 class Database:
     def __init__(self):
         self.student = Student
@@ -16,6 +81,7 @@ class Database:
         self.teacher = Teacher
         self.solution = Solution
         self.subjecttask = SubjectTask
+        self.solutionfile = SolutionFile
 
     async def create_teacher(
         self,
@@ -54,12 +120,21 @@ class Database:
         )
 
     async def create_solution(
-        self, subject_task_id: int, student_id: int, file_link: str
+        self,
+        subject_task_id: int,
+        student_id: int,
+        file_link: str,
+        file_name: str | None = None,
+        file_id: str | None = None,
     ) -> Solution | None:
         subject_task = await self.get_subject_task(subject_task_id)
         student = await self.get_student(student_id)
         return await self.solution.create(
-            subject_task=subject_task, student=student, file_link=file_link
+            subject_task=subject_task,
+            student=student,
+            file_link=file_link,
+            file_name=file_name,
+            file_id=file_id,
         )
 
     async def create_subject_task(
@@ -82,6 +157,21 @@ class Database:
         )
         return new_task
 
+    async def create_subject_tasks(
+        self, subject_id: int, tasks: list[dict]
+    ) -> int:
+        new_tasks = [
+            self.subjecttask(subject_id=subject_id, **task) for task in tasks
+        ]
+        async with in_transaction() as connection:
+            await self.subjecttask.bulk_create(
+                new_tasks, batch_size=100, using_db=connection
+            )
+        return len(new_tasks)
+
+    async def get_solution(self, solution_id: int) -> Solution | None:
+        return await self.solution.get_or_none(id=solution_id)
+
     async def get_solutions_for_task(
         self, subject_task_id: int
     ) -> list[Solution]:
@@ -91,6 +181,53 @@ class Database:
             .prefetch_related("student")
         )
 
+    async def get_gradebook_rows(self, subject_id: int) -> list[tuple]:
+        # One row per enrolled student and task, without building models
+        _, rows = await self.solution._meta.db.execute_query(
+            GRADEBOOK_QUERY.format(schema="main"), [subject_id]
+        )
+        return [tuple(row) for row in rows]
+
+    async def get_archived_gradebook_rows(
+        self, subject_id: int
+    ) -> list[tuple]:
+        if not archive.exists:
+            return []
+        rows = await archive.query(
+            GRADEBOOK_QUERY.format(schema=SCHEMA), [subject_id]
+        )
+        return [tuple(row) for row in rows]
+
+    async def archive_subject(self, subject_id: int) -> dict[str, int]:
+        return await archive.move_subject(subject_id)
+
+    async def get_archived_subjects(self, teacher_id: int) -> list[dict]:
+        if not archive.exists:
+            return []
+        rows = await archive.query(
+            f"SELECT id, name, description FROM {SCHEMA}.subject "
+            "WHERE teacher_id = ? ORDER BY id",
+            [teacher_id],
+        )
+        return [dict(row) for row in rows]
+
+    async def get_archived_subject(self, subject_id: int) -> dict | None:
+        if not archive.exists:
+            return None
+        rows = await archive.query(
+            f"SELECT id, name, teacher_id FROM {SCHEMA}.subject WHERE id = ?",
+            [subject_id],
+        )
+        return dict(rows[0]) if rows else None
+
+    async def search(
+        self, teacher_id: int, match: str, limit: int, offset: int = 0
+    ) -> list[tuple]:
+        _, rows = await self.subject._meta.db.execute_query(
+            SEARCH_QUERY, [match, teacher_id] * 4 + [limit, offset]
+        )
+        return [tuple(row) for row in rows]
+
     async def get_percentage_solutions_by_subject(
         self, subject: Subject
     ) -> dict[str, int]:
@@ -124,6 +261,14 @@ class Database:
             .prefetch_related("student", "subject_task__subject__teacher")
         )
 
+    async def get_student_solutions_for_tasks(
+        self, user_id: int, subject_task_ids: list[int]
+    ) -> dict[int, Solution]:
+        solutions = await self.solution.filter(
+            student__user_id=user_id, subject_task_id__in=subject_task_ids
+        ).all()
+        return {solution.subject_task_id: solution for solution in solutions}
+
     async def update_solution_grade(
         self, solution_id: int, grade: int
     ) -> Solution | None:
@@ -141,13 +286,78 @@ class Database:
         return None
 
     async def update_solution_file_link(
-        self, solution: Solution, new_file_link: str
+        self,
+        solution: Solution,
+        new_file_link: str,
+        file_name: str | None = None,
+        file_id: str | None = None,
     ) -> bool:
         rows_affected = await self.solution.filter(id=solution.id).update(
-            file_link=new_file_link
+            file_link=new_file_link, file_name=file_name, file_id=file_id
+        )
+        return rows_affected > 0
+
+    async def update_solution_file_id(
+        self, solution_id: int, file_id: str | None
+    ) -> bool:
+        rows_affected = await self.solution.filter(id=solution_id).update(
+            file_id=file_id
         )
         return rows_affected > 0
 
+    async def acquire_solution_file(self, key: str, size: int) -> bool:
+        solution_file, _ = await self.solutionfile.get_or_create(
+            key=key, defaults={"size": size}
+        )
+        # Queryset updates skip auto_now, the time is set for the GC
+        await self.solutionfile.filter(id=solution_file.id).update(
+            ref_count=F("ref_count") + 1, updated_at=timezone.now()
+        )
+        return solution_file.ref_count == 0
+
+    async def release_solution_file(self, key: str) -> bool | None:
+        if not await self.solutionfile.filter(key=key).exists():
+            return None
+        await self.solutionfile.filter(key=key).update(
+            ref_count=F("ref_count") - 1
+        )
+        return (
+            await self.solutionfile.filter(key=key, ref_count__lte=0).delete()
+            > 0
+        )
+
+    async def get_referenced_file_links(
+        self, first: str, last: str
+    ) -> set[str]:
+        links = set(
+            await self.solution.filter(
+                file_link__gte=first, file_link__lte=last
+            )
+            .distinct()
+            .values_list("file_link", flat=True)
+        )
+        if archive.exists:
+            # Archived solutions keep their files in the bucket
+            rows = await archive.query(
+                f"SELECT DISTINCT file_link FROM {SCHEMA}.solution "
+                "WHERE file_link BETWEEN ? AND ?",
+                [first, last],
+            )
+            links.update(row["file_link"] for row in rows)
+        return links
+
+    async def get_acquired_file_keys(
+        self, keys: list[str], since: datetime
+    ) -> set[str]:
+        return set(
+            await self.solutionfile.filter(
+                key__in=keys, updated_at__gte=since
+            ).values_list("key", flat=True)
+        )
+
+    async def delete_solution_files(self, keys: list[str]) -> int:
+        return await self.solutionfile.filter(key__in=keys).delete()
+
     async def is_student(self, user_id: int) -> bool:
         return await self.student.filter(user_id=user_id).exists()
 
@@ -183,5 +393,40 @@ class Database:
     ) -> list[Subject]:
         return await self.subject.filter(teacher_id=teacher_id).all()
 
+    async def get_students_by_roster(
+        self, user_ids: set[int], usernames: set[str]
+    ) -> list[Student]:
+        if not (user_ids or usernames):
+            return []
+        # Telegram usernames are case-insensitive
+        return (
+            await self.student.annotate(username_lower=Lower("username"))
+            .filter(
+                Q(user_id__in=user_ids)
+                | Q(username_lower__in=[name.lower() for name in usernames])
+            )
+            .all()
+        )
+
+    async def enroll_students(
+        self, subject: Subject, students: list[Student]
+    ) -> None:
+        if students:
+            await subject.students.add(*students)
+
+    async def get_subject_recipients(self, subject_id: int) -> list[int]:
+        return await self.student.filter(
+            subjects__id=subject_id, is_blocked=False
+        ).values_list("user_id", flat=True)
+
+    async def set_students_blocked(
+        self, user_ids: list[int], is_blocked: bool = True
+    ) -> int:
+        if not user_ids:
+            return 0
+        return await self.student.filter(user_id__in=user_ids).update(
+            is_blocked=is_blocked
+        )
+
     async def get_student_subjects(self, student: Student) -> list[Subject]:
         return await student.subjects
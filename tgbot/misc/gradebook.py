@@ -0,0 +1,64 @@
+import asyncio
+import os
+import tempfile
+from enum import Enum
+
+import pandas as pd
+from aiogram.types import FSInputFile, Message
+
+MISSING_MARK = "-"
+COLUMNS = ["student_id", "student", "task_id", "task", "due_date", "grade"]
+
+
+class GradebookFormat(Enum):
+    CSV = "csv"
+    XLSX = "xlsx"
+
+
+def build_gradebook(rows: list[tuple]) -> pd.DataFrame:
+    frame = pd.DataFrame.from_records(rows, columns=COLUMNS)
+    table = (
+        frame.groupby(["student_id", "task_id"])["grade"]
+        .max()
+        .unstack("task_id")
+    )
+    tasks = (
+        frame.drop_duplicates("task_id")
+        .sort_values(["due_date", "task_id"])
+        .set_index("task_id")["task"]
+    )
+    students = (
+        frame.drop_duplicates("student_id")
+        .set_index("student_id")["student"]
+        .fillna(MISSING_MARK)
+    )
+    table = table.reindex(columns=tasks.index).astype("Int64")
+    table.columns = tasks.to_list()
+    table.index = pd.Index(students.reindex(table.index), name="student")
+    return table.sort_index()
+
+
+def write_gradebook(
+    table: pd.DataFrame, path: str, file_format: GradebookFormat
+) -> None:
+    if file_format == GradebookFormat.XLSX:
+        table.to_excel(path, na_rep=MISSING_MARK, sheet_name="Grades")
+    else:
+        table.to_csv(path, na_rep=MISSING_MARK)
+
+
+async def send_gradebook(
+    message: Message,
+    rows: list[tuple],
+    name: str,
+    file_format: GradebookFormat = GradebookFormat.CSV,
+) -> Message:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, f"gradebook.{file_format.value}")
+        # Pivoting and writing thousands of cells would block the loop
+        table = await asyncio.to_thread(build_gradebook, rows)
+        await asyncio.to_thread(write_gradebook, table, path, file_format)
+        return await message.answer_document(
+            FSInputFile(path, filename=f"{name}.{file_format.value}"),
+            caption=f"{len(table)} students, {len(table.columns)} tasks",
+        )
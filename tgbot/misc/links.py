@@ -0,0 +1,69 @@
+import base64
+import hashlib
+import hmac
+import time
+from collections import OrderedDict
+
+from tgbot.misc.storage import Storage
+
+
+class SignedLinks:
+    # Stable links to solutions: the token only carries the solution id and
+    # its signature, the presigned S3 URL is created when the link is opened
+    def __init__(self, secret: bytes, base_url: str | None) -> None:
+        self.secret = secret
+        self.base_url = base_url.rstrip("/") if base_url else None
+
+    @property
+    def enabled(self) -> bool:
+        return self.base_url is not None
+
+    def _signature(self, solution_id: int) -> str:
+        digest = hmac.new(
+            self.secret, str(solution_id).encode(), hashlib.sha256
+        ).digest()
+        return base64.urlsafe_b64encode(digest[:12]).decode()
+
+    def token(self, solution_id: int) -> str:
+        return f"{solution_id}-{self._signature(solution_id)}"
+
+    def url(self, solution_id: int) -> str:
+        return f"{self.base_url}/s/{self.token(solution_id)}"
+
+    def verify(self, token: str) -> int | None:
+        solution_id, _, signature = token.partition("-")
+        if not solution_id.isdigit():
+            return None
+        if not hmac.compare_digest(
+            signature, self._signature(int(solution_id))
+        ):
+            return None
+        return int(solution_id)
+
+
+class PresignedUrlCache:
+    def __init__(
+        self, storage: Storage, expires_in: int = 300, size: int = 1024
+    ) -> None:
+        self.storage = storage
+        self.expires_in = expires_in
+        self.size = size
+        self._urls: OrderedDict[tuple, tuple[str, float]] = OrderedDict()
+
+    def get(self, key: str, download_name: str | None = None) -> str:
+        now = time.monotonic()
+        cache_key = (key, download_name)
+        if cached := self._urls.get(cache_key):
+            url, valid_until = cached
+            if valid_until > now:
+                self._urls.move_to_end(cache_key)
+                return url
+        url = self.storage.create_presigned_url(
+            key, download_name, expires_in=self.expires_in
+        )
+        if url:
+            # Hand out cached URLs only while they stay valid for a while
+            self._urls[cache_key] = (url, now + self.expires_in / 2)
+            if len(self._urls) > self.size:
+                self._urls.popitem(last=False)
+        return url
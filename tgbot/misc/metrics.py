@@ -0,0 +1,172 @@
+import json
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextvars import ContextVar
+from typing import Callable
+from weakref import WeakKeyDictionary
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CALLS_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+CALL_KINDS = ("db", "s3", "telegram")
+
+
+class Histogram:
+    def __init__(self, buckets: tuple = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        rows, total = [], 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            total += count
+            rows.append((str(bound), total))
+        return rows
+
+    def as_dict(self) -> dict:
+        return {
+            "buckets": dict(self.cumulative()),
+            "sum": self.sum,
+            "count": self.count,
+        }
+
+
+class UpdateStats:
+    def __init__(self) -> None:
+        self.handler = "unhandled"
+        self.update_id: int | None = None
+        self.calls = Counter()
+        self.queries = Counter()
+        self.started = time.perf_counter()
+
+
+current_update: ContextVar[UpdateStats | None] = ContextVar(
+    "current_update", default=None
+)
+# Lets code outside the task (e.g. the loop watchdog thread) find out
+# which update a task is handling
+active_updates: WeakKeyDictionary = WeakKeyDictionary()
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self.handler_latency: dict[str, Histogram] = defaultdict(Histogram)
+        self.handler_updates = Counter()
+        self.handler_errors = Counter()
+        self.calls_per_update: dict[tuple[str, str], Histogram] = defaultdict(
+            lambda: Histogram(CALLS_BUCKETS)
+        )
+        self.calls_total = Counter()
+        self.gauges: dict[str, Callable[[], dict[str, float]]] = {}
+
+    def count_call(self, kind: str, name: str) -> None:
+        self.calls_total[kind, name] += 1
+        if stats := current_update.get():
+            stats.calls[kind] += 1
+
+    def observe_query(self, query: str, values, duration: float) -> None:
+        self.count_call("db", query.lstrip().split(" ", 1)[0].upper())
+
+    def track_boto_client(self, client) -> None:
+        client.meta.events.register("before-call.s3", self._count_s3_call)
+
+    def _count_s3_call(self, model, **kwargs) -> None:
+        self.count_call("s3", model.name)
+
+    def observe_update(self, stats: UpdateStats, failed: bool) -> None:
+        handler = stats.handler
+        self.handler_latency[handler].observe(
+            time.perf_counter() - stats.started
+        )
+        self.handler_updates[handler] += 1
+        if failed:
+            self.handler_errors[handler] += 1
+        for kind in CALL_KINDS:
+            self.calls_per_update[handler, kind].observe(stats.calls[kind])
+
+    def render(self) -> str:
+        lines = [
+            "# TYPE handler_latency_seconds histogram",
+        ]
+        for handler, histogram in sorted(self.handler_latency.items()):
+            lines.extend(
+                _histogram_lines(
+                    "handler_latency_seconds",
+                    histogram,
+                    f'handler="{handler}"',
+                )
+            )
+        lines.append("# TYPE handler_updates_total counter")
+        for handler, count in sorted(self.handler_updates.items()):
+            lines.append(
+                f'handler_updates_total{{handler="{handler}"}} {count}'
+            )
+        lines.append("# TYPE handler_errors_total counter")
+        for handler, count in sorted(self.handler_errors.items()):
+            lines.append(
+                f'handler_errors_total{{handler="{handler}"}} {count}'
+            )
+        lines.append("# TYPE calls_per_update histogram")
+        for (handler, kind), histogram in sorted(
+            self.calls_per_update.items()
+        ):
+            lines.extend(
+                _histogram_lines(
+                    "calls_per_update",
+                    histogram,
+                    f'handler="{handler}",kind="{kind}"',
+                )
+            )
+        lines.append("# TYPE calls_total counter")
+        for (kind, name), count in sorted(self.calls_total.items()):
+            lines.append(f'calls_total{{kind="{kind}",name="{name}"}} {count}')
+        for name, gauge in self.gauges.items():
+            lines.append(f"# TYPE {name} gauge")
+            for label, value in gauge().items():
+                lines.append(f'{name}{{name="{label}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def as_dict(self) -> dict:
+        return {
+            "handler_latency_seconds": {
+                handler: histogram.as_dict()
+                for handler, histogram in self.handler_latency.items()
+            },
+            "handler_updates_total": dict(self.handler_updates),
+            "handler_errors_total": dict(self.handler_errors),
+            "calls_per_update": {
+                f"{handler}:{kind}": histogram.as_dict()
+                for (handler, kind), histogram in self.calls_per_update.items()
+            },
+            "calls_total": {
+                f"{kind}:{name}": count
+                for (kind, name), count in self.calls_total.items()
+            },
+            **{name: gauge() for name, gauge in self.gauges.items()},
+        }
+
+    def dump(self, path: str) -> None:
+        with open(path, "w") as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+
+def _histogram_lines(name: str, histogram: Histogram, labels: str) -> list:
+    separator = "," if labels else ""
+    lines = [
+        f'{name}_bucket{{{labels}{separator}le="{bound}"}} {count}'
+        for bound, count in histogram.cumulative()
+    ]
+    suffix = f"{{{labels}}}" if labels else ""
+    lines.append(f"{name}_sum{suffix} {histogram.sum}")
+    lines.append(f"{name}_count{suffix} {histogram.count}")
+    return lines
+
+
+metrics = Metrics()
@@ -0,0 +1,143 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Hashable
+
+from aiogram import Bot
+from aiogram.utils.markdown import hbold
+
+Deliver = Callable[[int, list], Awaitable[Any]]
+
+
+@dataclass
+class SolutionNotice:
+    task_name: str
+    file_id: str
+    caption: str
+    username: str | None
+    updated: bool = False
+    created_at: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class GradeNotice:
+    task_name: str
+    grade: int
+
+
+class PendingNotification:
+    def __init__(self, deliver: Deliver) -> None:
+        self.deliver = deliver
+        self.items: list = []
+        self.first_at = time.monotonic()
+        self.handle: asyncio.TimerHandle | None = None
+
+
+class NotificationBuffer:
+    # Notifications with the same recipient and key are collected until no
+    # new one arrives for `window` seconds (but at most `max_delay` after
+    # the first one) and are delivered as a single message
+    def __init__(self, window: float = 60, max_delay: float = 600) -> None:
+        self.window = window
+        self.max_delay = max_delay
+        self.pushed = 0
+        self.delivered = 0
+        self._pending: dict[tuple[int, Hashable], PendingNotification] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def push(
+        self, chat_id: int, key: Hashable, item: Any, deliver: Deliver
+    ) -> None:
+        self.pushed += 1
+        pending = self._pending.setdefault(
+            (chat_id, key), PendingNotification(deliver)
+        )
+        pending.items.append(item)
+        if pending.handle:
+            pending.handle.cancel()
+        delay = min(
+            self.window, pending.first_at + self.max_delay - time.monotonic()
+        )
+        pending.handle = asyncio.get_running_loop().call_later(
+            max(delay, 0), self._flush, chat_id, key
+        )
+
+    def _flush(self, chat_id: int, key: Hashable) -> None:
+        task = asyncio.create_task(self.flush(chat_id, key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self, chat_id: int, key: Hashable) -> None:
+        if not (pending := self._pending.pop((chat_id, key), None)):
+            return
+        if pending.handle:
+            pending.handle.cancel()
+        self.delivered += 1
+        try:
+            await pending.deliver(chat_id, pending.items)
+        except Exception as e:
+            logging.error(f"Error delivering notification to {chat_id}: {e}")
+
+    async def flush_all(self) -> None:
+        await asyncio.gather(
+            *(self.flush(*recipient) for recipient in list(self._pending))
+        )
+        await asyncio.gather(*self._tasks)
+
+    def gauges(self) -> dict[str, int]:
+        return {
+            "pending": len(self._pending),
+            "pushed": self.pushed,
+            "delivered": self.delivered,
+        }
+
+
+def _minutes(seconds: float) -> str:
+    minutes = max(round(seconds / 60), 1)
+    return f"{minutes} minute" if minutes == 1 else f"{minutes} minutes"
+
+
+async def deliver_solutions(
+    bot: Bot, chat_id: int, notices: list[SolutionNotice]
+) -> None:
+    if len(notices) == 1:
+        notice = notices[0]
+        await bot.send_document(
+            chat_id, notice.file_id, caption=notice.caption
+        )
+        return
+    # Every student is mentioned once. A solution counts as updated only
+    # if it existed before the first upload in this digest
+    first: dict[str | None, SolutionNotice] = {}
+    for notice in notices:
+        first.setdefault(notice.username, notice)
+    updated = sum(notice.updated for notice in first.values())
+    elapsed = time.monotonic() - notices[0].created_at
+    students = "\n".join(
+        f"* @{username}" + (" (updated)" if notice.updated else "")
+        if username
+        else "* Unknown student"
+        for username, notice in first.items()
+    )
+    count = len(first)
+    header = f"{count} solution" if count == 1 else f"{count} solutions"
+    if updated:
+        header += f" ({updated} updated)"
+    await bot.send_message(
+        chat_id,
+        f"{header} for {hbold(notices[0].task_name)} "
+        f"in the last {_minutes(elapsed)}:\n{students}\n"
+        "Open the task to review them.",
+    )
+
+
+async def deliver_grade(
+    bot: Bot, chat_id: int, notices: list[GradeNotice]
+) -> None:
+    notice = notices[-1]
+    await bot.send_message(
+        chat_id,
+        f'Your solution for task "{hbold(notice.task_name)}" was reviewed. '
+        f"Final grade: {hbold(notice.grade)}",
+    )
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from types import FrameType
+from typing import Any, Awaitable, Callable
+
+# Samples taken while the profiled task waits and other tasks run
+AWAITING = "[awaiting]"
+
+
+def collapse_stack(frame: FrameType | None, root: FrameType | None) -> str:
+    frames = []
+    while frame is not None:
+        code = frame.f_code
+        frames.append(
+            f"{code.co_name} ({code.co_filename}:{frame.f_lineno})"
+        )
+        if frame is root:
+            break
+        frame = frame.f_back
+    return ";".join(reversed(frames))
+
+
+class TaskSampler(threading.Thread):
+    # Samples the event loop thread only while the profiled task is the one
+    # running there, so updates interleaved on the loop are not recorded
+    # and don't pay for tracing
+    def __init__(
+        self, loop: asyncio.AbstractEventLoop, task: asyncio.Task, interval
+    ) -> None:
+        super().__init__(name="profiler", daemon=True)
+        self.loop = loop
+        self.task = task
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.samples: Counter[str] = Counter()
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        root = self.task.get_coro().cr_frame
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            # The task may switch while the stack is read, such a sample
+            # is counted as waiting
+            if asyncio.current_task(self.loop) is not self.task:
+                self.samples[AWAITING] += 1
+            else:
+                self.samples[collapse_stack(frame, root)] += 1
+            del frame
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self.join()
+
+
+class Profiler:
+    def __init__(
+        self,
+        threshold: float,
+        directory: str,
+        keep: int,
+        interval: float = 0.005,
+    ) -> None:
+        self.threshold = threshold
+        self.directory = Path(directory)
+        self.keep = keep
+        self.interval = interval
+        self.handlers: set[str] = set()
+        self.users: set[int] = set()
+
+    def should_profile(self, handler: str, user_id: int | None) -> bool:
+        return handler in self.handlers or user_id in self.users
+
+    async def run(
+        self, name: str, update_id: int | None, call: Callable[[], Awaitable]
+    ) -> Any:
+        sampler = TaskSampler(
+            asyncio.get_running_loop(), asyncio.current_task(), self.interval
+        )
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            return await call()
+        finally:
+            sampler.stop()
+            elapsed = time.perf_counter() - started
+            if elapsed >= self.threshold:
+                self._save(sampler.samples, name, update_id, elapsed)
+
+    def _save(
+        self,
+        samples: Counter[str],
+        name: str,
+        update_id: int | None,
+        elapsed: float,
+    ) -> None:
+        # Collapsed stacks, one "frame;frame;... count" line per stack, as
+        # read by flamegraph.pl and speedscope
+        self.directory.mkdir(parents=True, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        path = self.directory / f"{timestamp}_{name}_{update_id}.collapsed"
+        path.write_text(
+            "".join(
+                f"{stack} {count}\n" for stack, count in samples.most_common()
+            )
+        )
+        logging.info(f"Saved profile of {name} ({elapsed:.2f}s) to {path}")
+        profiles = sorted(self.directory.glob("*.collapsed"))
+        for old_profile in profiles[: -self.keep]:
+            old_profile.unlink(missing_ok=True)
@@ -0,0 +1,57 @@
+import logging
+from collections import Counter
+
+from tgbot.misc.metrics import current_update
+from tgbot.misc.query_log import normalize_query, query_caller
+from tgbot.models.backend import query_observers
+
+
+class RepeatedQueryError(Exception):
+    pass
+
+
+class QueryCounter:
+    def __init__(self) -> None:
+        self.shapes = Counter()
+
+    @property
+    def total(self) -> int:
+        return sum(self.shapes.values())
+
+    def repeated(self, limit: int) -> dict[str, int]:
+        return {
+            shape: count
+            for shape, count in self.shapes.items()
+            if count > limit
+        }
+
+    def __call__(self, query: str, values, duration: float) -> None:
+        self.shapes[normalize_query(query)] += 1
+
+    def __enter__(self) -> "QueryCounter":
+        query_observers.append(self)
+        return self
+
+    def __exit__(self, *args) -> None:
+        query_observers.remove(self)
+
+
+class QueryGuard:
+    def __init__(self, repeat_limit: int, strict: bool = False) -> None:
+        self.repeat_limit = repeat_limit
+        self.strict = strict
+
+    def observe(self, query: str, values, duration: float) -> None:
+        if not (stats := current_update.get()):
+            return
+        shape = normalize_query(query)
+        stats.queries[shape] += 1
+        if stats.queries[shape] != self.repeat_limit + 1:
+            return
+        text = (
+            f"Query repeated more than {self.repeat_limit} times in "
+            f"handler {stats.handler} ({query_caller()}): {shape}"
+        )
+        if self.strict:
+            raise RepeatedQueryError(text)
+        logging.warning(text)
@@ -0,0 +1,116 @@
+import asyncio
+import functools
+import inspect
+import logging
+import re
+from contextvars import ContextVar
+
+from tortoise import Tortoise
+
+from tgbot.misc.metrics import current_update
+
+EXPLAINABLE = ("SELECT", "UPDATE", "DELETE", "INSERT")
+MAX_SHAPES = 500
+
+db_method: ContextVar[str | None] = ContextVar("db_method", default=None)
+explaining: ContextVar[bool] = ContextVar("explaining", default=False)
+
+
+def normalize_query(query: str) -> str:
+    query = re.sub(r"'(?:[^']|'')*'", "?", query)
+    query = re.sub(r"\b\d+(?:\.\d+)?\b", "?", query)
+    query = re.sub(r"\(\?(?:\s*,\s*\?)+\)", "(...)", query)
+    return " ".join(query.split())
+
+
+def query_caller() -> str:
+    if method := db_method.get():
+        return method
+    if stats := current_update.get():
+        return f"handler:{stats.handler}"
+    return "-"
+
+
+def trace_methods(cls: type) -> type:
+    for name, method in list(vars(cls).items()):
+        if not name.startswith("_") and inspect.iscoroutinefunction(method):
+            setattr(cls, name, _traced(method))
+    return cls
+
+
+def _traced(method):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        token = db_method.set(method.__name__)
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            db_method.reset(token)
+
+    return wrapper
+
+
+class QueryShape:
+    def __init__(self, caller: str) -> None:
+        self.caller = caller
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, duration: float) -> None:
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+
+
+class QueryLog:
+    def __init__(self, threshold: float) -> None:
+        self.threshold = threshold
+        self.shapes: dict[str, QueryShape] = {}
+
+    def observe(self, query: str, values, duration: float) -> None:
+        if explaining.get():
+            return
+        caller = query_caller()
+        shape = normalize_query(query)
+        if shape not in self.shapes:
+            if len(self.shapes) >= MAX_SHAPES:
+                del self.shapes[min(self.shapes, key=self._total)]
+            self.shapes[shape] = QueryShape(caller)
+        self.shapes[shape].observe(duration)
+        if duration >= self.threshold:
+            asyncio.get_running_loop().create_task(
+                self._log_slow(query, values, duration, caller)
+            )
+
+    def top(self, limit: int = 10) -> list[tuple[str, QueryShape]]:
+        return sorted(self.shapes.items(), key=lambda item: -item[1].total)[
+            :limit
+        ]
+
+    def reset(self) -> None:
+        self.shapes.clear()
+
+    def _total(self, shape: str) -> float:
+        return self.shapes[shape].total
+
+    async def _log_slow(
+        self, query: str, values, duration: float, caller: str
+    ) -> None:
+        plan = await self.explain(query, values)
+        logging.warning(
+            f"Slow query ({duration * 1000:.1f} ms) in {caller}: "
+            f"{query} {values}\nQuery plan:\n{plan}"
+        )
+
+    async def explain(self, query: str, values) -> str:
+        if not query.lstrip().upper().startswith(EXPLAINABLE):
+            return "-"
+        explaining.set(True)
+        try:
+            rows = await Tortoise.get_connection("default").execute_query_dict(
+                f"EXPLAIN QUERY PLAN {query}", values
+            )
+        except Exception as e:
+            return f"Error while explaining query: {e}"
+        return "\n".join(row["detail"] for row in rows) or "-"
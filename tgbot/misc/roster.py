@@ -0,0 +1,35 @@
+import re
+
+ROSTER_EXTENSIONS = (".csv", ".txt")
+MAX_ROSTER_SIZE = 256 * 1024
+MAX_ROSTER_ENTRIES = 1000
+USERNAME_PATTERN = re.compile(r"@?([A-Za-z][A-Za-z0-9_]{3,31})")
+SEPARATORS = re.compile(r"[\s,;]+")
+
+
+def parse_roster(text: str) -> tuple[set[int], set[str], list[str]]:
+    user_ids, usernames, invalid = set(), set(), []
+    for entry in SEPARATORS.split(text):
+        if not entry:
+            continue
+        if entry.isdigit():
+            user_ids.add(int(entry))
+        elif match := USERNAME_PATTERN.fullmatch(entry):
+            usernames.add(match.group(1))
+        else:
+            invalid.append(entry)
+    return user_ids, usernames, invalid
+
+
+def unresolved_entries(
+    user_ids: set[int], usernames: set[str], students: list
+) -> list[str]:
+    found_ids = {student.user_id for student in students}
+    found_names = {
+        student.username.casefold() for student in students if student.username
+    }
+    return [str(user_id) for user_id in sorted(user_ids - found_ids)] + [
+        f"@{username}"
+        for username in sorted(usernames)
+        if username.casefold() not in found_names
+    ]
@@ -0,0 +1,65 @@
+import re
+from html import escape
+from typing import NamedTuple
+
+PAGE_SIZE = 10
+MAX_TERMS = 8
+# The index wraps matched words in these characters, they are replaced
+# with tags after the text is escaped
+MATCH_START = "\x02"
+MATCH_END = "\x03"
+KIND_LABELS = {
+    "subject": "Subject",
+    "task": "Task",
+    "student": "Student",
+    "solution": "Solution",
+}
+
+
+class SearchResult(NamedTuple):
+    kind: str
+    object_id: int
+    subject_id: int
+    subject_name: str
+    title: str | None
+    detail: str | None
+    score: float
+
+
+def match_query(text: str) -> str | None:
+    # Every word is quoted, so the user can't write FTS5 syntax by
+    # accident, and matches as a prefix: "alg" finds "algebra"
+    terms = re.findall(r"\w+", text)[:MAX_TERMS]
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def highlight(text: str | None) -> str:
+    return (
+        escape(text or "")
+        .replace(MATCH_START, "<b>")
+        .replace(MATCH_END, "</b>")
+    )
+
+
+def format_result(result: SearchResult, link: str) -> str:
+    label = KIND_LABELS[result.kind]
+    subject = escape(result.subject_name)
+    if result.kind == "solution":
+        text = (
+            f"{label} of {highlight(result.detail)} for "
+            f"{escape(result.title)} in {subject}"
+        )
+    elif result.kind == "student":
+        username = f" (@{highlight(result.detail)})" if result.detail else ""
+        text = f"{label} {highlight(result.title)}{username} in {subject}"
+    elif result.kind == "task":
+        text = f"{label} {highlight(result.title)} in {subject}"
+        if result.detail:
+            text += f": {highlight(result.detail)}"
+    else:
+        text = f"{label} {highlight(result.title)}"
+        if result.detail:
+            text += f": {highlight(result.detail)}"
+    return f'{text} <a href="{link}">Open</a>'
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import os
+import tempfile
+import zipfile
+from pathlib import PurePath
+
+from aiogram import Bot
+from aiogram.types import FSInputFile
+
+from tgbot.misc.storage import Storage
+from tgbot.models.models import Solution
+
+# Bots can send documents up to 50 MB, keep some room for zip headers
+ARCHIVE_PART_SIZE = 49 * 1024 * 1024
+FETCH_CONCURRENCY = 4
+
+
+class ArchiveWriter:
+    # Writes files into zip parts on disk and sends every part as soon as
+    # the next file would not fit into it
+    def __init__(
+        self,
+        bot: Bot,
+        chat_id: int,
+        name: str,
+        directory: str,
+        part_size: int = ARCHIVE_PART_SIZE,
+    ) -> None:
+        self.bot = bot
+        self.chat_id = chat_id
+        self.name = name
+        self.directory = directory
+        self.part_size = part_size
+        self.parts = 0
+        self.names: set[str] = set()
+        self.lock = asyncio.Lock()
+        self._zip: zipfile.ZipFile | None = None
+        self._path: str | None = None
+
+    def _unique_name(self, name: str) -> str:
+        stem, suffix = os.path.splitext(name)
+        candidate, index = name, 1
+        while candidate in self.names:
+            index += 1
+            candidate = f"{stem} ({index}){suffix}"
+        self.names.add(candidate)
+        return candidate
+
+    async def add(self, path: str, name: str) -> bool:
+        size = os.path.getsize(path)
+        if size > self.part_size:
+            # Would make a part larger than the bot can send
+            return False
+        if self._zip and self._zip.fp.tell() + size > self.part_size:
+            await self._send_part(last=False)
+        if self._zip is None:
+            self.parts += 1
+            self._path = os.path.join(self.directory, f"{self.parts}.zip")
+            # Solutions are pdf/docx files that are compressed already
+            self._zip = zipfile.ZipFile(self._path, "w", zipfile.ZIP_STORED)
+        await asyncio.to_thread(self._zip.write, path, self._unique_name(name))
+        return True
+
+    async def close(self) -> None:
+        if self._zip:
+            await self._send_part(last=True)
+
+    async def _send_part(self, last: bool) -> None:
+        self._zip.close()
+        if last and self.parts == 1:
+            file_name = f"{self.name}.zip"
+        else:
+            file_name = f"{self.name}.part{self.parts}.zip"
+        await self.bot.send_document(
+            self.chat_id, FSInputFile(self._path, filename=file_name)
+        )
+        os.remove(self._path)
+        self._zip = None
+
+
+def archive_name(solution: Solution) -> str:
+    file_name = solution.file_name or PurePath(solution.file_link).name
+    student = solution.student
+    folder = student.name or student.username or str(student.user_id)
+    return f"{folder.replace('/', '_')}/{file_name}"
+
+
+async def export_solutions(
+    bot: Bot,
+    storage: Storage,
+    chat_id: int,
+    name: str,
+    solutions: list[Solution],
+    concurrency: int = FETCH_CONCURRENCY,
+    part_size: int = ARCHIVE_PART_SIZE,
+) -> tuple[int, list[Solution]]:
+    # Returns the number of archived solutions and the ones too large for
+    # an archive part
+    semaphore = asyncio.Semaphore(concurrency)
+    oversized = []
+    with tempfile.TemporaryDirectory() as directory:
+        archive = ArchiveWriter(bot, chat_id, name, directory, part_size)
+
+        async def fetch(solution: Solution) -> bool:
+            # The slot is held until the file is in the archive, so at most
+            # `concurrency` downloaded files wait on disk
+            async with semaphore:
+                path = os.path.join(directory, f"solution{solution.id}")
+                if not await asyncio.to_thread(
+                    storage.download_file, solution.file_link, path
+                ):
+                    return False
+                try:
+                    async with archive.lock:
+                        added = await archive.add(path, archive_name(solution))
+                finally:
+                    os.remove(path)
+                if not added:
+                    oversized.append(solution)
+                return added
+
+        # gather doesn't cancel the other downloads when one fails, they
+        # are stopped before the directory is removed
+        tasks = [
+            asyncio.create_task(fetch(solution))
+            for solution in solutions
+            if solution.file_link
+        ]
+        try:
+            results = await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        await archive.close()
+    exported = sum(results)
+    logging.info(
+        f"Exported {exported} of {len(solutions)} solutions, "
+        f"{len(oversized)} too large"
+    )
+    return exported, oversized
@@ -0,0 +1,166 @@
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+import tempfile
+from pathlib import PurePath
+from typing import Any, Awaitable, Callable
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Document, FSInputFile, InlineKeyboardMarkup, Message
+from aiogram.utils.markdown import hbold, hlink
+
+from loader import links
+from tgbot.misc.concurrency import KeyedLock
+from tgbot.misc.database import Database
+from tgbot.misc.storage import Storage
+from tgbot.misc.utils import delete_file
+from tgbot.models.models import Solution
+
+SOLUTIONS_PREFIX = "solutions"
+
+object_lock = KeyedLock()
+
+
+class HashingWriter:
+    def __init__(self, file) -> None:
+        self.file = file
+        self.hash = hashlib.sha256()
+        self.size = 0
+
+    def write(self, chunk: bytes) -> int:
+        self.hash.update(chunk)
+        self.size += len(chunk)
+        return self.file.write(chunk)
+
+    def flush(self) -> None:
+        self.file.flush()
+
+    def seek(self, *args) -> int:
+        return self.file.seek(*args)
+
+
+def hash_file(path: str) -> tuple[str, int]:
+    with open(path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if not size:
+            return hashlib.sha256().hexdigest(), 0
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return hashlib.sha256(mapped).hexdigest(), size
+
+
+def solution_key(digest: str, file_name: str | None) -> str:
+    suffix = PurePath(file_name or "").suffix.lower()
+    return f"{SOLUTIONS_PREFIX}/{digest}{suffix}"
+
+
+async def store_solution_file(
+    bot: Bot,
+    storage: Storage,
+    db: Database,
+    document: Document,
+    on_downloaded: Callable[[], Awaitable[Any]] | None = None,
+) -> str | None:
+    file = await bot.get_file(document.file_id)
+    api = bot.session.api
+    if api.is_local:
+        # The local Bot API server has already saved the file to disk, so
+        # it is hashed and uploaded from there without another copy
+        path = str(api.wrap_local_file.to_local(file.file_path))
+        digest, size = await asyncio.to_thread(hash_file, path)
+        if on_downloaded:
+            await on_downloaded()
+        return await store_object(
+            storage, db, path, solution_key(digest, document.file_name), size
+        )
+    temp_file = tempfile.NamedTemporaryFile(delete=False)
+    try:
+        with temp_file:
+            writer = HashingWriter(temp_file)
+            await bot.download_file(file.file_path, writer)
+        if on_downloaded:
+            await on_downloaded()
+        key = solution_key(writer.hash.hexdigest(), document.file_name)
+        return await store_object(
+            storage, db, temp_file.name, key, writer.size
+        )
+    finally:
+        delete_file(temp_file.name)
+
+
+async def store_object(
+    storage: Storage, db: Database, path: str, key: str, size: int
+) -> str | None:
+    async with object_lock(key):
+        if not await db.acquire_solution_file(key, size):
+            logging.info(f"Solution file {key} already stored")
+            return key
+        if await asyncio.to_thread(storage.add_file, path, key):
+            return key
+        await db.release_solution_file(key)
+        return None
+
+
+async def release_solution_file(
+    storage: Storage, db: Database, key: str
+) -> None:
+    async with object_lock(key):
+        # Objects stored before deduplication have no reference count
+        if await db.release_solution_file(key) is not False:
+            await asyncio.to_thread(storage.delete_file, key)
+
+
+async def send_solution(
+    bot: Bot,
+    storage: Storage,
+    db: Database,
+    chat_id: int,
+    solution: Solution,
+    caption: str,
+    reply_markup: InlineKeyboardMarkup | None = None,
+) -> Message:
+    if solution.file_id:
+        try:
+            return await bot.send_document(
+                chat_id,
+                solution.file_id,
+                caption=caption,
+                reply_markup=reply_markup,
+            )
+        except TelegramBadRequest as e:
+            logging.warning(
+                f"Can't resend solution {solution.id} by file_id: {e}"
+            )
+    # The file_id is missing or no longer valid, so upload the stored copy
+    # and remember the new file_id
+    file_name = solution.file_name or PurePath(solution.file_link).name
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, file_name)
+        if await asyncio.to_thread(
+            storage.download_file, solution.file_link, path
+        ):
+            message = await bot.send_document(
+                chat_id,
+                FSInputFile(path, filename=file_name),
+                caption=caption,
+                reply_markup=reply_markup,
+            )
+            if message.document:
+                await db.update_solution_file_id(
+                    solution.id, message.document.file_id
+                )
+            return message
+    return await bot.send_message(
+        chat_id,
+        f"{caption}\n{hbold('File link')}: "
+        f"{hlink('Click here', solution_link(storage, solution))}",
+        reply_markup=reply_markup,
+    )
+
+
+def solution_link(storage: Storage, solution: Solution) -> str:
+    if links.enabled:
+        return links.url(solution.id)
+    return storage.create_presigned_url(solution.file_link, solution.file_name)
@@ -1,8 +1,36 @@
+import base64
+import hashlib
 import logging
+import math
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Iterable, Iterator
+from urllib.parse import quote
 
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError, NoCredentialsError
 
+MB = 1024 * 1024
+CHECKSUM_ALGORITHM = "SHA256"
+
+
+def part_checksum(data: bytes) -> str:
+    return base64.b64encode(hashlib.sha256(data).digest()).decode()
+
+
+def content_disposition(file_name: str) -> str:
+    # Quotes and control characters can't break out of the ASCII fallback,
+    # clients that support RFC 6266 read the exact name from filename*
+    fallback = re.sub(r'[^\x20-\x7e]|["\\]', "_", file_name)
+    return (
+        f'attachment; filename="{fallback}"; '
+        f"filename*=UTF-8''{quote(file_name, safe='')}"
+    )
+
 
 class Storage:
     def __init__(
@@ -11,15 +39,32 @@ class Storage:
         access_key: str,
         bucket_name: str,
         region_name: str,
+        endpoint_url: str | None = None,
+        multipart_threshold: int = 8 * MB,
+        multipart_chunksize: int = 8 * MB,
+        max_concurrency: int = 10,
+        max_attempts: int = 5,
     ):
         self.bucket_name = bucket_name
         self.region_name = region_name
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_chunksize,
+            max_concurrency=max_concurrency,
+        )
         try:
             self.client = boto3.client(
                 service_name="s3",
                 region_name=self.region_name,
                 aws_access_key_id=access_id,
                 aws_secret_access_key=access_key,
+                endpoint_url=endpoint_url,
+                config=Config(
+                    retries={"max_attempts": max_attempts, "mode": "adaptive"},
+                    # Every part in flight needs its own connection
+                    max_pool_connections=max(max_concurrency, 10),
+                    s3={"addressing_style": "path"} if endpoint_url else None,
+                ),
             )
             self.create_bucket_if_not_exists()
         except NoCredentialsError:
@@ -52,15 +97,63 @@ class Storage:
 
     def get_objects(self) -> list:
         try:
-            response = self.client.list_objects_v2(Bucket=self.bucket_name)
-            return response["Contents"]
+            return [
+                item for page in self.iter_object_pages() for item in page
+            ]
         except Exception as e:
             logging.error(f"Error while listing objects: {e}")
             return []
 
+    def iter_object_pages(
+        self, prefix: str = "", page_size: int = 1000
+    ) -> Iterator[list[dict]]:
+        # Pages come in key order, at most `page_size` objects each
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(
+            Bucket=self.bucket_name,
+            Prefix=prefix,
+            PaginationConfig={"PageSize": page_size},
+        ):
+            if contents := page.get("Contents"):
+                yield contents
+
+    def delete_files(self, file_names: list[str]) -> list[str]:
+        # DeleteObjects takes at most 1000 keys per request
+        deleted = []
+        for start in range(0, len(file_names), 1000):
+            batch = file_names[start : start + 1000]
+            try:
+                response = self.client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={
+                        "Objects": [{"Key": name} for name in batch],
+                        "Quiet": True,
+                    },
+                )
+            except Exception as e:
+                logging.error(f"Error while deleting files: {e}")
+                continue
+            failed = {error["Key"] for error in response.get("Errors", [])}
+            for error in response.get("Errors", []):
+                logging.error(
+                    f"Error while deleting {error['Key']}: {error['Message']}"
+                )
+            deleted.extend(name for name in batch if name not in failed)
+        return deleted
+
     def add_file(self, file_name: str, name: str) -> bool:
         try:
-            _ = self.client.upload_file(file_name, self.bucket_name, name)
+            size = os.path.getsize(file_name)
+            if size >= self.transfer_config.multipart_threshold:
+                self.upload_multipart(file_name, name, size)
+            else:
+                self.client.upload_file(
+                    file_name,
+                    self.bucket_name,
+                    name,
+                    ExtraArgs={"ChecksumAlgorithm": CHECKSUM_ALGORITHM},
+                    Config=self.transfer_config,
+                )
             logging.info(
                 f"File '{file_name}' successfully uploaded as '{name}'"
             )
@@ -69,15 +162,199 @@ class Storage:
             logging.error(f"Error while uploading file: {e}")
             return False
 
-    def download_file(self, file_name) -> bool:
+    def download_file(self, file_name, destination: str | None = None) -> bool:
         try:
-            self.client.download_file(self.bucket_name, file_name, file_name)
+            self.client.download_file(
+                self.bucket_name,
+                file_name,
+                destination or file_name,
+                ExtraArgs={"ChecksumMode": "ENABLED"},
+                Config=self.transfer_config,
+            )
             logging.info(f"File '{file_name}' successfully downloaded")
             return True
         except Exception as e:
             logging.error(f"Error while downloading file: {e}")
             return False
 
+    def find_multipart_upload(self, name: str) -> tuple[str | None, dict]:
+        # Keys are content hashes, so an unfinished upload of the same key
+        # holds parts of the very same file
+        uploads = self.client.list_multipart_uploads(
+            Bucket=self.bucket_name, Prefix=name
+        ).get("Uploads", [])
+        uploads = [upload for upload in uploads if upload["Key"] == name]
+        if not uploads:
+            return None, {}
+        upload_id = max(uploads, key=lambda upload: upload["Initiated"])[
+            "UploadId"
+        ]
+        parts = {}
+        paginator = self.client.get_paginator("list_parts")
+        for page in paginator.paginate(
+            Bucket=self.bucket_name, Key=name, UploadId=upload_id
+        ):
+            for part in page.get("Parts", []):
+                parts[part["PartNumber"]] = part
+        return upload_id, parts
+
+    def list_stale_uploads(self, cutoff: datetime) -> list[dict]:
+        # Failed uploads stay open to be resumed, but only an upload of the
+        # same content resumes them, so old ones are aborted by the GC
+        paginator = self.client.get_paginator("list_multipart_uploads")
+        return [
+            upload
+            for page in paginator.paginate(Bucket=self.bucket_name)
+            for upload in page.get("Uploads", [])
+            if upload["Initiated"] < cutoff
+        ]
+
+    def abort_upload(self, name: str, upload_id: str) -> bool:
+        try:
+            self.client.abort_multipart_upload(
+                Bucket=self.bucket_name, Key=name, UploadId=upload_id
+            )
+            return True
+        except Exception as e:
+            logging.error(f"Error while aborting upload of {name}: {e}")
+            return False
+
+    def upload_part(
+        self,
+        file_name: str,
+        name: str,
+        upload_id: str,
+        number: int,
+        uploaded: dict | None,
+    ) -> dict:
+        chunk_size = self.transfer_config.multipart_chunksize
+        with open(file_name, "rb") as f:
+            f.seek((number - 1) * chunk_size)
+            data = f.read(chunk_size)
+        checksum = part_checksum(data)
+        if (
+            uploaded
+            and uploaded["Size"] == len(data)
+            and uploaded.get("ChecksumSHA256") == checksum
+        ):
+            return {
+                "PartNumber": number,
+                "ETag": uploaded["ETag"],
+                "ChecksumSHA256": checksum,
+            }
+        return self.send_part(name, upload_id, number, data, checksum)
+
+    def upload_multipart(self, file_name: str, name: str, size: int) -> None:
+        # Unlike upload_file, parts that reached S3 before a crash are kept
+        # and only the missing ones are sent on the next attempt
+        upload_id, uploaded = self.find_multipart_upload(name)
+        if upload_id:
+            logging.info(f"Resuming upload of '{name}', {len(uploaded)} parts")
+        else:
+            upload_id = self.client.create_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=name,
+                ChecksumAlgorithm=CHECKSUM_ALGORITHM,
+            )["UploadId"]
+        numbers = range(
+            1, math.ceil(size / self.transfer_config.multipart_chunksize) + 1
+        )
+        with ThreadPoolExecutor(self.transfer_config.max_concurrency) as pool:
+            futures = [
+                pool.submit(
+                    self.upload_part,
+                    file_name,
+                    name,
+                    upload_id,
+                    number,
+                    uploaded.get(number),
+                )
+                for number in numbers
+            ]
+            parts = [future.result() for future in futures]
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket_name,
+            Key=name,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": parts},
+        )
+
+    def upload_stream(self, chunks: Iterable[bytes], name: str) -> int:
+        # For data produced on the fly: parts are cut from the stream and
+        # sent one by one, so only a single part is held in memory
+        chunk_size = self.transfer_config.multipart_chunksize
+        upload_id, parts, buffer, size = None, [], bytearray(), 0
+        try:
+            for chunk in chunks:
+                buffer += chunk
+                size += len(chunk)
+                while len(buffer) >= chunk_size:
+                    if upload_id is None:
+                        upload_id = self.client.create_multipart_upload(
+                            Bucket=self.bucket_name,
+                            Key=name,
+                            ChecksumAlgorithm=CHECKSUM_ALGORITHM,
+                        )["UploadId"]
+                    parts.append(
+                        self.send_part(
+                            name,
+                            upload_id,
+                            len(parts) + 1,
+                            bytes(buffer[:chunk_size]),
+                        )
+                    )
+                    del buffer[:chunk_size]
+            if upload_id is None:
+                self.client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=name,
+                    Body=bytes(buffer),
+                    ChecksumSHA256=part_checksum(buffer),
+                )
+                return size
+            if buffer:
+                parts.append(
+                    self.send_part(
+                        name, upload_id, len(parts) + 1, bytes(buffer)
+                    )
+                )
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=name,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+            return size
+        except Exception:
+            if upload_id:
+                self.client.abort_multipart_upload(
+                    Bucket=self.bucket_name, Key=name, UploadId=upload_id
+                )
+            raise
+
+    def send_part(
+        self,
+        name: str,
+        upload_id: str,
+        number: int,
+        data: bytes,
+        checksum: str | None = None,
+    ) -> dict:
+        checksum = checksum or part_checksum(data)
+        response = self.client.upload_part(
+            Bucket=self.bucket_name,
+            Key=name,
+            UploadId=upload_id,
+            PartNumber=number,
+            Body=data,
+            ChecksumSHA256=checksum,
+        )
+        return {
+            "PartNumber": number,
+            "ETag": response["ETag"],
+            "ChecksumSHA256": checksum,
+        }
+
     def delete_file(self, file_name) -> bool:
         try:
             self.client.delete_object(Bucket=self.bucket_name, Key=file_name)
@@ -89,12 +366,22 @@ class Storage:
             logging.error(f"Error while deleting file: {e}")
             return False
 
-    def create_presigned_url(self, file_name) -> str:
+    def create_presigned_url(
+        self,
+        file_name,
+        download_name: str | None = None,
+        expires_in: int = 60,
+    ) -> str:
+        params = {"Bucket": self.bucket_name, "Key": file_name}
+        if download_name:
+            params["ResponseContentDisposition"] = content_disposition(
+                download_name
+            )
         try:
             return self.client.generate_presigned_url(
                 "get_object",
-                Params={"Bucket": self.bucket_name, "Key": file_name},
-                ExpiresIn=60,
+                Params=params,
+                ExpiresIn=expires_in,
             )
         except Exception as e:
             logging.error(f"Error while creating presigned URL: {e}")
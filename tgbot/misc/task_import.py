@@ -0,0 +1,76 @@
+import csv
+import io
+import json
+from pathlib import PurePath
+
+from tgbot.filters.date_validation import DATE_FORMAT, parse_due_date
+
+IMPORT_EXTENSIONS = (".csv", ".json")
+MAX_IMPORT_SIZE = 1024 * 1024
+MAX_IMPORT_ROWS = 500
+NAME_LENGTH = 255
+DESCRIPTION_LENGTH = 200
+
+
+class TaskImportError(ValueError):
+    pass
+
+
+def read_rows(content: bytes, file_name: str) -> list[dict]:
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise TaskImportError("File must be encoded in UTF-8")
+    if PurePath(file_name).suffix.lower() == ".json":
+        try:
+            rows = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise TaskImportError(f"Invalid JSON: {e.msg}")
+        if not isinstance(rows, list):
+            raise TaskImportError("JSON must be a list of tasks")
+        return rows
+    return list(csv.DictReader(io.StringIO(text)))
+
+
+def validate_row(row) -> dict | str:
+    if not isinstance(row, dict):
+        return "not an object"
+    name = str(row.get("name") or "").strip()
+    description = str(row.get("description") or "").strip()
+    due_date = str(row.get("due_date") or "").strip()
+    if not name:
+        return "name is empty"
+    if len(name) > NAME_LENGTH:
+        return f"name is longer than {NAME_LENGTH} symbols"
+    if not description:
+        return "description is empty"
+    if len(description) > DESCRIPTION_LENGTH:
+        return f"description is longer than {DESCRIPTION_LENGTH} symbols"
+    if not (validated_date := parse_due_date(due_date)):
+        return f"due date must be {DATE_FORMAT} and not in the past"
+    return {
+        "name": name,
+        "description": description,
+        "due_date": validated_date.isoformat(),
+    }
+
+
+def parse_tasks(
+    content: bytes, file_name: str
+) -> tuple[list[dict], list[tuple[int, str]]]:
+    # Rows are numbered as the teacher sees them: the CSV header is line 1
+    rows = read_rows(content, file_name)
+    if len(rows) > MAX_IMPORT_ROWS:
+        raise TaskImportError(
+            f"Too many tasks, at most {MAX_IMPORT_ROWS} per file"
+        )
+    is_json = PurePath(file_name).suffix.lower() == ".json"
+    first_row = 1 if is_json else 2
+    tasks, rejected = [], []
+    for number, row in enumerate(rows, first_row):
+        result = validate_row(row)
+        if isinstance(result, str):
+            rejected.append((number, result))
+        else:
+            tasks.append(result)
+    return tasks, rejected
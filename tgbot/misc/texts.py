@@ -3,10 +3,16 @@ Here are your opportunities:
 - To check if you are a teacher, type /is_teacher.
 - To create a new subject, type /create_subject.
 - To see your subjects, type /my_subjects.
+- To send an announcement to all students of a subject, type /announce.
+- To see closed subjects and export their grades, type /archived.
+- To find subjects, tasks, students and their solutions, type /search.
 - On the subjects message, you can: 
   1. Generate link to invite students
   2. Create task.
   3. See tasks.
+  4. Import tasks from a CSV or JSON file.
+  5. Enroll students from a roster of usernames or user IDs.
+  6. Close a finished subject and move it to the archive.
 - To see solutions for the task, click "See tasks".
 """
 
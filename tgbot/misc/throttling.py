@@ -0,0 +1,40 @@
+import time
+from typing import NamedTuple
+
+
+class Rate(NamedTuple):
+    per_second: float
+    burst: int
+
+
+class TokenBucket:
+    # Generic cell rate algorithm: a token bucket stored as a single float
+    # (the theoretical arrival time) per user, so 100k users stay compact
+    def __init__(self, rate: Rate, prune_interval: float = 60) -> None:
+        self.interval = 1 / rate.per_second
+        self.tolerance = self.interval * (rate.burst - 1)
+        self.prune_interval = prune_interval
+        self._arrivals: dict[int, float] = {}
+        self._pruned_at = time.monotonic()
+
+    def consume(self, user_id: int) -> float:
+        now = time.monotonic()
+        self._prune(now)
+        arrival = max(self._arrivals.get(user_id, now), now)
+        if arrival - now > self.tolerance:
+            return arrival - now - self.tolerance
+        self._arrivals[user_id] = arrival + self.interval
+        return 0
+
+    def _prune(self, now: float) -> None:
+        if now - self._pruned_at < self.prune_interval:
+            return
+        self._pruned_at = now
+        self._arrivals = {
+            user_id: arrival
+            for user_id, arrival in self._arrivals.items()
+            if arrival > now
+        }
+
+    def __len__(self) -> int:
+        return len(self._arrivals)
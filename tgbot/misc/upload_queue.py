@@ -0,0 +1,111 @@
+import asyncio
+import logging
+from collections import Counter
+from enum import Enum
+from typing import Awaitable, Callable
+
+from aiogram.types import Document
+
+# getFile only serves files up to 20 MB to bots on the cloud Bot API
+MAX_UPLOAD_SIZE = 20 * 1024 * 1024
+# A local Bot API server has no download limit, only the 2000 MB upload one
+LOCAL_MAX_UPLOAD_SIZE = 2000 * 1024 * 1024
+SOLUTION_MIME_TYPES = (
+    "application/pdf",
+    "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+)
+
+UploadJob = Callable[[], Awaitable[None]]
+
+
+class Admission(Enum):
+    ACCEPTED = "accepted"
+    TOO_LARGE = "too_large"
+    BAD_TYPE = "bad_type"
+    USER_BUSY = "user_busy"
+    QUEUE_FULL = "queue_full"
+
+
+class UploadQueue:
+    # Uploads are checked before anything is downloaded and handled by a
+    # fixed number of workers, so a deadline rush can't exhaust disk,
+    # memory or the S3 connection pool
+    def __init__(
+        self,
+        workers: int = 4,
+        max_queued: int = 50,
+        per_user: int = 2,
+        max_file_size: int = MAX_UPLOAD_SIZE,
+        mime_types: tuple[str, ...] = SOLUTION_MIME_TYPES,
+    ) -> None:
+        self.workers = workers
+        self.per_user = per_user
+        self.max_file_size = max_file_size
+        self.mime_types = mime_types
+        self.active = 0
+        self.rejected: Counter[Admission] = Counter()
+        self._queue: asyncio.Queue[tuple[int, UploadJob]] = asyncio.Queue(
+            max_queued
+        )
+        self._users: Counter[int] = Counter()
+        self._workers: list[asyncio.Task] = []
+
+    def admit(self, user_id: int, document: Document) -> Admission:
+        if document.file_size and document.file_size > self.max_file_size:
+            admission = Admission.TOO_LARGE
+        elif document.mime_type not in self.mime_types:
+            admission = Admission.BAD_TYPE
+        elif self._users[user_id] >= self.per_user:
+            admission = Admission.USER_BUSY
+        elif self._queue.full():
+            admission = Admission.QUEUE_FULL
+        else:
+            return Admission.ACCEPTED
+        self.rejected[admission] += 1
+        return admission
+
+    def submit(
+        self, user_id: int, document: Document, job: UploadJob
+    ) -> Admission:
+        if (admission := self.admit(user_id, document)) is Admission.ACCEPTED:
+            self._users[user_id] += 1
+            self._queue.put_nowait((user_id, job))
+        return admission
+
+    async def _work(self) -> None:
+        while True:
+            user_id, job = await self._queue.get()
+            self.active += 1
+            try:
+                await job()
+            except Exception:
+                logging.exception(f"Upload job of user {user_id} failed")
+            finally:
+                self.active -= 1
+                self._users[user_id] -= 1
+                if not self._users[user_id]:
+                    del self._users[user_id]
+                self._queue.task_done()
+
+    def start(self) -> None:
+        self._workers = [
+            asyncio.create_task(self._work()) for _ in range(self.workers)
+        ]
+
+    async def stop(self) -> None:
+        # Accepted uploads were already confirmed to students, finish them
+        await self._queue.join()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def gauges(self) -> dict[str, int]:
+        return {
+            "queued": self._queue.qsize(),
+            "active": self.active,
+            **{
+                f"rejected_{admission.value}": count
+                for admission, count in self.rejected.items()
+            },
+        }
@@ -10,10 +10,18 @@ from aiogram.utils.markdown import hbold, hlink
 from loader import bot
 from tgbot.keyboards.inline.support_keyboard import support_keyboard
 from tgbot.keyboards.inline.task_keyboard import task_keyboard
+from tgbot.keyboards.reply.options_keyboard import options_keyboard
 from tgbot.misc.charts import ChartType, send_chart
 from tgbot.misc.database import Database
+from tgbot.misc.gradebook import GradebookFormat, send_gradebook
 from tgbot.models.models import Student, Subject, SubjectTask
-from tgbot.states.states import Task
+from tgbot.states.states import (
+    Announcement,
+    Options,
+    Roster,
+    Task,
+    TaskImport,
+)
 
 
 async def create_subject_message(
@@ -80,13 +88,18 @@ async def see_tasks(
         await message.answer(
             f"Here are your tasks for subject {hbold(subject.name)}"
         )
+        user_id = message.from_user.id
+        is_teacher = await db.is_teacher(user_id)
+        solutions = await db.get_student_solutions_for_tasks(
+            user_id, [task.id for task in tasks]
+        )
         for task in tasks:
             await message.answer(
                 f"{hbold('Name')}: {task.name}\n"
                 f"{hbold('Description')}: {task.description}\n"
                 f"{hbold('Due date')}: {task.due_date}",
-                reply_markup=await task_keyboard(
-                    subject.id, task.id, message.from_user.id, db
+                reply_markup=task_keyboard(
+                    subject.id, task.id, is_teacher, solutions.get(task.id)
                 ),
             )
         return await message.answer("Your buttons depend on your role")
@@ -112,6 +125,105 @@ async def add_task(
     return await message.answer("You are not a teacher of this subject")
 
 
+async def import_tasks(
+    message: Message,
+    payload: dict,
+    db: Database,
+    state: FSMContext,
+    *args,
+    **kwargs,
+) -> str:
+    if (
+        (subject := await db.get_subject(payload.get("id")))
+        and (teacher := await subject.teacher)
+        and teacher.user_id == message.from_user.id
+    ):
+        await state.set_state(TaskImport.file)
+        await state.update_data(subject_id=subject.id)
+        return await message.answer(
+            "Send a CSV or JSON file with tasks. Every task needs "
+            f"{hbold('name')}, {hbold('description')} and "
+            f"{hbold('due_date')} in format dd/mm/yyyy"
+        )
+    return await message.answer("You are not a teacher of this subject")
+
+
+async def upload_roster(
+    message: Message,
+    payload: dict,
+    db: Database,
+    state: FSMContext,
+    *args,
+    **kwargs,
+) -> str:
+    if (
+        (subject := await db.get_subject(payload.get("id")))
+        and (teacher := await subject.teacher)
+        and teacher.user_id == message.from_user.id
+    ):
+        await state.set_state(Roster.entries)
+        await state.update_data(subject_id=subject.id)
+        return await message.answer(
+            "Send Telegram usernames or user IDs of students, one per line "
+            "or separated by commas. You can also send a .csv or .txt file"
+        )
+    return await message.answer("You are not a teacher of this subject")
+
+
+async def announce(
+    message: Message,
+    payload: dict,
+    db: Database,
+    state: FSMContext,
+    *args,
+    **kwargs,
+) -> str:
+    if (
+        (subject := await db.get_subject(payload.get("id")))
+        and (teacher := await subject.teacher)
+        and teacher.user_id == message.from_user.id
+    ):
+        await state.set_state(Announcement.message)
+        await state.update_data(subject_id=subject.id)
+        return await message.answer(
+            f"Write an announcement for {hbold(subject.name)}. "
+            "You can attach a file."
+        )
+    return await message.answer("You are not a teacher of this subject")
+
+
+async def close_subject(
+    message: Message,
+    payload: dict,
+    db: Database,
+    state: FSMContext,
+    *args,
+    **kwargs,
+) -> str:
+    if (
+        (subject := await db.get_subject(payload.get("id")))
+        and (teacher := await subject.teacher)
+        and teacher.user_id == message.from_user.id
+    ):
+        await state.set_state(Options.option)
+        await state.update_data(
+            {
+                "method": db.archive_subject,
+                "subject_id": subject.id,
+                "success": f"Subject {hbold(subject.name)} was closed. "
+                "Its grades are available in /archived",
+                "failure": "Subject was not closed",
+            }
+        )
+        return await message.answer(
+            f"Close {hbold(subject.name)}? Students will lose access to "
+            "its tasks and solutions, and the subject will become "
+            "read-only.",
+            reply_markup=options_keyboard(),
+        )
+    return await message.answer("You are not a teacher of this subject")
+
+
 def delete_file(file_path: str):
     try:
         os.remove(file_path)
@@ -134,7 +246,11 @@ async def gather_upcoming_tasks(
             student_id=student.pk, subject_task_id=task.pk
         ).first()
         is_done = "✅" if solution else "❌"
-        text = f"* Name: {hbold(task.name)}. Due date: {hbold(task.due_date.strftime('%d/%m/%Y'))}. Is done: {is_done}"
+        due_date = task.due_date.strftime("%d/%m/%Y")
+        text = (
+            f"* Name: {hbold(task.name)}. Due date: {hbold(due_date)}. "
+            f"Is done: {is_done}"
+        )
         if solution:
             text += f" Your grade: {hbold(solution.grade)}"
         tasks_texts.append(text)
@@ -216,11 +332,70 @@ async def subject_stats(
     )
 
 
+async def export_grades(
+    message: Message, payload: dict, db: Database, *args, **kwargs
+) -> str:
+    if not (
+        (subject := await db.get_subject(payload.get("id")))
+        and (teacher := await subject.teacher)
+        and teacher.user_id == message.from_user.id
+    ):
+        return await message.answer("You are not a teacher of this subject")
+    if not (rows := await db.get_gradebook_rows(subject.id)):
+        return await message.answer(
+            f"There are no students or tasks in {hbold(subject.name)}"
+        )
+    file_format = GradebookFormat(payload.get("format", "csv"))
+    return await send_gradebook(message, rows, subject.name, file_format)
+
+
+async def export_grades_xlsx(
+    message: Message, payload: dict, db: Database, *args, **kwargs
+) -> str:
+    return await export_grades(
+        message, {**payload, "format": "xlsx"}, db, *args, **kwargs
+    )
+
+
+async def export_archived_grades(
+    message: Message, payload: dict, db: Database, *args, **kwargs
+) -> str:
+    if not (
+        (subject := await db.get_archived_subject(payload.get("id")))
+        and (teacher := await db.get_teacher(message.from_user.id))
+        and teacher.id == subject["teacher_id"]
+    ):
+        return await message.answer("You are not a teacher of this subject")
+    if not (rows := await db.get_archived_gradebook_rows(subject["id"])):
+        return await message.answer(
+            f"There are no students or tasks in {hbold(subject['name'])}"
+        )
+    file_format = GradebookFormat(payload.get("format", "csv"))
+    return await send_gradebook(message, rows, subject["name"], file_format)
+
+
+async def export_archived_grades_xlsx(
+    message: Message, payload: dict, db: Database, *args, **kwargs
+) -> str:
+    return await export_archived_grades(
+        message, {**payload, "format": "xlsx"}, db, *args, **kwargs
+    )
+
+
+# Keys go into start links, whose payload is at most 64 characters
 utils = {
     "add_subject": add_student_to_subject,
     "quit_subject": quit_student_to_subject,
     "add_task": add_task,
+    "import_tasks": import_tasks,
+    "upload_roster": upload_roster,
+    "announce": announce,
     "see_tasks": see_tasks,
     "ask_teacher": ask_teacher,
     "subject_stats": subject_stats,
+    "export_grades": export_grades,
+    "export_grades_xlsx": export_grades_xlsx,
+    "close_subject": close_subject,
+    "arch_csv": export_archived_grades,
+    "arch_xlsx": export_archived_grades_xlsx,
 }
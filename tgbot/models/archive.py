@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import os
+
+from tortoise import Tortoise
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.transactions import in_transaction
+
+SCHEMA = "archive"
+# Parents first, so rows are copied in this order and deleted in reverse
+TABLES = ("subject", "subject_student", "subjecttask", "solution")
+# Rows of every table that belong to the subject given as the parameter
+SUBJECT_ROWS = {
+    "subject": "id = ?",
+    "subject_student": "subject_id = ?",
+    "subjecttask": "subject_id = ?",
+    "solution": "subject_task_id IN "
+    '(SELECT id FROM main."subjecttask" WHERE subject_id = ?)',
+}
+INDEXES = [
+    ("idx_archive_subject_teacher", "subject", ("teacher_id",)),
+    ("idx_archive_subject_student", "subject_student", ("subject_id",)),
+    ("idx_archive_task_subject", "subjecttask", ("subject_id",)),
+    ("idx_archive_solution_task", "solution", ("subject_task_id",)),
+    ("idx_archive_solution_file_link", "solution", ("file_link",)),
+]
+
+
+class Archive:
+    # Closed subjects live in a separate SQLite file that is attached to
+    # the connection the first time archived data is touched
+    def __init__(self, path: str = "archive.sqlite3") -> None:
+        self.path = path
+        self.attached = False
+        self._lock = asyncio.Lock()
+
+    @property
+    def exists(self) -> bool:
+        # Nothing was archived yet, so there is no file to attach
+        return self.attached or os.path.exists(self.path)
+
+    @property
+    def connection(self) -> BaseDBAsyncClient:
+        return Tortoise.get_connection("default")
+
+    async def attach(self) -> BaseDBAsyncClient:
+        connection = self.connection
+        if self.attached:
+            return connection
+        async with self._lock:
+            if not self.attached:
+                await connection.execute_query(
+                    f'ATTACH DATABASE ? AS "{SCHEMA}"', [self.path]
+                )
+                # Same as the main database, backups don't block writers
+                await connection.execute_script(
+                    f'PRAGMA "{SCHEMA}".journal_mode = WAL'
+                )
+                await self._sync_schema(connection)
+                self.attached = True
+                logging.info(f"Archive {self.path} attached")
+        return connection
+
+    async def _columns(
+        self, connection: BaseDBAsyncClient, schema: str, table: str
+    ) -> list[str]:
+        rows = await connection.execute_query_dict(
+            f'PRAGMA "{schema}".table_info("{table}")'
+        )
+        return [row["name"] for row in rows]
+
+    async def _sync_schema(self, connection: BaseDBAsyncClient) -> None:
+        # Archive tables copy the columns of the hot tables, columns added
+        # by later migrations are added to the archive as well
+        for table in TABLES:
+            columns = await self._columns(connection, "main", table)
+            archived = await self._columns(connection, SCHEMA, table)
+            if not archived:
+                await connection.execute_script(
+                    f'CREATE TABLE "{SCHEMA}"."{table}" AS '
+                    f'SELECT * FROM main."{table}" WHERE 0'
+                )
+                continue
+            for column in columns:
+                if column not in archived:
+                    await connection.execute_script(
+                        f'ALTER TABLE "{SCHEMA}"."{table}" '
+                        f'ADD COLUMN "{column}"'
+                    )
+        for name, table, columns in INDEXES:
+            column_list = ", ".join(f'"{column}"' for column in columns)
+            await connection.execute_script(
+                f'CREATE INDEX IF NOT EXISTS "{SCHEMA}"."{name}" '
+                f'ON "{table}" ({column_list})'
+            )
+
+    async def move_subject(self, subject_id: int) -> dict[str, int]:
+        # Copy and delete in one transaction, so a subject is never half
+        # archived. Solutions are moved last and deleted first because
+        # they are selected through the tasks of the subject
+        await self.attach()
+        moved = {}
+        async with in_transaction() as transaction:
+            for table in TABLES:
+                columns = ", ".join(
+                    f'"{column}"'
+                    for column in await self._columns(
+                        transaction, "main", table
+                    )
+                )
+                moved[table], _ = await transaction.execute_query(
+                    f'INSERT INTO "{SCHEMA}"."{table}" ({columns}) '
+                    f'SELECT {columns} FROM main."{table}" '
+                    f"WHERE {SUBJECT_ROWS[table]}",
+                    [subject_id],
+                )
+            for table in reversed(TABLES):
+                await transaction.execute_query(
+                    f'DELETE FROM main."{table}" WHERE {SUBJECT_ROWS[table]}',
+                    [subject_id],
+                )
+        logging.info(f"Subject {subject_id} archived: {moved}")
+        return moved
+
+    async def query(self, query: str, values: list) -> list:
+        connection = await self.attach()
+        _, rows = await connection.execute_query(query, values)
+        return rows
+
+
+archive = Archive()
@@ -0,0 +1,59 @@
+import time
+from typing import Any, Callable, List, Optional
+
+from tortoise.backends.base.client import TransactionContext
+from tortoise.backends.sqlite.client import SqliteClient, TransactionWrapper
+
+QueryObserver = Callable[[str, Optional[list], float], Any]
+
+query_observers: list[QueryObserver] = []
+
+
+def notify(query: str, values: Optional[list], duration: float) -> None:
+    for observer in query_observers:
+        observer(query, values, duration)
+
+
+class TracedClientMixin:
+    async def execute_insert(self, query: str, values: list) -> int:
+        start = time.perf_counter()
+        try:
+            return await super().execute_insert(query, values)
+        finally:
+            notify(query, values, time.perf_counter() - start)
+
+    async def execute_many(self, query: str, values: List[list]) -> None:
+        start = time.perf_counter()
+        try:
+            return await super().execute_many(query, values)
+        finally:
+            notify(query, None, time.perf_counter() - start)
+
+    async def execute_query(self, query: str, values: Optional[list] = None):
+        start = time.perf_counter()
+        try:
+            return await super().execute_query(query, values)
+        finally:
+            notify(query, values, time.perf_counter() - start)
+
+    async def execute_query_dict(
+        self, query: str, values: Optional[list] = None
+    ) -> List[dict]:
+        start = time.perf_counter()
+        try:
+            return await super().execute_query_dict(query, values)
+        finally:
+            notify(query, values, time.perf_counter() - start)
+
+
+class TracedTransactionWrapper(TracedClientMixin, TransactionWrapper):
+    pass
+
+
+class TracedSqliteClient(TracedClientMixin, SqliteClient):
+    def _in_transaction(self) -> TransactionContext:
+        return TransactionContext(TracedTransactionWrapper(self))
+
+
+# Tortoise looks up the client class of an engine module by this name
+client_class = TracedSqliteClient
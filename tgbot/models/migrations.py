@@ -0,0 +1,93 @@
+import logging
+
+from tortoise.backends.base.client import BaseDBAsyncClient
+
+# generate_schemas() only creates missing tables, so columns added to
+# existing models are listed here as (table, column, definition)
+COLUMNS = [
+    ("solution", "file_name", "VARCHAR(255)"),
+    ("solution", "file_id", "VARCHAR(255)"),
+    ("student", "is_blocked", "INT NOT NULL DEFAULT 0"),
+]
+INDEXES = [
+    ("idx_solution_file_link", "solution", ("file_link",)),
+    (
+        "idx_solution_task_student",
+        "solution",
+        ("subject_task_id", "student_id"),
+    ),
+    ("idx_solution_student", "solution", ("student_id",)),
+    (
+        "idx_subjecttask_subject_due_date",
+        "subjecttask",
+        ("subject_id", "due_date"),
+    ),
+]
+
+# Full-text indexes as (index, table, columns). They read the text from
+# the table itself and triggers keep them in sync with every write
+FTS_INDEXES = [
+    ("subject_fts", "subject", ("name", "description")),
+    ("subjecttask_fts", "subjecttask", ("name", "description")),
+    ("student_fts", "student", ("name", "username")),
+]
+FTS_TOKENIZER = "unicode61 remove_diacritics 2"
+
+
+async def create_fts_index(
+    connection: BaseDBAsyncClient, name: str, table: str, columns: tuple
+) -> None:
+    column_list = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+    delete_old = (
+        f"INSERT INTO {name}({name}, rowid, {column_list}) "
+        f"VALUES ('delete', old.id, {old_values});"
+    )
+    insert_new = (
+        f"INSERT INTO {name}(rowid, {column_list}) "
+        f"VALUES (new.id, {new_values});"
+    )
+    rows = await connection.execute_query_dict(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name = ?",
+        [name],
+    )
+    if not rows:
+        await connection.execute_script(
+            f"CREATE VIRTUAL TABLE {name} USING fts5({column_list}, "
+            f"content='{table}', content_rowid='id', "
+            f"tokenize='{FTS_TOKENIZER}')"
+        )
+        # Index the rows written before the index existed
+        await connection.execute_script(
+            f"INSERT INTO {name}({name}) VALUES ('rebuild')"
+        )
+        logging.info(f"Created full-text index {name}")
+    await connection.execute_script(
+        f"CREATE TRIGGER IF NOT EXISTS {name}_insert AFTER INSERT ON {table} "
+        f"BEGIN {insert_new} END;"
+        f"CREATE TRIGGER IF NOT EXISTS {name}_delete AFTER DELETE ON {table} "
+        f"BEGIN {delete_old} END;"
+        f"CREATE TRIGGER IF NOT EXISTS {name}_update "
+        f"AFTER UPDATE OF {column_list} ON {table} "
+        f"BEGIN {delete_old} {insert_new} END;"
+    )
+
+
+async def apply_migrations(connection: BaseDBAsyncClient) -> None:
+    for table, column, definition in COLUMNS:
+        rows = await connection.execute_query_dict(
+            f'PRAGMA table_info("{table}")'
+        )
+        if column not in {row["name"] for row in rows}:
+            await connection.execute_script(
+                f'ALTER TABLE "{table}" ADD COLUMN "{column}" {definition}'
+            )
+            logging.info(f"Added column {table}.{column}")
+    for name, table, columns in INDEXES:
+        column_list = ", ".join(f'"{column}"' for column in columns)
+        await connection.execute_script(
+            f'CREATE INDEX IF NOT EXISTS "{name}" ON "{table}" ({column_list})'
+        )
+    for name, table, columns in FTS_INDEXES:
+        await create_fts_index(connection, name, table, columns)
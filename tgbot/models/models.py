@@ -1,6 +1,8 @@
 from tortoise import Tortoise, fields
 
+from tgbot.models.archive import archive
 from tgbot.models.base import TimedBaseModel
+from tgbot.models.migrations import apply_migrations
 
 db = Tortoise()
 
@@ -29,6 +31,9 @@ class Teacher(User):
 
 
 class Student(User):
+    is_blocked = fields.BooleanField(
+        default=False, description="Student has blocked the bot"
+    )
     solutions: fields.ReverseRelation["Solution"]
 
 
@@ -100,19 +105,59 @@ class Solution(TimedBaseModel):
         null=True,
         description="Task file link",
     )
+    file_name = fields.CharField(
+        max_length=255,
+        null=True,
+        description="Original file name",
+    )
+    file_id = fields.CharField(
+        max_length=255,
+        null=True,
+        description="Telegram file id of the document",
+    )
+
+
+class SolutionFile(TimedBaseModel):
+    key = fields.CharField(
+        max_length=255, unique=True, description="Storage object key"
+    )
+    size = fields.BigIntField(default=0, description="Object size in bytes")
+    ref_count = fields.IntField(
+        default=0, description="Number of solutions using the object"
+    )
 
 
-async def init():
-    # Here we create a SQLite DB using file "db.sqlite3"
+async def init(
+    file_path: str = "db.sqlite3", archive_path: str = "archive.sqlite3"
+):
+    # Here we create a SQLite DB using file "db.sqlite3" by default
     #  also specify the app name of "models"
     #  which contain models from "tgbot.models.models"
+    #  through the traced SQLite backend from "tgbot.models.backend"
     await db.init(
-        db_url="sqlite://db.sqlite3",
-        modules={"models": ["tgbot.models.models"]},
+        config={
+            "connections": {
+                "default": {
+                    "engine": "tgbot.models.backend",
+                    "credentials": {"file_path": file_path},
+                }
+            },
+            "apps": {
+                "models": {
+                    "models": ["tgbot.models.models"],
+                    "default_connection": "default",
+                }
+            },
+        }
     )
     # Generate the schema
     await Tortoise.generate_schemas()
+    await apply_migrations(Tortoise.get_connection("default"))
+    # Closed subjects are attached on the first access to the archive
+    archive.path = archive_path
+    archive.attached = False
 
 
 async def close_db():
     await db.close_connections()
+    archive.attached = False
@@ -0,0 +1,185 @@
+"""Online backups of the SQLite database to the storage bucket.
+
+    python -m tgbot.services.backup create
+    python -m tgbot.services.backup list
+    python -m tgbot.services.backup restore latest --target db.sqlite3
+    python -m tgbot.services.backup --archive create
+
+Restore only while the bot is stopped.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sqlite3
+import tempfile
+import zlib
+from datetime import datetime, timezone
+from typing import Iterator
+
+from tgbot.misc.storage import Storage
+
+BACKUP_PREFIX = "backups/"
+CHUNK_SIZE = 1024 * 1024
+# zlib writes a gzip container with this window size
+GZIP_WBITS = 31
+
+
+def compressed_chunks(path: str, level: int = 6) -> Iterator[bytes]:
+    compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+    with open(path, "rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            if data := compressor.compress(chunk):
+                yield data
+    yield compressor.flush()
+
+
+def decompress_file(source: str, target: str) -> None:
+    decompressor = zlib.decompressobj(GZIP_WBITS)
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        while chunk := src.read(CHUNK_SIZE):
+            dst.write(decompressor.decompress(chunk))
+        dst.write(decompressor.flush())
+
+
+def copy_database(source: str, target: str) -> None:
+    # One step copies a consistent snapshot. A stepped copy starts over
+    # whenever the bot writes in between and may never finish, while in
+    # WAL mode a single step only holds a read snapshot and writers of
+    # the bot aren't blocked
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(target)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+
+
+class DatabaseBackup:
+    def __init__(
+        self,
+        storage: Storage,
+        path: str,
+        keep: int = 7,
+    ) -> None:
+        self.storage = storage
+        self.path = path
+        self.keep = keep
+        self._lock = asyncio.Lock()
+
+    @property
+    def key_prefix(self) -> str:
+        # Every database file is rotated on its own
+        name = os.path.splitext(os.path.basename(self.path))[0]
+        return f"{BACKUP_PREFIX}{name}-"
+
+    def backup_key(self) -> str:
+        timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        return f"{self.key_prefix}{timestamp}.sqlite3.gz"
+
+    def create(self) -> str:
+        key = self.backup_key()
+        with tempfile.TemporaryDirectory() as directory:
+            snapshot = os.path.join(directory, "snapshot.sqlite3")
+            copy_database(self.path, snapshot)
+            size = self.storage.upload_stream(compressed_chunks(snapshot), key)
+        logging.info(f"Database backup {key} uploaded, {size} bytes")
+        return key
+
+    def list_backups(self) -> list[dict]:
+        # Keys carry the timestamp, so key order is the creation order
+        return [
+            item
+            for page in self.storage.iter_object_pages(self.key_prefix)
+            for item in page
+        ]
+
+    def rotate(self) -> list[str]:
+        backups = self.list_backups()
+        if self.keep <= 0 or len(backups) <= self.keep:
+            return []
+        expired = [item["Key"] for item in backups[: -self.keep]]
+        deleted = self.storage.delete_files(expired)
+        logging.info(f"Deleted {len(deleted)} expired database backups")
+        return deleted
+
+    def restore(self, key: str, target: str) -> None:
+        with tempfile.TemporaryDirectory() as directory:
+            compressed = os.path.join(directory, "backup.sqlite3.gz")
+            restored = os.path.join(directory, "backup.sqlite3")
+            if not self.storage.download_file(key, compressed):
+                raise RuntimeError(f"Backup {key} can't be downloaded")
+            decompress_file(compressed, restored)
+            connection = sqlite3.connect(restored)
+            try:
+                (result,) = connection.execute(
+                    "PRAGMA integrity_check"
+                ).fetchone()
+            finally:
+                connection.close()
+            if result != "ok":
+                raise RuntimeError(f"Backup {key} is corrupted: {result}")
+            copy_database(restored, target)
+        logging.info(f"Database {target} restored from {key}")
+
+    async def run(self) -> str | None:
+        if not os.path.exists(self.path):
+            logging.info(f"Database {self.path} doesn't exist yet")
+            return None
+        if self._lock.locked():
+            logging.warning("Database backup is already running")
+            return None
+        async with self._lock:
+            try:
+                key = await asyncio.to_thread(self.create)
+                await asyncio.to_thread(self.rotate)
+                return key
+            except Exception as e:
+                logging.error(f"Database backup failed: {e}")
+                return None
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument(
+        "--archive",
+        action="store_true",
+        help="Use the archive of closed subjects instead of the database",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("create", help="Back up the database now")
+    commands.add_parser("list", help="List stored backups")
+    restore = commands.add_parser("restore", help="Restore a backup")
+    restore.add_argument("key", help="Backup key or 'latest'")
+    restore.add_argument("--target", help="Database file to overwrite")
+    return parser.parse_args()
+
+
+def main() -> None:
+    from bot import create_storage
+    from tgbot.config import config
+
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    path = config.archive_path if args.archive else config.database_path
+    backup = DatabaseBackup(create_storage(config), path, config.backup_keep)
+    if args.command == "create":
+        print(backup.create())
+        backup.rotate()
+    elif args.command == "list":
+        for item in backup.list_backups():
+            print(f"{item['Key']}\t{item['Size']}\t{item['LastModified']}")
+    elif args.command == "restore":
+        key = args.key
+        if key == "latest":
+            if not (backups := backup.list_backups()):
+                raise SystemExit("There are no backups")
+            key = backups[-1]["Key"]
+        backup.restore(key, args.target or path)
+
+
+if __name__ == "__main__":
+    main()
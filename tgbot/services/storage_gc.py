@@ -0,0 +1,133 @@
+import asyncio
+import logging
+from contextlib import AsyncExitStack
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+
+from tgbot.misc.database import Database
+from tgbot.misc.solution_files import object_lock
+from tgbot.misc.storage import Storage
+from tgbot.services.backup import BACKUP_PREFIX
+
+# Objects that never belong to a solution
+PROTECTED_PREFIXES: tuple[str, ...] = (BACKUP_PREFIX,)
+
+
+@dataclass
+class GCReport:
+    dry_run: bool
+    scanned: int = 0
+    scanned_bytes: int = 0
+    orphans: int = 0
+    deleted: int = 0
+    reclaimed_bytes: int = 0
+    stale_uploads: int = 0
+    aborted_uploads: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class StorageGC:
+    # Listing pages and referenced keys are both sorted, so every page is
+    # checked against the file links in its own key range and memory stays
+    # bounded by the page size no matter how large the bucket is
+    def __init__(
+        self,
+        storage: Storage,
+        db: Database,
+        min_age: timedelta = timedelta(days=1),
+        page_size: int = 1000,
+        protected: tuple[str, ...] = PROTECTED_PREFIXES,
+    ) -> None:
+        self.storage = storage
+        self.db = db
+        self.min_age = min_age
+        self.page_size = page_size
+        self.protected = protected
+        self._lock = asyncio.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def is_candidate(self, item: dict, cutoff: datetime) -> bool:
+        # Fresh objects may belong to an upload whose Solution row is not
+        # written yet
+        return (
+            not item["Key"].startswith(self.protected)
+            and item["LastModified"] < cutoff
+        )
+
+    async def _next_page(self, pages) -> list[dict] | None:
+        return await asyncio.to_thread(next, pages, None)
+
+    async def _delete(self, keys: list[str], cutoff: datetime) -> list[str]:
+        # Uploads take the same per-key locks, but release them before the
+        # Solution row is written. A key acquired after the cutoff may be
+        # waiting for its row, so it is kept until the next run
+        async with AsyncExitStack() as stack:
+            for key in sorted(keys):
+                await stack.enter_async_context(object_lock(key))
+            referenced = await self.db.get_referenced_file_links(
+                keys[0], keys[-1]
+            )
+            referenced |= await self.db.get_acquired_file_keys(keys, cutoff)
+            keys = [key for key in keys if key not in referenced]
+            if not keys:
+                return []
+            deleted = await asyncio.to_thread(self.storage.delete_files, keys)
+            await self.db.delete_solution_files(deleted)
+        return deleted
+
+    async def collect(self, dry_run: bool = False) -> GCReport:
+        async with self._lock:
+            return await self._collect(dry_run)
+
+    async def _collect(self, dry_run: bool) -> GCReport:
+        report = GCReport(dry_run=dry_run)
+        cutoff = datetime.now(timezone.utc) - self.min_age
+        pages = self.storage.iter_object_pages(page_size=self.page_size)
+        while page := await self._next_page(pages):
+            report.scanned += len(page)
+            report.scanned_bytes += sum(item["Size"] for item in page)
+            referenced = await self.db.get_referenced_file_links(
+                page[0]["Key"], page[-1]["Key"]
+            )
+            orphans = {
+                item["Key"]: item["Size"]
+                for item in page
+                if item["Key"] not in referenced
+                and self.is_candidate(item, cutoff)
+            }
+            if not orphans:
+                continue
+            report.orphans += len(orphans)
+            if dry_run:
+                report.reclaimed_bytes += sum(orphans.values())
+                continue
+            deleted = await self._delete(list(orphans), cutoff)
+            report.deleted += len(deleted)
+            report.reclaimed_bytes += sum(orphans[key] for key in deleted)
+        await self._abort_stale_uploads(report, cutoff, dry_run)
+        logging.info(f"Storage GC finished: {report.as_dict()}")
+        return report
+
+    async def _abort_stale_uploads(
+        self, report: GCReport, cutoff: datetime, dry_run: bool
+    ) -> None:
+        uploads = await asyncio.to_thread(
+            self.storage.list_stale_uploads, cutoff
+        )
+        report.stale_uploads = len(uploads)
+        if dry_run:
+            return
+        for upload in uploads:
+            # A new upload of the same key may be resuming this one
+            async with object_lock(upload["Key"]):
+                if await asyncio.to_thread(
+                    self.storage.abort_upload,
+                    upload["Key"],
+                    upload["UploadId"],
+                ):
+                    report.aborted_uploads += 1
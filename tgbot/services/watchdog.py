@@ -0,0 +1,81 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from tgbot.misc.metrics import active_updates
+
+PERCENTILES = (50, 90, 99)
+
+
+class LoopWatchdog:
+    def __init__(
+        self, threshold: float, interval: float = 0.1, samples: int = 1000
+    ) -> None:
+        self.threshold = threshold
+        self.interval = interval
+        self.lags: deque[float] = deque(maxlen=samples)
+        self.stalls = 0
+        self._beat = time.monotonic()
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(
+            target=self._watch, name="loop-watchdog", daemon=True
+        )
+        self._thread.start()
+        logging.info("Loop watchdog started")
+
+    async def stop(self) -> None:
+        self._stopped.set()
+        self._task.cancel()
+        await asyncio.to_thread(self._thread.join)
+        logging.info("Loop watchdog stopped")
+
+    async def _heartbeat(self) -> None:
+        while True:
+            self._beat = time.monotonic()
+            started = self.loop.time()
+            await asyncio.sleep(self.interval)
+            lag = self.loop.time() - started - self.interval
+            self.lags.append(max(lag, 0))
+
+    def _watch(self) -> None:
+        # Runs in its own thread, so it can look at the loop thread while
+        # the loop is blocked
+        reported = False
+        while not self._stopped.wait(self.interval):
+            stalled = time.monotonic() - self._beat - self.interval
+            if stalled < self.threshold:
+                reported = False
+            elif not reported:
+                reported = True
+                self._report(stalled)
+
+    def _report(self, stalled: float) -> None:
+        self.stalls += 1
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = "".join(traceback.format_stack(frame)) if frame else ""
+        stats = active_updates.get(asyncio.current_task(self.loop))
+        handler = stats.handler if stats else None
+        update_id = stats.update_id if stats else None
+        logging.warning(
+            f"Event loop blocked for {stalled:.2f}s in handler {handler} "
+            f"(update {update_id}):\n{stack}"
+        )
+
+    def percentiles(self) -> dict[str, float]:
+        lags = sorted(self.lags)
+        stats = {"stalls": self.stalls}
+        if not lags:
+            return stats
+        for percentile in PERCENTILES:
+            index = min(len(lags) - 1, len(lags) * percentile // 100)
+            stats[f"p{percentile}"] = lags[index]
+        return stats
@@ -0,0 +1,48 @@
+import logging
+
+from aiohttp import web
+
+from loader import links
+from tgbot.misc.database import Database
+from tgbot.misc.links import PresignedUrlCache
+from tgbot.misc.metrics import metrics
+from tgbot.misc.storage import Storage
+
+
+async def metrics_handler(request: web.Request) -> web.Response:
+    return web.Response(
+        text=metrics.render(), content_type="text/plain", charset="utf-8"
+    )
+
+
+async def solution_link_handler(request: web.Request) -> web.Response:
+    solution_id = links.verify(request.match_info["token"])
+    if solution_id is None:
+        raise web.HTTPNotFound()
+    solution = await Database().get_solution(solution_id)
+    if solution is None or not solution.file_link:
+        raise web.HTTPNotFound()
+    url = request.app["presigned_urls"].get(
+        solution.file_link, solution.file_name
+    )
+    if not url:
+        raise web.HTTPServiceUnavailable()
+    raise web.HTTPFound(url)
+
+
+def create_app(storage: Storage, presigned_url_ttl: int) -> web.Application:
+    app = web.Application()
+    app["presigned_urls"] = PresignedUrlCache(storage, presigned_url_ttl)
+    app.router.add_get("/metrics", metrics_handler)
+    app.router.add_get("/s/{token}", solution_link_handler)
+    return app
+
+
+async def start_web_server(
+    host: str, port: int, storage: Storage, presigned_url_ttl: int
+) -> web.AppRunner:
+    runner = web.AppRunner(create_app(storage, presigned_url_ttl))
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logging.info(f"Web server started on {host}:{port}")
+    return runner
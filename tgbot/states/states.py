@@ -24,3 +24,19 @@ class Solution(StatesGroup):
 
 class Communication(StatesGroup):
     wait_for_message = State()
+
+
+class TaskImport(StatesGroup):
+    file = State()
+
+
+class Roster(StatesGroup):
+    entries = State()
+
+
+class Announcement(StatesGroup):
+    message = State()
+
+
+class Search(StatesGroup):
+    query = State()